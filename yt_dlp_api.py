@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+yt-dlp GUI 本地任务接口（HTTP/JSON，仅监听 127.0.0.1）
+- POST /jobs                 提交 URL 与格式计划（format / formats / videos+audios）
+- GET  /jobs, /jobs/<id>     任务列表与实时进度（内存快照，定时生成）
+- POST /jobs/<id>/cancel     取消任务
+- GET  /formats?url=...      缓存中的格式列表（refresh=1 时重新解析）
+每次启动生成随机令牌并写入数据目录的 api-token 文件，请求须带 Authorization: Bearer <令牌>；
+POST 须为 application/json，Host 须为本机地址（浏览器页面无法不经预检就发出这样的请求）
+命令行客户端：python yt_dlp_api.py list | submit URL -f 137+140 | cancel ID | formats URL
+"""
+
+import os
+import sys
+import hmac
+import json
+import time
+import secrets
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs, quote
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
+
+from yt_dlp_core import APP_DIR, DEFAULT_FORMAT
+
+API_HOST = "127.0.0.1"
+API_PORT = 8765
+# 令牌文件名（位于数据目录，仅当前用户可读）
+TOKEN_FILE = "api-token"
+# 接受的 Host 头：防止 DNS 重绑定的页面把请求发到本机端口
+LOOPBACK_HOSTS = ('127.0.0.1', 'localhost', '::1')
+# 任务/进度快照的最短重建间隔：轮询再频繁也不会增加下载线程的负担
+SNAPSHOT_INTERVAL = 0.5
+# /formats 返回的字段（与格式选择对话框显示的列一致）
+FORMAT_FIELDS = ('format_id', 'ext', 'resolution', 'fps', 'vcodec', 'acodec', 'tbr',
+                 'filesize', 'filesize_approx', 'format_note')
+DEFAULT_PLAN = DEFAULT_FORMAT
+
+def progress_summary(slots):
+    """ProgressBoard 槽位 → 可序列化的进度（每个组合/流一项）"""
+    summary = {}
+    for key, d in slots.items():
+        summary[str(key)] = {
+            'status': d.get('status'),
+            'downloaded_bytes': d.get('downloaded_bytes'),
+            'total_bytes': d.get('total_bytes') or d.get('total_bytes_estimate'),
+            'speed': d.get('speed'),
+            'eta': d.get('eta'),
+        }
+    return summary
+
+def string_list(body, key):
+    """请求体中的字符串列表字段（缺省为空列表）；类型不对时抛出 ValueError（返回 400）"""
+    value = body.get(key)
+    if value is None:
+        return []
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise ValueError(f"{key} must be a list of strings")
+    return value
+
+def job_plan(body, expand_batch):
+    """请求体 → 格式计划：format（单个表达式）、formats（列表）或 videos × audios（与选择对话框相同）"""
+    formats, videos, audios = string_list(body, 'formats'), string_list(body, 'videos'), string_list(body, 'audios')
+    if formats:
+        return formats
+    if videos or audios:
+        return expand_batch(videos, audios)
+    fmt = body.get('format') or DEFAULT_PLAN
+    if not isinstance(fmt, str):
+        raise ValueError("format must be a string")
+    return [fmt]
+
+def read_token(data_dir=APP_DIR):
+    try:
+        return (Path(data_dir) / TOKEN_FILE).read_text(encoding='utf-8').strip()
+    except OSError:
+        return None
+
+def write_token(path, token):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(token)
+
+class JobAPIServer:
+    """本地任务接口：提交写入 SQLite 队列后调用 on_submit 通知宿主启动队列；
+    进度只读取引擎的 ProgressBoard 快照，不接触下载线程。令牌在 start() 时生成并写入 data_dir/api-token"""
+
+    def __init__(self, engine, default_outdir, port=API_PORT, on_submit=lambda: None, data_dir=APP_DIR):
+        self.engine = engine
+        self.default_outdir = default_outdir
+        self.port = port
+        self.on_submit = on_submit
+        self.token_path = Path(data_dir) / TOKEN_FILE
+        self.token = None
+        self._httpd = None
+        self._snap = None
+        self._snap_time = 0.0
+        self._lock = threading.Lock()
+
+    def start(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, fmt, *args):
+                pass
+
+            def do_GET(self):
+                api._dispatch(self, 'GET')
+
+            def do_POST(self):
+                api._dispatch(self, 'POST')
+
+        self._httpd = ThreadingHTTPServer((API_HOST, self.port), Handler)
+        self._httpd.daemon_threads = True
+        self.token = secrets.token_urlsafe(24)
+        try:
+            write_token(self.token_path, self.token)
+        except OSError:
+            self._httpd.server_close()
+            self._httpd = None
+            raise
+        threading.Thread(target=self._httpd.serve_forever, name="job-api", daemon=True).start()
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+            if read_token(self.token_path.parent) == self.token:
+                self.token_path.unlink(missing_ok=True)
+
+    @property
+    def running(self):
+        return self._httpd is not None
+
+    def snapshot(self):
+        """任务列表 + 当前任务进度的 JSON；SNAPSHOT_INTERVAL 内重复请求直接返回同一份"""
+        now = time.monotonic()
+        with self._lock:
+            if self._snap is None or now - self._snap_time >= SNAPSHOT_INTERVAL:
+                current = self.engine.current_job_id
+                progress = progress_summary(self.engine.progress_board.snapshot())
+                jobs = self.engine.journal.jobs()
+                for job in jobs:
+                    job['progress'] = progress if job['id'] == current else None
+                self._snap = json.dumps({'time': time.time(), 'jobs': jobs}, ensure_ascii=False).encode('utf-8')
+                self._snap_time = now
+            return self._snap
+
+    def _check_request(self, handler, method):
+        """Host 为本机、令牌正确、POST 为 JSON 时返回 None，否则返回 (状态码, 错误)"""
+        host = handler.headers.get('Host') or ''
+        if urlsplit(f"//{host}").hostname not in LOOPBACK_HOSTS:
+            return 403, 'host not allowed'
+        auth = handler.headers.get('Authorization') or ''
+        if not auth.startswith('Bearer ') or not hmac.compare_digest(auth[len('Bearer '):].encode(), self.token.encode()):
+            return 401, 'invalid token'
+        if method == 'POST' and handler.headers.get_content_type() != 'application/json':
+            return 415, 'Content-Type must be application/json'
+        return None
+
+    def _dispatch(self, handler, method):
+        url = urlsplit(handler.path)
+        parts = [p for p in url.path.split('/') if p]
+        denied = self._check_request(handler, method)
+        if denied:
+            return self._send(handler, denied[0], {'error': denied[1]})
+        try:
+            if method == 'GET' and parts == ['jobs']:
+                return self._send(handler, 200, raw=self.snapshot())
+            if method == 'GET' and len(parts) == 2 and parts[0] == 'jobs':
+                return self._get_job(handler, int(parts[1]))
+            if method == 'POST' and parts == ['jobs']:
+                return self._submit(handler)
+            if method == 'POST' and len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'cancel':
+                return self._send(handler, 200, {'canceled': self.engine.cancel_job(int(parts[1]))})
+            if method == 'GET' and parts == ['formats']:
+                return self._formats(handler, parse_qs(url.query))
+            self._send(handler, 404, {'error': 'not found'})
+        except ValueError as e:
+            self._send(handler, 400, {'error': str(e)})
+        except Exception as e:
+            self._send(handler, 500, {'error': str(e)})
+
+    def _get_job(self, handler, job_id):
+        jobs = json.loads(self.snapshot())['jobs']
+        job = next((j for j in jobs if j['id'] == job_id), None)
+        self._send(handler, 200 if job else 404, job or {'error': 'no such job'})
+
+    def _submit(self, handler):
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = json.loads(handler.rfile.read(length) or b'{}')
+        if not isinstance(body, dict):
+            raise ValueError("request body must be a JSON object")
+        urls = body.get('urls') or ([body['url']] if body.get('url') else [])
+        if not urls:
+            raise ValueError("url or urls is required")
+        plan = job_plan(body, self.engine.expand_batch)
+        outdir = os.path.abspath(body.get('outdir') or self.default_outdir())
+        if not os.path.isdir(outdir):
+            raise ValueError(f"outdir is not an existing directory: {outdir}")
+        ids = [self.engine.journal.add(url, outdir, plan) for url in urls]
+        self.engine.log(f"API: queued {len(ids)} URL(s), plan: {', '.join(plan)}", "batch")
+        self.on_submit()
+        self._send(handler, 201, {'ids': ids, 'plan': plan, 'outdir': outdir})
+
+    def _formats(self, handler, query):
+        url = (query.get('url') or [''])[0]
+        if not url:
+            raise ValueError("url is required")
+        info = self.engine.cached_info(url)
+        if info is None and (query.get('refresh') or ['0'])[0] == '1':
+            info = self.engine.extract_and_cache(url)
+        if info is None:
+            return self._send(handler, 404, {'error': 'not cached'})
+        formats = [{k: f.get(k) for k in FORMAT_FIELDS} for f in info.get('formats') or []]
+        self._send(handler, 200, {'title': info.get('title'), 'id': info.get('id'), 'formats': formats})
+
+    def _send(self, handler, status, obj=None, raw=None):
+        data = raw if raw is not None else json.dumps(obj, ensure_ascii=False).encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json; charset=utf-8')
+        handler.send_header('Content-Length', str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+class ApiClient:
+    """本地任务接口的简易客户端（测试与脚本用）；未给出令牌时读取数据目录中的 api-token"""
+
+    def __init__(self, port=API_PORT, timeout=30, token=None, data_dir=APP_DIR):
+        self.base = f"http://{API_HOST}:{port}"
+        self.timeout = timeout
+        self.token = token or read_token(data_dir) or ''
+
+    def _call(self, method, path, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        headers = {'Content-Type': 'application/json', 'Authorization': f"Bearer {self.token}"}
+        req = Request(self.base + path, data=data, method=method, headers=headers)
+        try:
+            with urlopen(req, timeout=self.timeout) as resp:
+                return json.loads(resp.read())
+        except HTTPError as e:
+            return json.loads(e.read() or b'{}') | {'status': e.code}
+
+    def submit(self, urls, formats=None, videos=None, audios=None, outdir=None):
+        body = {'urls': list(urls)}
+        if formats:
+            body['formats'] = list(formats)
+        if videos or audios:
+            body['videos'], body['audios'] = list(videos or []), list(audios or [])
+        if outdir:
+            body['outdir'] = outdir
+        return self._call('POST', '/jobs', body)
+
+    def jobs(self):
+        return self._call('GET', '/jobs')['jobs']
+
+    def job(self, job_id):
+        return self._call('GET', f'/jobs/{job_id}')
+
+    def cancel(self, job_id):
+        return self._call('POST', f'/jobs/{job_id}/cancel', {})
+
+    def formats(self, url, refresh=False):
+        return self._call('GET', f"/formats?url={quote(url, safe='')}{'&refresh=1' if refresh else ''}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="client for the yt-dlp GUI local job API")
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--token", default=None, help=f"API token (default: read from DATA_DIR/{TOKEN_FILE})")
+    parser.add_argument("--data-dir", default=str(APP_DIR), help=f"data folder of the GUI/engine (default: {APP_DIR})")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("submit", help="queue URLs")
+    p.add_argument("urls", nargs="+")
+    p.add_argument("-f", "--format", dest="formats", action="append", default=[])
+    p.add_argument("--videos", default="")
+    p.add_argument("--audios", default="")
+    p.add_argument("-o", "--output", default=None)
+    sub.add_parser("list", help="list jobs with progress")
+    p = sub.add_parser("cancel", help="cancel a job")
+    p.add_argument("job_id", type=int)
+    p = sub.add_parser("formats", help="show cached formats of a URL")
+    p.add_argument("url")
+    p.add_argument("--refresh", action="store_true", help="parse the URL if it is not cached")
+    args = parser.parse_args(argv)
+
+    client = ApiClient(args.port, token=args.token, data_dir=args.data_dir)
+    if args.cmd == "submit":
+        result = client.submit(args.urls, args.formats, [v for v in args.videos.split(',') if v],
+                               [a for a in args.audios.split(',') if a], args.output)
+    elif args.cmd == "list":
+        result = client.jobs()
+    elif args.cmd == "cancel":
+        result = client.cancel(args.job_id)
+    else:
+        result = client.formats(args.url, args.refresh)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 1 if isinstance(result, dict) and result.get('status', 200) >= 400 else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
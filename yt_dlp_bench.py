@@ -0,0 +1,693 @@
+#!/usr/bin/env python3
+"""
+yt-dlp GUI 离线基准测试（不访问外网）
+- 本地合成媒体服务器：渐进式文件（支持 Range）、HLS 与 DASH 分片，可设置每请求延迟与每连接带宽；
+  有 ffmpeg 时文件开头为 ffmpeg 生成的真实短片段，合并与修复等后处理可以照常运行
+- 假提取器：返回与 YouTube 相近的 formats 列表，并统计解析次数
+- 按 解析 → 选择 → 批量下载 的路径运行各场景，报告吞吐、每批解析次数、界面刷新延迟与峰值内存
+- postprocess 场景（需要 ffmpeg 与 ffprobe）：仅提取音频（mp3 / 保留原编码）与嵌入字幕，并检查输出文件
+用法：python yt_dlp_bench.py [--scenario progressive ...] [--latency 50] [--bandwidth 20] [--json out.json] [--baseline old.json]
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import struct
+import argparse
+import subprocess
+import tempfile
+import threading
+import tracemalloc
+from contextlib import ExitStack, redirect_stderr, redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import yt_dlp_core as core
+
+BENCH_HOST = "127.0.0.1"
+SCENARIOS = ('progressive', 'hls', 'dash', 'queue', 'postprocess')
+# postprocess 场景依次运行的后处理设置：(名称, EngineSettings 字段)
+POSTPROCESS_RUNS = (
+    ('audio-mp3', {'extract_audio': True, 'fast_audio': False}),
+    ('audio-fast', {'extract_audio': True, 'fast_audio': True}),
+    ('embed-subs', {'embed_subs': True, 'sub_langs': ['en']}),
+)
+AUDIO_EXTS = ('mp3', 'm4a', 'opus', 'ogg', 'aac', 'flac', 'wav')
+SUBTITLE_VTT = "WEBVTT\n\n00:00:00.000 --> 00:00:01.000\nbench subtitle\n"
+# 合成媒体：(格式 ID, 扩展名, 视频编码, 音频编码, 高度, 码率 kbps, 协议)；体积 = 码率 × 时长
+BENCH_FORMATS = (
+    ('139', 'm4a', 'none', 'mp4a.40.5', None, 49, None),
+    ('140', 'm4a', 'none', 'mp4a.40.2', None, 130, None),
+    ('249', 'webm', 'none', 'opus', None, 53, None),
+    ('251', 'webm', 'none', 'opus', None, 135, None),
+    ('160', 'mp4', 'avc1.4d400c', 'none', 144, 110, None),
+    ('133', 'mp4', 'avc1.4d4015', 'none', 240, 250, None),
+    ('134', 'mp4', 'avc1.4d401e', 'none', 360, 600, None),
+    ('135', 'mp4', 'avc1.4d401f', 'none', 480, 1100, None),
+    ('136', 'mp4', 'avc1.4d401f', 'none', 720, 2300, None),
+    ('137', 'mp4', 'avc1.640028', 'none', 1080, 4400, None),
+    ('243', 'webm', 'vp9', 'none', 360, 500, None),
+    ('244', 'webm', 'vp9', 'none', 480, 900, None),
+    ('247', 'webm', 'vp9', 'none', 720, 1800, None),
+    ('248', 'webm', 'vp9', 'none', 1080, 3300, None),
+    ('18', 'mp4', 'avc1.42001E', 'mp4a.40.2', 360, 700, None),
+    ('hls-480', 'mp4', 'avc1.4d401f', 'mp4a.40.2', 480, 1300, 'm3u8_native'),
+    ('hls-720', 'mp4', 'avc1.4d401f', 'mp4a.40.2', 720, 2600, 'm3u8_native'),
+    ('dash-480', 'mp4', 'avc1.4d401f', 'none', 480, 1100, 'http_dash_segments'),
+    ('dash-720', 'mp4', 'avc1.4d401f', 'none', 720, 2300, 'http_dash_segments'),
+)
+# 响应体按块写出（限速的粒度），内容为重复的固定字节序列
+BODY_CHUNK = 64 * 1024
+_PATTERN = bytes(range(256)) * (BODY_CHUNK // 256) * 2
+
+# ffmpeg 生成样本用的输入：低分辨率测试画面与正弦音，每段 1 秒
+SAMPLE_VIDEO = ['-f', 'lavfi', '-i', 'testsrc=size=160x90:rate=30']
+SAMPLE_AUDIO = ['-f', 'lavfi', '-i', 'sine']
+SAMPLE_ARGS = {
+    'mp4-v': SAMPLE_VIDEO + ['-t', '1', '-c:v', 'libx264', '-preset', 'ultrafast', '-an', '-f', 'mp4'],
+    'mp4-av': SAMPLE_VIDEO + SAMPLE_AUDIO + ['-t', '1', '-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac', '-f', 'mp4'],
+    'm4a': SAMPLE_AUDIO + ['-t', '1', '-c:a', 'aac', '-vn', '-f', 'mp4'],
+    'webm-v': SAMPLE_VIDEO + ['-t', '1', '-c:v', 'libvpx-vp9', '-deadline', 'realtime', '-cpu-used', '8', '-an', '-f', 'webm'],
+    'webm-a': SAMPLE_AUDIO + ['-t', '1', '-c:a', 'libopus', '-vn', '-f', 'webm'],
+}
+
+def synthetic_bytes(offset, size):
+    """文件中 [offset, offset + size) 的合成内容（size 不超过 BODY_CHUNK），同一位置的内容总是相同"""
+    start = offset % BODY_CHUNK
+    return _PATTERN[start:start + size]
+
+def format_size(fmt, duration):
+    return int(fmt[5] * 125 * duration)
+
+def sample_kind(ext, vcodec, acodec):
+    if ext == 'webm':
+        return 'webm-v' if vcodec != 'none' else 'webm-a'
+    if vcodec == 'none':
+        return 'm4a'
+    return 'mp4-av' if acodec != 'none' else 'mp4-v'
+
+def generate_samples(ffmpeg, folder, segments):
+    """用 ffmpeg 生成各容器/编码的 1 秒样本，以及 HLS 用的 fMP4 初始化段与 segments 个分片；
+    编码器缺失等失败时返回 None（服务器退回纯合成内容）"""
+    samples = {}
+    try:
+        for kind, args in SAMPLE_ARGS.items():
+            path = os.path.join(folder, f"sample-{kind}")
+            subprocess.run([ffmpeg, '-loglevel', 'error', '-y', *args, path], check=True, capture_output=True)
+            with open(path, 'rb') as f:
+                samples[kind] = f.read()
+        hls = os.path.join(folder, 'sample-hls')
+        os.makedirs(hls, exist_ok=True)
+        subprocess.run([ffmpeg, '-loglevel', 'error', '-y', *SAMPLE_VIDEO, *SAMPLE_AUDIO, '-t', str(segments),
+                        '-c:v', 'libx264', '-preset', 'ultrafast', '-g', '30', '-c:a', 'aac',
+                        '-f', 'hls', '-hls_time', '1', '-hls_segment_type', 'fmp4', '-hls_fmp4_init_filename', 'init.mp4',
+                        '-hls_segment_filename', os.path.join(hls, '%d.m4s'), os.path.join(hls, 'index.m3u8')],
+                       check=True, capture_output=True)
+        with open(os.path.join(hls, 'init.mp4'), 'rb') as f:
+            samples['hls-init'] = f.read()
+        samples['hls'] = []
+        for i in range(segments):
+            with open(os.path.join(hls, f'{i}.m4s'), 'rb') as f:
+                samples['hls'].append(f.read())
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return samples
+
+def padding_header(container, length):
+    """容器允许的填充元素头（length 含头部）：MP4 为 64 位长度的 free box，WebM 为 8 字节长度的 Void 元素"""
+    if container == 'webm':
+        return b'\xec\x01' + (length - 9).to_bytes(7, 'big')
+    return struct.pack('>I4sQ', 1, b'free', length)
+
+class MediaBody:
+    """一个响应的内容：开头为真实样本 + 填充元素头，其余为合成字节（填充元素的内容）；
+    没有样本时全部为合成字节。样本比目标体积还大时以样本长度为准"""
+
+    def __init__(self, size, sample=b'', container='mp4'):
+        pad = size - len(sample)
+        if sample and pad > 16:
+            self.head = sample + padding_header(container, pad)
+        else:
+            self.head = sample
+            size = max(size, len(sample))
+        self.size = size
+
+    def read(self, offset, size):
+        if offset >= len(self.head):
+            return synthetic_bytes(offset, size)
+        chunk = self.head[offset:offset + size]
+        if len(chunk) < size:
+            chunk += synthetic_bytes(offset + len(chunk), size - len(chunk))
+        return chunk
+
+class MediaServer:
+    """本地合成媒体服务器：/api/<视频> 返回视频信息 JSON，/media 为渐进式文件，/hls 与 /dash 为分片；
+    每个请求先等待 latency 秒，响应体按每连接 bandwidth 字节/秒限速（0 为不限）。
+    samples 为 generate_samples() 的结果：渐进式文件与 HLS 分片以真实样本开头（HLS 改为 fMP4 分片）"""
+
+    def __init__(self, duration=20, latency=0.02, bandwidth=0, segment_seconds=4, samples=None):
+        self.duration = duration
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.segment_seconds = segment_seconds
+        self.samples = samples
+        self.requests = 0
+        # 已发送的媒体字节数（吞吐按它计算：合并/修复后的文件不含填充，比实际下载的少）
+        self.sent = 0
+        self._sent_lock = threading.Lock()
+        self._formats = {fmt[0]: fmt for fmt in BENCH_FORMATS}
+        self._bodies = {}
+        self._httpd = None
+
+    @property
+    def base_url(self):
+        return f"http://{BENCH_HOST}:{self._httpd.server_address[1]}"
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, fmt, *args):
+                pass
+
+            def do_GET(self):
+                server._handle(self)
+
+        self._httpd = ThreadingHTTPServer((BENCH_HOST, 0), Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, name="bench-server", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def segments(self):
+        return max(1, math.ceil(self.duration / self.segment_seconds))
+
+    def body(self, fid, index=None):
+        """格式 fid 的渐进式文件，或第 index 个分片的内容（按需生成并缓存）"""
+        key = (fid, index)
+        if key not in self._bodies:
+            fmt = self._formats[fid]
+            size = format_size(fmt, self.duration)
+            if index is None:
+                kind = sample_kind(fmt[1], fmt[2], fmt[3])
+                sample = self.samples[kind] if self.samples else b''
+                self._bodies[key] = MediaBody(size, sample, 'webm' if kind.startswith('webm') else 'mp4')
+            else:
+                n = self.segments()
+                seg = size // n + (size % n if index == n - 1 else 0)
+                hls = self.samples and fmt[6] == 'm3u8_native'
+                self._bodies[key] = MediaBody(seg, self.samples['hls'][index] if hls else b'')
+        return self._bodies[key]
+
+    def video_info(self, video_id):
+        """假提取器返回的 info：与真实站点一样包含多种清晰度/编码的 formats"""
+        base, n = self.base_url, self.segments()
+        formats = []
+        for fid, ext, vcodec, acodec, height, tbr, protocol in BENCH_FORMATS:
+            size = format_size(self._formats[fid], self.duration)
+            fmt = {
+                'format_id': fid, 'ext': ext, 'vcodec': vcodec, 'acodec': acodec, 'tbr': tbr,
+                'height': height, 'width': height and height * 16 // 9, 'fps': 30 if height else None,
+                'filesize': size,
+            }
+            if protocol == 'm3u8_native':
+                fmt.update(protocol=protocol, url=f"{base}/hls/{video_id}/{fid}.m3u8", filesize=None, filesize_approx=size)
+            elif protocol == 'http_dash_segments':
+                fmt.update(protocol=protocol, url=f"{base}/dash/{video_id}/{fid}/", container='mp4_dash',
+                           fragment_base_url=f"{base}/dash/{video_id}/{fid}/",
+                           fragments=[{'path': f"{i}.m4s", 'duration': self.segment_seconds} for i in range(n)])
+            else:
+                fmt.update(url=f"{base}/media/{video_id}/{fid}", filesize=self.body(fid).size)
+            formats.append(fmt)
+        return {'id': video_id, 'title': f"Bench {video_id}", 'duration': self.duration, 'formats': formats,
+                'subtitles': {'en': [{'ext': 'vtt', 'url': f"{base}/subs/{video_id}/en.vtt"}]}}
+
+    def _handle(self, handler):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        parts = [p for p in handler.path.split('?', 1)[0].split('/') if p]
+        try:
+            if len(parts) == 2 and parts[0] == 'api':
+                body = json.dumps(self.video_info(parts[1])).encode('utf-8')
+                return self._send(handler, 200, 'application/json', len(body), body=body)
+            if len(parts) == 3 and parts[0] == 'subs' and parts[2].endswith('.vtt'):
+                body = SUBTITLE_VTT.encode('utf-8')
+                return self._send(handler, 200, 'text/vtt', len(body), body=body)
+            if len(parts) == 3 and parts[0] == 'media' and parts[2] in self._formats:
+                return self._send_range(handler, self.body(parts[2]))
+            if len(parts) == 3 and parts[0] == 'hls' and parts[2].endswith('.m3u8'):
+                fid = parts[2][:-5]
+                lines = ['#EXTM3U', '#EXT-X-VERSION:7', f'#EXT-X-TARGETDURATION:{self.segment_seconds}', '#EXT-X-MEDIA-SEQUENCE:0']
+                if self.samples:
+                    lines.append(f'#EXT-X-MAP:URI="{fid}/init.mp4"')
+                ext = 'm4s' if self.samples else 'ts'
+                for i in range(self.segments()):
+                    lines += [f'#EXTINF:{self.segment_seconds}.0,', f'{fid}/{i}.{ext}']
+                body = ('\n'.join(lines + ['#EXT-X-ENDLIST']) + '\n').encode('utf-8')
+                return self._send(handler, 200, 'application/vnd.apple.mpegurl', len(body), body=body)
+            if len(parts) == 4 and parts[0] == 'hls' and parts[3] == 'init.mp4' and self.samples:
+                body = self.samples['hls-init']
+                return self._send(handler, 200, 'video/mp4', len(body), body=body)
+            if len(parts) == 4 and parts[0] in ('hls', 'dash') and parts[2] in self._formats:
+                body = self.body(parts[2], int(parts[3].split('.', 1)[0]))
+                ctype = 'video/mp2t' if parts[0] == 'hls' and not self.samples else 'video/iso.segment'
+                return self._send(handler, 200, ctype, body.size, media=body)
+            self._send(handler, 404, 'text/plain', 0)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _send_range(self, handler, media):
+        size = media.size
+        rng = handler.headers.get('Range')
+        if rng and rng.startswith('bytes='):
+            first, _, last = rng[6:].partition('-')
+            start = int(first or 0)
+            end = min(int(last) + 1 if last else size, size)
+            if start >= size:
+                handler.send_response(416)
+                handler.send_header('Content-Range', f'bytes */{size}')
+                handler.send_header('Content-Length', '0')
+                handler.end_headers()
+                return
+            return self._send(handler, 206, 'video/mp4', end - start, media=media, offset=start,
+                              extra={'Content-Range': f'bytes {start}-{end - 1}/{size}'})
+        self._send(handler, 200, 'video/mp4', size, media=media)
+
+    def _send(self, handler, status, ctype, length, body=None, media=None, offset=0, extra=None):
+        handler.send_response(status)
+        handler.send_header('Content-Type', ctype)
+        handler.send_header('Content-Length', str(length))
+        handler.send_header('Accept-Ranges', 'bytes')
+        for key, value in (extra or {}).items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        if body is not None:
+            handler.wfile.write(body)
+            return
+        if media is None:
+            return
+        remaining = length
+        started, sent = time.monotonic(), 0
+        try:
+            while remaining > 0:
+                n = min(BODY_CHUNK, remaining)
+                handler.wfile.write(media.read(offset, n))
+                offset += n
+                remaining -= n
+                sent += n
+                if self.bandwidth:
+                    ahead = sent / self.bandwidth - (time.monotonic() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        finally:
+            with self._sent_lock:
+                self.sent += sent
+
+def install_bench_extractor(api_base):
+    """让引擎创建的 YoutubeDL 优先使用假提取器（URL 形如 bench:<视频ID>），返回提取器类（calls 为解析次数）"""
+    core.load_yt_dlp()
+    from yt_dlp.extractor.common import InfoExtractor
+    lock = threading.Lock()
+
+    class BenchIE(InfoExtractor):
+        IE_NAME = 'bench'
+        _VALID_URL = r'bench:(?P<id>[\w-]+)$'
+        calls = 0
+
+        def _real_extract(self, url):
+            video_id = self._match_id(url)
+            with lock:
+                BenchIE.calls += 1
+            return self._download_json(f"{api_base}/api/{video_id}", video_id)
+
+    class BenchYoutubeDL(core.YoutubeDL):
+        def add_default_info_extractors(self):
+            # 排在通用提取器之前
+            self.add_info_extractor(BenchIE())
+            super().add_default_info_extractors()
+
+    core.YoutubeDL = BenchYoutubeDL
+    return BenchIE
+
+class LagProbe:
+    """模拟界面的进度刷新循环：按 hz 定时醒来读取 ProgressBoard（与 GUI 的 _progress_tick 相同），
+    记录实际唤醒时间相对计划的延迟；下载线程占用 GIL 越久，这个延迟越大"""
+
+    def __init__(self, board, hz=10):
+        self.board = board
+        self.interval = 1.0 / hz
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.samples = []
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="lag-probe", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.summary()
+
+    def _run(self):
+        due = time.monotonic() + self.interval
+        while not self._stop.is_set():
+            time.sleep(max(0.0, due - time.monotonic()))
+            now = time.monotonic()
+            self.samples.append(now - due)
+            self.board.mark_tick(time.perf_counter())
+            self.board.snapshot()
+            due = max(due + self.interval, now)
+
+    def summary(self):
+        if not self.samples:
+            return {'avg_ms': None, 'p95_ms': None, 'max_ms': None}
+        ordered = sorted(self.samples)
+        return {
+            'avg_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+            'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+            'max_ms': round(ordered[-1] * 1000, 2),
+        }
+
+def peak_rss():
+    """进程峰值常驻内存（字节），无法获取时为 None"""
+    try:
+        import resource
+    except ImportError:
+        return _peak_rss_windows()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def _peak_rss_windows():
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage', 'QuotaPagedPoolUsage',
+                    'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+
+        counters = Counters()
+        counters.cb = ctypes.sizeof(Counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+    except Exception:
+        pass
+    return None
+
+def scenario_plan(name, info, can_merge):
+    """选择步骤：与格式选择对话框相同，由视频 × 音频生成组合；不能合并（没有 ffmpeg 样本）时改为逐个单独下载"""
+    available = {f['format_id'] for f in info.get('formats') or []}
+    if name == 'progressive':
+        videos, audios = ['137', '136'], ['140', '251']
+        plan = core.DownloadEngine.expand_batch(videos, audios) if can_merge else videos + audios
+    elif name == 'hls':
+        plan = ['hls-720', 'hls-480']
+    elif name == 'dash':
+        plan = ['dash-720', 'dash-480']
+    else:
+        plan = ['18']
+    missing = [fid for fmt in plan for fid in fmt.split('+') if fid not in available]
+    if missing:
+        raise RuntimeError(f"formats not offered by the stub extractor: {missing}")
+    return plan
+
+class Benchmark:
+    """按场景运行 解析 → 选择 → 批量下载（queue 场景走队列 + 预取），汇总每个场景的指标"""
+
+    def __init__(self, server, bench_ie, workdir, workers=3, queue_size=6, hz=10,
+                 overlap_pp=True, auto_tune=True, trace_memory=False, verbose=False):
+        self.server = server
+        self.bench_ie = bench_ie
+        self.workdir = workdir
+        self.workers = workers
+        self.queue_size = queue_size
+        self.trace_memory = trace_memory
+        self.verbose = verbose
+        # 合成内容无法合并：只有服务器提供真实样本时才下载需要合并的组合
+        self.can_merge = server.samples is not None
+        self.errors = []
+        settings = core.EngineSettings(enable_ejs=False, use_archive=False, check_disk_space=False,
+                                       overlap_pp=overlap_pp, auto_tune=auto_tune)
+        self.engine = core.DownloadEngine(settings, log=self._log, app_dir=os.path.join(workdir, 'app'))
+        self.probe = LagProbe(self.engine.progress_board, hz)
+
+    def _log(self, msg, tag="info"):
+        if tag == "error":
+            self.errors.append(msg)
+        if self.verbose:
+            core.print_log(msg, tag)
+
+    def run(self, scenarios):
+        with ExitStack() as stack:
+            if not self.verbose:
+                # yt-dlp 的进度输出写到空设备，避免终端输出拖慢测量；
+                # 会话池中的 YoutubeDL 会保留这个输出流，所以整轮只打开一次
+                null = stack.enter_context(open(os.devnull, 'w'))
+                stack.enter_context(redirect_stdout(null))
+                stack.enter_context(redirect_stderr(null))
+            # 预热：加载提取器列表并建立一个会话，解析耗时只反映单个 URL 的成本
+            core.normalize_url("bench:warmup")
+            with self.engine.sessions.session(self.engine.extract_opts()):
+                pass
+            results = [self._run_scenario(name) for name in scenarios]
+            self.engine.sessions.close_all()
+        return results
+
+    def _run_scenario(self, name):
+        outdir = os.path.join(self.workdir, name)
+        os.makedirs(outdir, exist_ok=True)
+        errors_before = len(self.errors)
+        requests_before, sent_before = self.server.requests, self.server.sent
+        self.bench_ie.calls = 0
+        if self.trace_memory:
+            tracemalloc.start()
+        self.engine.begin()
+        self.probe.start()
+        started = time.monotonic()
+        if name == 'queue':
+            # 队列中的解析（预取与任务）与下载交错进行，不单独计时
+            parse_s = None
+            plan, ok, total, batch_calls, batches = self._run_queue(name, outdir)
+            download_started = started
+        elif name == 'postprocess':
+            parse_s = None
+            plan, ok, total, batch_calls, batches = self._run_postprocess(name, outdir)
+            download_started = started
+        else:
+            url = f"bench:{name}"
+            info = self.engine.parse(url)
+            parse_s = time.monotonic() - started
+            plan = scenario_plan(name, info, self.can_merge)
+            calls = self.bench_ie.calls
+            download_started = time.monotonic()
+            ok, total = self.engine.run_batch(url, outdir, plan, self.workers)
+            batch_calls, batches = self.bench_ie.calls - calls, 1
+        finished = time.monotonic()
+        seconds, download_s = finished - started, finished - download_started
+        lag = self.probe.stop()
+        board = self.engine.progress_board.stats()
+        traced = None
+        if self.trace_memory:
+            traced = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        received = self.server.sent - sent_before
+        return {
+            'scenario': name, 'plan': plan, 'succeeded': ok, 'total': total,
+            'bytes': received, 'seconds': round(seconds, 3), 'download_s': round(download_s, 3),
+            'throughput_bps': round(received / download_s) if download_s else None,
+            'parse_s': None if parse_s is None else round(parse_s, 3),
+            'extract_calls_per_batch': round(batch_calls / batches, 2),
+            'http_requests': self.server.requests - requests_before,
+            'lag_ms': lag, 'progress_events': board['events'], 'ui_ticks': board['ticks'],
+            'peak_rss': peak_rss(), 'peak_traced': traced,
+            'errors': self.errors[errors_before:],
+        }
+
+    def _run_queue(self, name, outdir):
+        """队列场景：一次加入多个 URL，后台预取格式后依次下载（每个 URL 一个任务）；
+        任务使用界面未选择格式时的默认表达式（需要合并，不能合并时改为单个渐进式格式），失败计入结果"""
+        urls = [f"bench:{name}-{i}" for i in range(self.queue_size)]
+        plan = [core.DEFAULT_FORMAT] if self.can_merge else ['18']
+        self.engine.prefetcher.submit(urls)
+        for url in urls:
+            self.engine.journal.add(url, outdir, plan)
+        done, failed = self.engine.run_queue(self.workers)
+        # 预取与任务中的解析都计入
+        return plan, done, done + failed, self.bench_ie.calls, len(urls)
+
+    def _run_postprocess(self, name, outdir):
+        """后处理场景：每种设置下载同一个 URL 的两个组合（仅提取音频时合为一次下载），结果文件不符合预期的组合计为失败"""
+        settings = self.engine.settings
+        plan = ['137+140', '136+251']
+        ok = total = calls = 0
+        for run, changes in POSTPROCESS_RUNS:
+            saved = {key: getattr(settings, key) for key in changes}
+            folder = os.path.join(outdir, run)
+            os.makedirs(folder, exist_ok=True)
+            url = f"bench:{name}-{run}"
+            try:
+                for key, value in changes.items():
+                    setattr(settings, key, value)
+                self.engine.parse(url)
+                before = self.bench_ie.calls
+                success, count = self.engine.run_batch(url, folder, plan, self.workers)
+                calls += self.bench_ie.calls - before
+            finally:
+                for key, value in saved.items():
+                    setattr(settings, key, value)
+            problems = postprocess_problems(run, folder)
+            for problem in problems:
+                self._log(f"{run}: {problem}", "error")
+            ok += 0 if problems else success
+            total += count
+        return [run for run, _ in POSTPROCESS_RUNS], ok, total, calls, len(POSTPROCESS_RUNS)
+
+def postprocess_problems(run, folder):
+    """检查后处理场景的输出：仅提取音频时只应留下音频文件；嵌入字幕时每个视频都应带字幕轨，且不应留下单独的字幕文件"""
+    files = [f for f in os.listdir(folder) if not f.startswith('.')]
+    exts = [f.rsplit('.', 1)[-1].lower() for f in files]
+    if not files:
+        return ["no output file"]
+    if run.startswith('audio'):
+        # 各组合的音频相同，只应下载一次
+        expected = ('mp3',) if run == 'audio-mp3' else AUDIO_EXTS
+        problems = [f"unexpected output {f}" for f, ext in zip(files, exts) if ext not in expected]
+        return problems + ([f"{len(files)} audio files instead of 1"] if len(files) > 1 else [])
+    problems = []
+    for f, ext in zip(files, exts):
+        if ext in ('vtt', 'srt'):
+            problems.append(f"subtitle left next to the video: {f}")
+        elif not subtitle_streams(os.path.join(folder, f)):
+            problems.append(f"no subtitle track in {f}")
+    return problems
+
+def subtitle_streams(path):
+    """用 ffprobe 数出文件中的字幕轨"""
+    out = subprocess.run([shutil.which('ffprobe'), '-v', 'error', '-select_streams', 's',
+                          '-show_entries', 'stream=index', '-of', 'csv=p=0', path],
+                         capture_output=True, text=True).stdout
+    return len(out.split())
+
+def compare(results, baseline, tolerance):
+    """与基线报告比较：吞吐下降超过 tolerance、每批解析次数增加或成功数减少视为回归，返回说明列表"""
+    old = {r['scenario']: r for r in baseline.get('results') or []}
+    regressions = []
+    for r in results:
+        b = old.get(r['scenario'])
+        if not b:
+            continue
+        if b.get('throughput_bps') and r['throughput_bps'] is not None and r['throughput_bps'] < b['throughput_bps'] * (1 - tolerance):
+            regressions.append(f"{r['scenario']}: throughput {core.format_bytes(r['throughput_bps'])}/s "
+                               f"< baseline {core.format_bytes(b['throughput_bps'])}/s")
+        if r['extract_calls_per_batch'] > b.get('extract_calls_per_batch', r['extract_calls_per_batch']):
+            regressions.append(f"{r['scenario']}: {r['extract_calls_per_batch']} extraction calls per batch "
+                               f"(baseline {b['extract_calls_per_batch']})")
+        if r['succeeded'] < b.get('succeeded', 0):
+            regressions.append(f"{r['scenario']}: {r['succeeded']}/{r['total']} succeeded (baseline {b['succeeded']})")
+    return regressions
+
+def print_report(results, out=sys.stdout):
+    head = f"{'scenario':<12}{'ok':>6}{'size':>11}{'time':>9}{'speed':>13}{'parse':>8}{'calls':>7}{'lag avg/p95/max ms':>22}{'peak RSS':>11}"
+    print(head, file=out)
+    print('-' * len(head), file=out)
+    for r in results:
+        lag = r['lag_ms']
+        lag_str = '/'.join('-' if lag[k] is None else f"{lag[k]:.1f}" for k in ('avg_ms', 'p95_ms', 'max_ms'))
+        speed = f"{core.format_bytes(r['throughput_bps'])}/s" if r['throughput_bps'] else '-'
+        rss = core.format_bytes(r['peak_rss']) if r['peak_rss'] else '-'
+        parse = '-' if r['parse_s'] is None else f"{r['parse_s']:.2f}s"
+        print(f"{r['scenario']:<12}{r['succeeded']:>3}/{r['total']:<2}{core.format_bytes(r['bytes']):>11}{r['seconds']:>8.2f}s"
+              f"{speed:>13}{parse:>8}{r['extract_calls_per_batch']:>7}{lag_str:>22}{rss:>11}", file=out)
+        if r['peak_traced']:
+            print(f"{'':<12}python heap peak {core.format_bytes(r['peak_traced'])}", file=out)
+        for err in r['errors']:
+            print(f"{'':<12}error: {err}", file=out)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="offline benchmark of the parse -> select -> batch download path")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="scenario to run, repeatable (default: all)")
+    parser.add_argument("--duration", type=float, default=20, help="synthetic media duration in seconds (sizes scale with it)")
+    parser.add_argument("--latency", type=float, default=20, help="server latency per request in ms")
+    parser.add_argument("--bandwidth", type=float, default=0, help="bandwidth per connection in MB/s (0 = unlimited)")
+    parser.add_argument("--segment", type=float, default=4, help="HLS/DASH segment length in seconds")
+    parser.add_argument("-j", "--jobs", type=int, default=3, help=f"concurrent jobs per URL (1-{core.MAX_CONCURRENCY})")
+    parser.add_argument("--queue-size", type=int, default=6, help="URLs in the queue scenario")
+    parser.add_argument("--hz", type=float, default=10, help="simulated UI refresh rate for the lag probe")
+    parser.add_argument("--no-overlap-pp", action="store_true", help="post-process inside each download")
+    parser.add_argument("--no-tune", action="store_true", help="disable fragment/chunk auto-tuning")
+    parser.add_argument("--trace-memory", action="store_true", help="also report the Python heap peak (tracemalloc, slower)")
+    parser.add_argument("--json", default=None, help="write the report to this JSON file")
+    parser.add_argument("--baseline", default=None, help="compare with a previous --json report and exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed throughput drop against the baseline (fraction)")
+    parser.add_argument("--keep", default=None, help="keep downloaded files in this folder instead of a temporary one")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show engine and yt-dlp output")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    scenarios = args.scenario or list(SCENARIOS)
+    workdir = args.keep or tempfile.mkdtemp(prefix="yt-dlp-bench-")
+    ffmpeg = shutil.which('ffmpeg')
+    samples = None
+    if ffmpeg:
+        folder = os.path.join(workdir, 'samples')
+        os.makedirs(folder, exist_ok=True)
+        samples = generate_samples(ffmpeg, folder, max(1, math.ceil(args.duration / args.segment)))
+    server = MediaServer(duration=args.duration, latency=args.latency / 1000, bandwidth=args.bandwidth * 1024 * 1024,
+                         segment_seconds=args.segment, samples=samples).start()
+    try:
+        bench_ie = install_bench_extractor(server.base_url)
+        bench = Benchmark(server, bench_ie, workdir, workers=max(1, min(core.MAX_CONCURRENCY, args.jobs)),
+                          queue_size=args.queue_size, hz=args.hz, overlap_pp=not args.no_overlap_pp,
+                          auto_tune=not args.no_tune, trace_memory=args.trace_memory, verbose=args.verbose)
+        if not bench.can_merge:
+            reason = "could not create media samples" if ffmpeg else "not found"
+            print(f"ffmpeg {reason}: progressive combos are downloaded as single streams", file=sys.stderr)
+        if 'postprocess' in scenarios and not (bench.can_merge and shutil.which('ffprobe')):
+            # 保留原编码的音频提取要用 ffprobe 识别编码
+            print("skipping the postprocess scenario (needs ffmpeg and ffprobe)", file=sys.stderr)
+            scenarios = [name for name in scenarios if name != 'postprocess']
+        results = bench.run(scenarios)
+    finally:
+        server.stop()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results)
+    report = {
+        'time': time.time(),
+        'config': {k: v for k, v in vars(args).items() if k not in ('json', 'baseline', 'keep')},
+        'ffmpeg': bench.can_merge,
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+    return 1 if any(r['succeeded'] < r['total'] for r in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
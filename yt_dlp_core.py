@@ -0,0 +1,2347 @@
+#!/usr/bin/env python3
+"""
+yt-dlp GUI 下载引擎（不依赖 Tk）
+- 解析缓存、格式计划、批量/队列下载、带宽与分片调节
+- 供 yt_dlp_gui.py 使用，也可无界面运行：python yt_dlp_core.py URL ... -f 137+140 -o DIR
+"""
+
+import os
+import re
+import sys
+import csv
+import json
+import time
+import signal
+import argparse
+import hashlib
+import shutil
+import atexit
+import tempfile
+import subprocess
+import weakref
+import sqlite3
+import threading
+from bisect import bisect_right
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, CancelledError, wait
+from functools import lru_cache, partial
+from glob import escape as glob_escape
+from itertools import product
+from pathlib import Path
+from urllib.parse import urlsplit
+
+# yt_dlp 导入时会加载全部提取器，较慢：窗口显示后由后台线程调用 load_yt_dlp() 导入，
+# 工作线程使用前同样调用 load_yt_dlp()（已导入时立即返回）
+YoutubeDL = None
+Request = None
+gen_extractor_classes = None
+FFmpegMergerPP = get_postprocessor = None
+DownloadCancelled = DownloadError = POSTPROCESS_WHEN = None
+get_compatible_ext = sanitize_filename = None
+extract_cookies_from_browser = None
+HAVE_EJS = False
+YT_DLP_IMPORT_ERROR = None
+_YT_DLP_LOCK = threading.Lock()
+
+def load_yt_dlp():
+    global YoutubeDL, gen_extractor_classes, FFmpegMergerPP, get_postprocessor, DownloadCancelled, DownloadError
+    global POSTPROCESS_WHEN, get_compatible_ext, sanitize_filename, HAVE_EJS, YT_DLP_IMPORT_ERROR
+    global extract_cookies_from_browser, Request
+    with _YT_DLP_LOCK:
+        if YoutubeDL is None and YT_DLP_IMPORT_ERROR is None:
+            try:
+                from yt_dlp import YoutubeDL
+                from yt_dlp.cookies import extract_cookies_from_browser
+                from yt_dlp.extractor import gen_extractor_classes
+                from yt_dlp.networking import Request
+                from yt_dlp.postprocessor import FFmpegMergerPP, get_postprocessor
+                from yt_dlp.utils import (
+                    POSTPROCESS_WHEN, DownloadCancelled, DownloadError, get_compatible_ext, sanitize_filename)
+            except ImportError as e:
+                YT_DLP_IMPORT_ERROR = e
+            else:
+                _track_subprocesses()
+                try:
+                    import yt_dlp_ejs  # noqa
+                    HAVE_EJS = True
+                except Exception:
+                    HAVE_EJS = False
+    if YT_DLP_IMPORT_ERROR is not None:
+        raise RuntimeError("未安装 yt-dlp，请执行: pip install -U yt-dlp") from YT_DLP_IMPORT_ERROR
+
+# yt-dlp 启动的子进程（ffmpeg 合并/转码、外部下载器、JS Runtime），取消时统一终止
+_CHILD_PROCESSES = weakref.WeakSet()
+_CHILD_LOCK = threading.Lock()
+# 当前线程所属任务的 CancelScope：子进程创建时同时登记到该任务
+_SCOPE = threading.local()
+
+def _track_subprocesses():
+    """登记 yt_dlp.utils.Popen 创建的每个子进程（导入 yt_dlp 后调用一次）"""
+    from yt_dlp.utils import Popen
+    init = Popen.__init__
+
+    def tracked_init(self, *args, **kwargs):
+        init(self, *args, **kwargs)
+        with _CHILD_LOCK:
+            _CHILD_PROCESSES.add(self)
+        scope = getattr(_SCOPE, 'current', None)
+        if scope is not None:
+            scope.add_process(self)
+
+    Popen.__init__ = tracked_init
+
+def terminate_subprocesses(timeout=3, processes=None):
+    """终止仍在运行的 yt-dlp 子进程（默认全部），超时未退出的强制结束，返回终止的进程数"""
+    with _CHILD_LOCK:
+        procs = [p for p in (_CHILD_PROCESSES if processes is None else processes) if p.poll() is None]
+    for p in procs:
+        p.terminate()
+    for p in procs:
+        try:
+            p.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            p.kill()
+    return len(procs)
+
+class CancelScope:
+    """一个任务的取消范围：任务的下载/合并/后处理线程在 active() 内运行，期间创建的子进程与临时文件记在这里；
+    单独取消任务时只终止这些子进程，其他任务（例如上一个任务的后台后处理）不受影响"""
+
+    def __init__(self):
+        self.canceled = False
+        self.partial_files = set()
+        self._procs = weakref.WeakSet()
+
+    def add_process(self, proc):
+        with _CHILD_LOCK:
+            self._procs.add(proc)
+
+    @contextmanager
+    def active(self):
+        previous = getattr(_SCOPE, 'current', None)
+        _SCOPE.current = self
+        try:
+            yield self
+        finally:
+            _SCOPE.current = previous
+
+    def cancel(self):
+        """标记取消并终止本任务的子进程，返回终止的进程数"""
+        self.canceled = True
+        with _CHILD_LOCK:
+            procs = list(self._procs)
+        return terminate_subprocesses(processes=procs)
+
+def remove_partial_files(filenames):
+    """删除下载中断留下的 .part、分片（-FragN）与 .ytdl 续传记录，返回删除的文件数"""
+    removed = 0
+    for name in filenames:
+        base = Path(name)
+        candidates = [base, Path(f"{name}.ytdl"), *base.parent.glob(f"{glob_escape(base.name)}-Frag*")]
+        if name.endswith('.part'):
+            candidates.append(Path(f"{name[:-len('.part')]}.ytdl"))
+        for fp in candidates:
+            try:
+                fp.unlink()
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+# 上一轮格式选择/下载写入 info 的字段，复用解析结果前需去掉
+PROCESSED_INFO_KEYS = frozenset({
+    'requested_downloads', 'requested_formats', 'requested_subtitles',
+    'filepath', '_filename', 'filename',
+})
+
+def fresh_info(info):
+    """复制已解析的 info dict，使其可再次交给 process_ie_result 做格式选择"""
+    fresh = {k: v for k, v in info.items() if k not in PROCESSED_INFO_KEYS and not k.startswith('__')}
+    fresh['formats'] = [dict(f) for f in info.get('formats') or []]
+    # 写字幕时 yt-dlp 会在字幕轨上记录 filepath，并发的组合各用一份
+    for key in ('subtitles', 'automatic_captions'):
+        if info.get(key):
+            fresh[key] = {lang: [dict(t) for t in tracks] for lang, tracks in info[key].items()}
+    return fresh
+
+# 复用的 info 中直链过期的表现：HTTP 403/410 或提示链接已过期；只有这类错误值得重新提取，
+# 格式不可用、合并失败、磁盘错误等重新提取后仍会失败
+STALE_URL_STATUS = (403, 410)
+STALE_URL_PATTERN = re.compile(r'HTTP Error (?:403|410)\b|\bexpired\b', re.IGNORECASE)
+
+def is_stale_url_error(e):
+    """沿 DownloadError.exc_info 与异常链查找直链过期的错误"""
+    seen = set()
+    while e is not None and id(e) not in seen:
+        seen.add(id(e))
+        if getattr(e, 'status', None) in STALE_URL_STATUS or getattr(e, 'code', None) in STALE_URL_STATUS:
+            return True
+        if STALE_URL_PATTERN.search(str(e)):
+            return True
+        exc_info = getattr(e, 'exc_info', None)
+        e = (exc_info[1] if exc_info else None) or e.__cause__ or e.__context__
+    return False
+
+def audio_outcome(info):
+    """仅提取音频下载结果的处理方式：[(文件名, 源编码, 最终扩展名, 是否重新编码)]"""
+    info = info or {}
+    outcomes = []
+    for d in info.get('requested_downloads') or [info]:
+        # yt-dlp 会从 requested_downloads 中去掉与顶层相同的字段（单个格式时 acodec、ext 等都在顶层）
+        d = {**info, **d}
+        path = d.get('filepath')
+        if not path:
+            continue
+        codec = (d.get('acodec') or 'unknown').split('.')[0]
+        ext = d.get('ext') or os.path.splitext(path)[1].lstrip('.')
+        # FFmpegExtractAudio 只在无法直接封装时才编码为 mp3
+        outcomes.append((os.path.basename(path), codec, ext, ext == 'mp3' and codec != 'mp3'))
+    return outcomes
+
+# 批量去重下载时各独立流的暂存目录（位于输出目录下，便于中断后续传）
+STAGING_DIR = ".yt-dlp-staging"
+# 批量下载每个组合的文件名，与流复用合并的 "标题.f组合.扩展名" 一致
+COMBO_OUTTMPL = '%(title)s.f%(format_id)s.%(ext)s'
+# 未选择格式时的默认格式（选择表达式，由 yt-dlp 逐组合选择，不走流复用）
+DEFAULT_FORMAT = 'bestvideo+bestaudio/best'
+MAX_CONCURRENCY = 8
+
+class ProgressBoard:
+    """进度事件的"最新值"槽位：工作线程只覆盖写入各自任务的槽位（一次 dict 赋值，无锁），
+    UI 以固定频率统一读取，不再为每次回调向 Tk 事件队列投递任务"""
+
+    def __init__(self):
+        self._slots = {}
+        self.total = 0
+        self.reset_stats()
+
+    def begin(self, total=0):
+        """开始新一组任务：清空槽位，total 为参与平均进度的任务数"""
+        self._slots = {}
+        self.total = total
+
+    def post(self, job, d):
+        self._slots[job] = d
+        self.events += 1
+
+    def snapshot(self):
+        return dict(self._slots)
+
+    def reset_stats(self):
+        self.events = 0
+        self.ticks = 0
+        self._tick_time = 0.0
+        self._last_tick = None
+
+    def mark_tick(self, now):
+        if self._last_tick is not None:
+            self._tick_time += now - self._last_tick
+            self.ticks += 1
+        self._last_tick = now
+
+    def stats(self):
+        avg = self._tick_time / self.ticks if self.ticks else 0.0
+        return {'events': self.events, 'ticks': self.ticks, 'avg_interval_ms': avg * 1000}
+
+# 分片并发数档位、HTTP 分块大小范围（按实测吞吐约 CHUNK_TARGET_SECONDS 秒一块）
+FRAGMENT_LEVELS = (1, 2, 4, 8, 16)
+CHUNK_MIN = 1024 * 1024
+CHUNK_MAX = 64 * 1024 * 1024
+CHUNK_TARGET_SECONDS = 4
+# 小于该大小的下载测得的吞吐不可靠，不参与调节
+TUNE_MIN_BYTES = 2 * 1024 * 1024
+TUNE_SMOOTHING = 0.5
+
+class DownloadTuner:
+    """下载参数调节：按已完成下载的实测吞吐调整之后任务的 concurrent_fragment_downloads
+    （爬山法：上一档未测过或更快则升档，下一档更快则降档）与 http_chunk_size"""
+
+    def __init__(self, level=2, chunk_size=10 * 1024 * 1024):
+        self.level = level
+        self.chunk_size = chunk_size
+        self.rates = {}
+        self.last_rate = None
+        self.version = 0
+        self._fragmented = set()
+        self._lock = threading.Lock()
+
+    def settings(self):
+        with self._lock:
+            return {'concurrent_fragment_downloads': FRAGMENT_LEVELS[self.level], 'http_chunk_size': self.chunk_size}
+
+    def describe(self):
+        st = self.settings()
+        rate = f"{self.last_rate / 1024 / 1024:.2f} MB/s" if self.last_rate else "N/A"
+        return (f"fragments x{st['concurrent_fragment_downloads']}, "
+                f"chunk {st['http_chunk_size'] // 1024 // 1024} MiB, last {rate}")
+
+    def observe(self, d, settings):
+        """接收一次进度回调（settings 为该任务开始时的参数），参数变化时返回说明文字"""
+        name = d.get('filename')
+        if d['status'] == 'downloading':
+            if d.get('fragment_count'):
+                self._fragmented.add(name)
+            return None
+        size = d.get('total_bytes') or d.get('downloaded_bytes') or 0
+        if d['status'] != 'finished' or not d.get('elapsed') or size < TUNE_MIN_BYTES:
+            return None
+        rate = size / d['elapsed']
+        with self._lock:
+            before = (self.level, self.chunk_size)
+            self.last_rate = rate
+            if name in self._fragmented:
+                self._fragmented.discard(name)
+                self._tune_fragments(settings['concurrent_fragment_downloads'], rate)
+            else:
+                chunk = int(rate * CHUNK_TARGET_SECONDS) // CHUNK_MIN * CHUNK_MIN
+                self.chunk_size = max(CHUNK_MIN, min(CHUNK_MAX, chunk))
+            self.version += 1
+            changed = before != (self.level, self.chunk_size)
+        return self.describe() if changed else None
+
+    def _tune_fragments(self, used, rate):
+        prev = self.rates.get(used)
+        self.rates[used] = rate if prev is None else TUNE_SMOOTHING * rate + (1 - TUNE_SMOOTHING) * prev
+        if used != FRAGMENT_LEVELS[self.level]:
+            return
+        rate = self.rates[used]
+        up = FRAGMENT_LEVELS[self.level + 1] if self.level + 1 < len(FRAGMENT_LEVELS) else None
+        down = FRAGMENT_LEVELS[self.level - 1] if self.level > 0 else None
+        if up is not None and (up not in self.rates or self.rates[up] > rate * 1.1):
+            self.level += 1
+        elif down is not None and self.rates.get(down, 0) > rate * 1.1:
+            self.level -= 1
+
+# 带宽调控：令牌桶容量（秒数 × 速率）与单次等待上限（保证取消及时生效）
+BUCKET_SECONDS = 1.0
+GOVERNOR_MAX_SLEEP = 0.5
+
+class BandwidthGovernor:
+    """全局带宽预算：令牌桶限制全部任务的总速率（在进度回调中按新增字节扣减），
+    同时把预算按公平或先后顺序拆成各任务 YoutubeDL 的 ratelimit，任务开始/结束时重新分配；
+    可选时段：仅在 [start, end) 小时内限速（可跨零点，起止相同时全天限速），其余时间不限"""
+
+    def __init__(self, on_change=None):
+        self.limit = None
+        self.schedule = None
+        self.split = 'fair'
+        self.on_change = on_change
+        self._jobs = {}
+        self._seq = 0
+        self._applied = None
+        self._tokens = 0.0
+        self._last = time.monotonic()
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def configure(self, limit=None, schedule=None, split='fair'):
+        """limit 为字节/秒（None 不限速），schedule 为 (起始小时, 结束小时) 或 None"""
+        with self._lock:
+            self.limit = limit or None
+            self.schedule = schedule
+            self.split = split
+            self._rebalance(self._effective_rate())
+
+    def _effective_rate(self):
+        if not self.limit or not self.schedule:
+            return self.limit
+        start, end = self.schedule
+        hour = time.localtime().tm_hour
+        # 起止相同（如 0-0）视为全天，而不是空时段
+        capped = start <= hour < end if start < end else (hour >= start or hour < end)
+        return self.limit if capped else None
+
+    def _rebalance(self, rate):
+        changed = rate != self._applied
+        self._applied = rate
+        jobs = sorted(self._jobs.values(), key=lambda job: job[0])
+        if self.split == 'ordered':
+            weights = [0.5 ** i for i in range(len(jobs))]
+        else:
+            weights = [1.0] * len(jobs)
+        total = sum(weights)
+        for (_, params), weight in zip(jobs, weights):
+            if rate:
+                params['ratelimit'] = max(1, int(rate * weight / total))
+            else:
+                params.pop('ratelimit', None)
+        if changed and self.on_change:
+            self.on_change(rate)
+
+    def register(self, params):
+        with self._lock:
+            self._seq += 1
+            self._jobs[id(params)] = (self._seq, params)
+            self._rebalance(self._effective_rate())
+
+    def unregister(self, params):
+        with self._lock:
+            self._jobs.pop(id(params), None)
+            params.pop('ratelimit', None)
+            self._rebalance(self._effective_rate())
+
+    def account(self, key, downloaded):
+        """记录某下载（key）累计字节数，按新增字节从令牌桶扣减，超出预算时等待"""
+        with self._lock:
+            rate = self._effective_rate()
+            if rate != self._applied:
+                self._rebalance(rate)
+            # 首次报告（含续传时已有的字节）只作为基准
+            prev = self._seen.get(key, downloaded)
+            delta = max(0, downloaded - prev)
+            self._seen[key] = max(downloaded, prev)
+            now = time.monotonic()
+            if not rate:
+                self._tokens, self._last = 0.0, now
+                return
+            self._tokens = min(rate * BUCKET_SECONDS, self._tokens + (now - self._last) * rate) - delta
+            self._last = now
+            wait = -self._tokens / rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(min(wait, GOVERNOR_MAX_SLEEP))
+
+    def forget(self, key):
+        with self._lock:
+            self._seen.pop(key, None)
+
+# 本地数据目录（队列日志等）
+APP_DIR = Path.home() / ".yt-dlp-gui"
+
+# 解析结果缓存：默认有效期（直链通常数小时后失效）与容量上限
+INFO_CACHE_TTL = 60 * 60
+INFO_CACHE_MAX_BYTES = 64 * 1024 * 1024
+INFO_CACHE_MAX_ENTRIES = 500
+# 缓存时丢弃的体积大、格式选择与下载用不到的字段
+INFO_CACHE_DROP_KEYS = ('automatic_captions', 'thumbnails', 'heatmap')
+
+@lru_cache(maxsize=256)
+def normalize_url(url):
+    """URL → 缓存/归档用的标识：能识别提取器时为 "提取器:视频ID"，否则为去掉锚点的 URL"""
+    url = url.strip()
+    for ie in gen_extractor_classes():
+        if ie.ie_key() != 'Generic' and ie.suitable(url):
+            temp_id = ie.get_temp_id(url)
+            if temp_id:
+                return f"{ie.ie_key()}:{temp_id}"
+            break
+    return url.split('#', 1)[0]
+
+def slim_info(info):
+    """可序列化、精简后的 info dict，仍可再交给 process_ie_result 使用"""
+    slim = YoutubeDL.sanitize_info(info, remove_private_keys=True)
+    for key in INFO_CACHE_DROP_KEYS:
+        slim.pop(key, None)
+    for fmt in slim.get('formats') or []:
+        # 无法序列化的分片生成器会被 sanitize 成字符串，丢弃后由下载失败回退重新解析
+        if not isinstance(fmt.get('fragments'), (list, type(None))):
+            fmt.pop('fragments')
+    return slim
+
+class InfoCache:
+    """磁盘上的解析结果缓存：每条一个 JSON 文件，按有效期过期，
+    超出容量时按最近访问时间（文件 mtime）做 LRU 淘汰"""
+
+    def __init__(self, path, max_bytes=INFO_CACHE_MAX_BYTES, max_entries=INFO_CACHE_MAX_ENTRIES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(url, **settings):
+        """键 = 归一化 URL + 影响解析结果的设置（Cookie 来源、EJS、Runtime）"""
+        raw = json.dumps({'url': normalize_url(url), **settings}, sort_keys=True)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def _file(self, key):
+        return self.path / f"{key}.json"
+
+    def get(self, key, ttl=INFO_CACHE_TTL):
+        fp = self._file(key)
+        with self._lock:
+            try:
+                with open(fp, encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                return None
+            if time.time() - entry.get('created', 0) > ttl:
+                fp.unlink(missing_ok=True)
+                return None
+            os.utime(fp)  # 记录访问时间供 LRU 使用
+            return entry['info']
+
+    def put(self, key, info):
+        self.path.mkdir(parents=True, exist_ok=True)
+        fp = self._file(key)
+        tmp = fp.with_suffix('.tmp')
+        with self._lock:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'created': time.time(), 'info': slim_info(info)}, f, ensure_ascii=False)
+            os.replace(tmp, fp)
+            self._evict()
+
+    def _evict(self):
+        entries = sorted((e.stat().st_mtime, e.stat().st_size, e) for e in self.path.glob('*.json'))
+        total = sum(size for _, size, _ in entries)
+        while entries and (total > self.max_bytes or len(entries) > self.max_entries):
+            _, size, fp = entries.pop(0)
+            fp.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            for fp in self.path.glob('*.json'):
+                fp.unlink(missing_ok=True)
+
+# 嵌入字幕：默认语言、同时下载的字幕轨数与磁盘缓存上限
+SUBTITLE_LANGS = ('zh-Hans', 'zh-Hant', 'en')
+SUBTITLE_WORKERS = 4
+SUBTITLE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+# 可直接整体下载的字幕轨（分片的 HLS/DASH 字幕仍交给 yt-dlp 下载）
+SUBTITLE_DIRECT_PROTOCOLS = (None, 'http', 'https')
+
+def select_subtitles(info, langs, formats='best', auto=False):
+    """按语言列表与格式偏好（如 "srt/vtt/best"）挑选字幕轨，返回 {语言: 轨道}；
+    规则与 yt-dlp 相同：同一语言优先人工字幕，auto=False 时完全不考虑自动生成字幕"""
+    available = dict(info.get('automatic_captions') or {}) if auto else {}
+    available.update(info.get('subtitles') or {})
+    picked = {}
+    for lang in langs:
+        tracks = available.get(lang)
+        if not tracks:
+            continue
+        for ext in (formats or 'best').split('/'):
+            track = tracks[-1] if ext == 'best' else next((t for t in reversed(tracks) if t.get('ext') == ext), None)
+            if track:
+                break
+        else:
+            track = tracks[-1]
+        picked[lang] = track
+    return picked
+
+class SubtitleCache:
+    """磁盘上的字幕缓存：按 "提取器-视频ID/语言.格式" 存放字幕文本，
+    同一视频的每个组合以及之后的下载都直接使用，超出容量时按访问时间淘汰"""
+
+    def __init__(self, path, max_bytes=SUBTITLE_CACHE_MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _file(self, info, lang, ext):
+        video = f"{info.get('extractor_key') or 'generic'}-{info.get('id')}"
+        return self.path / sanitize_filename(video, restricted=True) / sanitize_filename(f"{lang}.{ext}", restricted=True)
+
+    def get(self, info, lang, ext):
+        fp = self._file(info, lang, ext)
+        with self._lock:
+            try:
+                text = fp.read_text(encoding='utf-8')
+            except OSError:
+                return None
+            os.utime(fp)
+            return text
+
+    def put(self, info, lang, ext, text):
+        fp = self._file(info, lang, ext)
+        fp.parent.mkdir(parents=True, exist_ok=True)
+        tmp = fp.with_suffix('.tmp')
+        with self._lock:
+            tmp.write_text(text, encoding='utf-8', newline='')
+            os.replace(tmp, fp)
+            self._evict()
+
+    def _evict(self):
+        entries = sorted((e.stat().st_mtime, e.stat().st_size, e) for e in self.path.glob('*/*') if e.suffix != '.tmp')
+        total = sum(size for _, size, _ in entries)
+        while entries and total > self.max_bytes:
+            _, size, fp = entries.pop(0)
+            fp.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            shutil.rmtree(self.path, ignore_errors=True)
+
+# 决定 YoutubeDL 会话（Cookie、EJS、JS Runtime）的参数；其余参数按任务套用
+SESSION_KEYS = ('cookiefile', 'cookiesfrombrowser', 'remote_components', 'js_runtimes')
+SESSION_IDLE_TTL = 10 * 60
+
+def apply_job_opts(ydl, base_params, opts):
+    """把单个任务的参数（format/outtmpl/hooks/postprocessors 等）套用到已有 YoutubeDL 上，
+    保留其连接池、Cookie jar、已初始化的提取器与 JS Runtime"""
+    job = {k: v for k, v in opts.items() if k not in SESSION_KEYS}
+    progress_hooks = job.pop('progress_hooks', [])
+    pp_hooks = job.pop('postprocessor_hooks', [])
+    pp_defs = job.pop('postprocessors', [])
+    # 原地更新：下载器持有同一个 params 字典
+    ydl.params.clear()
+    ydl.params.update(base_params)
+    ydl.params['outtmpl'] = {}
+    ydl.params.update(job)
+    ydl._parse_outtmpl()
+    fmt = ydl.params.get('format')
+    ydl.format_selector = fmt if fmt in (None, '-') else ydl.build_format_selector(fmt)
+    ydl._progress_hooks = list(progress_hooks)
+    ydl._postprocessor_hooks = list(pp_hooks)
+    ydl._pps = {when: [] for when in POSTPROCESS_WHEN}
+    for pp_def in pp_defs:
+        pp_def = dict(pp_def)
+        when = pp_def.pop('when', 'post_process')
+        pp = get_postprocessor(pp_def.pop('key'))(ydl, **pp_def)
+        for ph in pp_hooks:
+            pp.add_progress_hook(ph)
+        ydl.add_post_processor(pp, when=when)
+    ydl._download_retcode = 0
+    ydl._num_downloads = 0
+
+class SessionPool:
+    """长期存活的 YoutubeDL 实例池，按会话参数（SESSION_KEYS）分组复用；
+    同一实例同一时间只借给一个任务，空闲超过 idle_ttl 的实例会被关闭"""
+
+    def __init__(self, max_idle=MAX_CONCURRENCY, idle_ttl=SESSION_IDLE_TTL):
+        self.max_idle = max_idle
+        self.idle_ttl = idle_ttl
+        self._idle = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    @staticmethod
+    def key(opts):
+        return json.dumps({k: opts.get(k) for k in SESSION_KEYS}, sort_keys=True, default=str)
+
+    def _checkout(self, key, opts):
+        now = time.time()
+        with self._lock:
+            entries = self._idle.get(key, [])
+            while entries:
+                ydl, base, last_used = entries.pop()
+                if now - last_used <= self.idle_ttl:
+                    self.reused += 1
+                    return ydl, base
+                ydl.close()
+            self.created += 1
+        ydl = YoutubeDL({k: opts[k] for k in SESSION_KEYS if k in opts})
+        return ydl, dict(ydl.params)
+
+    def acquire(self, opts):
+        """借出一个会话，返回 (ydl, token)；须以 release(ydl, token) 归还，可跨线程持有"""
+        key = self.key(opts)
+        ydl, base = self._checkout(key, opts)
+        try:
+            apply_job_opts(ydl, base, opts)
+        except BaseException:
+            ydl.close()
+            raise
+        return ydl, (key, base)
+
+    def release(self, ydl, token, ok=True):
+        if not ok:
+            # 出错的实例状态不可信，直接丢弃
+            ydl.close()
+            return
+        key, base = token
+        # 浏览器 Cookie 快照是所有会话共用的只读文件：写回会先截断，同时创建的会话可能读到空文件
+        if not is_cookie_snapshot(ydl.params.get('cookiefile')):
+            ydl.save_cookies()
+        with self._lock:
+            entries = self._idle.setdefault(key, [])
+            if len(entries) < self.max_idle:
+                entries.append((ydl, base, time.time()))
+                return
+        ydl.close()
+
+    @contextmanager
+    def session(self, opts):
+        ydl, token = self.acquire(opts)
+        try:
+            yield ydl
+        except BaseException:
+            self.release(ydl, token, ok=False)
+            raise
+        self.release(ydl, token)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for entries in idle.values():
+            for ydl, _, _ in entries:
+                ydl.close()
+
+# 后处理池：worker 数按 CPU 核数且至少 2 个（每个 worker 驱动一个 ffmpeg 子进程，合并/封装主要是磁盘 IO）；
+# 积压（排队 + 进行中）上限为 worker 数的两倍，满了之后下载线程等待，原始文件不会无限堆积
+POSTPROCESS_WORKERS = max(2, os.cpu_count() or 2)
+POSTPROCESS_BACKLOG = POSTPROCESS_WORKERS * 2
+
+class PostProcessPool:
+    """下载之后的合并/转码/嵌入字幕在这里执行，下载线程交出任务后立即开始下一个下载"""
+
+    def __init__(self, workers=POSTPROCESS_WORKERS, backlog=POSTPROCESS_BACKLOG):
+        self.workers = workers
+        self.backlog = backlog
+        self._slots = threading.BoundedSemaphore(backlog)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn, cancelled=lambda: False):
+        """积压已满时阻塞（反压），取消时抛出 DownloadCancelled；返回后处理的 Future"""
+        while not self._slots.acquire(timeout=0.2):
+            if cancelled():
+                raise DownloadCancelled()
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="postproc")
+        future = self._pool.submit(fn)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+# 浏览器 Cookie 快照有效期；Cookie 数据库文件有改动时也会提前失效
+BROWSER_COOKIE_TTL = 30 * 60
+# 快照文件名前缀（位于系统临时目录）
+COOKIE_SNAPSHOT_PREFIX = "yt-dlp-gui-cookies-"
+
+def is_cookie_snapshot(path):
+    return bool(path) and os.path.basename(str(path)).startswith(COOKIE_SNAPSHOT_PREFIX)
+
+class CookieDBLogger:
+    """extract_cookies_from_browser 的日志适配：记下实际读取的 Cookie 数据库路径，警告/错误转发到界面日志"""
+    DB_PREFIX = 'Extracting cookies from: "'
+
+    def __init__(self, log=None):
+        self.log = log
+        self.db_path = None
+
+    def debug(self, message):
+        if message.startswith(self.DB_PREFIX):
+            self.db_path = message[len(self.DB_PREFIX):].rstrip('"')
+
+    def info(self, message):
+        pass
+
+    def warning(self, message, only_once=False):
+        if self.log:
+            self.log(f"[cookies] {message}", "warning")
+
+    def error(self, message):
+        if self.log:
+            self.log(f"[cookies] {message}", "error")
+
+class BrowserCookieCache:
+    """浏览器 Cookie 快照：每个浏览器只读取并解密一次 Cookie 数据库，得到内存 jar，
+    再写入临时 cookie 文件供全部任务（cookiefile）共用；超过有效期或数据库 mtime 变化时重新读取"""
+
+    def __init__(self, ttl=BROWSER_COOKIE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshots = {}
+        self._files = []
+        atexit.register(self.cleanup)
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.path.getmtime(path)
+        except (OSError, TypeError):
+            return None
+
+    def _is_fresh(self, snap):
+        if time.time() - snap['created'] > self.ttl:
+            return False
+        # Safari 等拿不到数据库路径时只按有效期判断
+        return snap['db'] is None or self._mtime(snap['db']) == snap['db_mtime']
+
+    def get(self, browser, log=None):
+        """返回该浏览器的 Cookie 快照文件路径；持锁读取，并发任务只会等待同一次提取"""
+        with self._lock:
+            snap = self._snapshots.get(browser)
+            if snap and self._is_fresh(snap):
+                snap['hits'] += 1
+                return snap['path']
+            logger = CookieDBLogger(log)
+            jar = extract_cookies_from_browser(browser, logger=logger)
+            fd, path = tempfile.mkstemp(prefix=f"{COOKIE_SNAPSHOT_PREFIX}{browser}-", suffix=".txt")
+            os.close(fd)
+            jar.save(path)
+            self._files.append(path)
+            self._snapshots[browser] = {
+                'jar': jar, 'path': path, 'db': logger.db_path, 'db_mtime': self._mtime(logger.db_path),
+                'created': time.time(), 'hits': 0,
+            }
+            if log:
+                log(f"Browser cookies read once: {browser} ({len(jar)} cookies)", "success")
+            return path
+
+    def status(self, browser):
+        with self._lock:
+            snap = self._snapshots.get(browser)
+            if not snap or not self._is_fresh(snap):
+                return None
+            return {'count': len(snap['jar']), 'age': time.time() - snap['created'], 'hits': snap['hits']}
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshots.clear()
+
+    def cleanup(self):
+        for path in self._files:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._files.clear()
+
+class JobJournal:
+    """SQLite 下载队列日志：每个 URL 一条任务，记录格式计划与状态，进程重启后可恢复"""
+    STATES = ('queued', 'extracting', 'downloading', 'post-processing', 'done', 'failed')
+    ACTIVE_STATES = ('extracting', 'downloading', 'post-processing')
+
+    def __init__(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT NOT NULL,
+                    outdir TEXT NOT NULL,
+                    plan TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT 'queued',
+                    error TEXT,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL
+                )""")
+
+    def _row(self, row):
+        job = dict(row)
+        job['plan'] = json.loads(job['plan'])
+        return job
+
+    def add(self, url, outdir, plan):
+        now = time.time()
+        with self._lock, self._db:
+            cur = self._db.execute(
+                "INSERT INTO jobs (url, outdir, plan, state, created, updated) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (url, outdir, json.dumps(list(plan)), now, now))
+            return cur.lastrowid
+
+    def add_many(self, urls, outdir, plan):
+        """一次事务写入多条任务（播放列表条目），返回任务 ID 列表"""
+        now = time.time()
+        plan_json = json.dumps(list(plan))
+        ids = []
+        with self._lock, self._db:
+            for url in urls:
+                cur = self._db.execute(
+                    "INSERT INTO jobs (url, outdir, plan, state, created, updated) VALUES (?, ?, ?, 'queued', ?, ?)",
+                    (url, outdir, plan_json, now, now))
+                ids.append(cur.lastrowid)
+        return ids
+
+    def set_state(self, job_id, state, error=None):
+        assert state in self.STATES, state
+        with self._lock, self._db:
+            self._db.execute("UPDATE jobs SET state = ?, error = ?, updated = ? WHERE id = ?",
+                             (state, error, time.time(), job_id))
+
+    def jobs(self):
+        with self._lock:
+            return [self._row(r) for r in self._db.execute("SELECT * FROM jobs ORDER BY id")]
+
+    def job(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def next_queued(self):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE state = 'queued' ORDER BY id LIMIT 1").fetchone()
+        return self._row(row) if row else None
+
+    def recover(self):
+        """把上次异常退出时仍在进行中的任务放回队列，返回待处理任务数"""
+        marks = ", ".join("?" * len(self.ACTIVE_STATES))
+        with self._lock, self._db:
+            self._db.execute(f"UPDATE jobs SET state = 'queued', updated = ? WHERE state IN ({marks})",
+                             (time.time(), *self.ACTIVE_STATES))
+            return self._db.execute("SELECT COUNT(*) FROM jobs WHERE state = 'queued'").fetchone()[0]
+
+    def remove(self, job_ids):
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM jobs WHERE id = ?", [(i,) for i in job_ids])
+
+    def retry_failed(self):
+        with self._lock, self._db:
+            self._db.execute("UPDATE jobs SET state = 'queued', error = NULL, updated = ? WHERE state = 'failed'",
+                             (time.time(),))
+
+    def clear_done(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM jobs WHERE state = 'done'")
+
+class DownloadArchive:
+    """已完成组合的下载记录，每行 "视频标识<TAB>格式组合"；视频标识取自 normalize_url，
+    因此批量开始前无需解析即可跳过已完成的组合"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._done = None
+
+    def _entries(self):
+        if self._done is None:
+            self._done = set()
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    self._done.update(tuple(line.rstrip('\n').split('\t', 1)) for line in f if '\t' in line)
+            except OSError:
+                pass
+        return self._done
+
+    def has(self, video, combo):
+        with self._lock:
+            return (video, combo) in self._entries()
+
+    def add(self, video, combo):
+        with self._lock:
+            entries = self._entries()
+            if (video, combo) in entries:
+                return
+            entries.add((video, combo))
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(f"{video}\t{combo}\n")
+
+    def clear(self):
+        with self._lock:
+            self._done = set()
+            self.path.unlink(missing_ok=True)
+
+def literal_format_ids(batch_formats, info):
+    """组合计划是否全部由格式表中实际存在的 format_id 以 '+' 连接而成；
+    bestvideo+bestaudio/best 这类选择表达式须交给 yt-dlp 逐组合选择"""
+    available = {str(f.get('format_id')) for f in info.get('formats') or []}
+    return all(fid in available for fmt in batch_formats for fid in fmt.split('+'))
+
+def plan_streams(batch_formats):
+    """把批量组合拆成去重后的流 ID 列表，以及每个组合所需的流（组合须为 literal_format_ids）"""
+    streams, combos = [], []
+    for fmt in batch_formats:
+        parts = fmt.split('+')
+        for fid in parts:
+            if fid not in streams:
+                streams.append(fid)
+        combos.append((fmt, parts))
+    return streams, combos
+
+def expected_size(fmt, duration=None):
+    """格式的预计字节数：filesize → filesize_approx → 码率(tbr, kbps) × 时长；无法估计时为 None"""
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if size:
+        return int(size)
+    tbr = fmt.get('tbr') or (fmt.get('vbr') or 0) + (fmt.get('abr') or 0)
+    if tbr and duration:
+        return int(tbr * 1000 / 8 * duration)
+    return None
+
+def format_bytes(size):
+    if size is None:
+        return "?"
+    size = float(size)
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024.0:
+            return f"{size:.1f} {unit}"
+        size /= 1024.0
+    return f"{size:.1f} TB"
+
+class BudgetPlanner:
+    """体积/时间预算：构造时一次算出格式表中每个格式的预计体积，之后估算组合计划的总量、
+    在预算内推荐画质最高的组合都只查表（音频按体积排序并预先求出前缀最优，每个视频一次二分）"""
+
+    def __init__(self, info):
+        self.duration = info.get('duration')
+        self.sizes = {}
+        videos, audios, self.muxed = [], [], []
+        for fmt in info.get('formats') or []:
+            fid = str(fmt.get('format_id'))
+            size = self.sizes[fid] = expected_size(fmt, self.duration)
+            has_video = fmt.get('vcodec', 'none') != 'none'
+            has_audio = fmt.get('acodec', 'none') != 'none'
+            if size is None or not (has_video or has_audio):
+                continue
+            if has_video and has_audio:
+                self.muxed.append((self.video_quality(fmt), fid, size))
+            elif has_video:
+                videos.append((self.video_quality(fmt), fid, size))
+            else:
+                audios.append((self.audio_quality(fmt), fid, size))
+        self.videos = videos
+        audios.sort(key=lambda a: a[2])
+        self._audios = audios
+        self._audio_sizes = [a[2] for a in audios]
+        # _audio_best[i]：体积最小的 i+1 个音频中画质最高的一个
+        self._audio_best = []
+        for a in audios:
+            best = self._audio_best[-1] if self._audio_best else None
+            self._audio_best.append(a if best is None or a[0] > best[0] else best)
+
+    @staticmethod
+    def video_quality(fmt):
+        return (fmt.get('height') or 0, fmt.get('fps') or 0, fmt.get('vbr') or fmt.get('tbr') or 0)
+
+    @staticmethod
+    def audio_quality(fmt):
+        return (fmt.get('abr') or fmt.get('tbr') or 0, fmt.get('asr') or 0)
+
+    def size_of(self, combo):
+        """由格式 ID 组成的组合（如 137+140）的预计体积；含选择表达式或体积未知时为 None"""
+        total = 0
+        for fid in combo.split('+'):
+            size = self.sizes.get(fid)
+            if size is None:
+                return None
+            total += size
+        return total
+
+    def plan_total(self, combos):
+        """返回 (可估计部分的总字节数, 无法估计的组合列表)"""
+        total, unknown = 0, []
+        for combo in combos:
+            size = self.size_of(combo)
+            if size is None:
+                unknown.append(combo)
+            else:
+                total += size
+        return total, unknown
+
+    @staticmethod
+    def budget(max_bytes=None, rate=None, deadline=None):
+        """体积上限与 带宽(字节/秒) × 截止时间(秒) 中较小者；都未给出时为 None（不限）"""
+        limits = [b for b in (max_bytes, rate * deadline if rate and deadline else None) if b]
+        return min(limits) if limits else None
+
+    def suggest(self, budget=None, limit=5):
+        """预算内画质最高的组合，返回 [(组合, 预计字节数)]；同画质时体积小的优先"""
+        picks = []
+        for quality, vid, vsize in self.videos:
+            room = None if budget is None else budget - vsize
+            if room is not None and room < 0:
+                continue
+            i = len(self._audio_sizes) - 1 if room is None else bisect_right(self._audio_sizes, room) - 1
+            if i < 0:
+                continue
+            aq, aid, asize = self._audio_best[i]
+            picks.append(((quality, aq), f"{vid}+{aid}", vsize + asize))
+        for quality, fid, size in self.muxed:
+            if budget is None or size <= budget:
+                picks.append(((quality, ()), fid, size))
+        if not picks and not self.videos and not self.muxed:
+            # 纯音频内容：直接推荐音频格式
+            picks = [(((0,), aq), aid, asize) for aq, aid, asize in self._audios if budget is None or asize <= budget]
+        picks.sort(key=lambda p: (p[0], -p[2]), reverse=True)
+        return [(combo, size) for _, combo, size in picks[:limit]]
+
+# 播放列表/频道按页读取条目的大小
+PLAYLIST_CHUNK = 50
+# 平铺结果中作为播放列表处理的类型
+PLAYLIST_TYPES = ('playlist', 'multi_video', 'compat_list')
+
+def iter_playlist_entries(entries):
+    """逐条产出播放列表条目：生成器/列表直接迭代，分页列表（PagedList）按页读取，
+    因此只会请求实际迭代到的页"""
+    if hasattr(entries, 'getslice'):
+        start = 0
+        while True:
+            chunk = entries.getslice(start, start + PLAYLIST_CHUNK)
+            yield from chunk
+            if len(chunk) < PLAYLIST_CHUNK:
+                return
+            start += len(chunk)
+    else:
+        yield from entries or ()
+
+def flat_entry(entry, index):
+    """平铺的条目 → 列表显示与入队所需的字段；条目的格式留到下载时再解析"""
+    url = entry.get('webpage_url') or entry.get('url') or entry.get('original_url')
+    return {
+        'index': index,
+        'id': entry.get('id') or '',
+        'title': entry.get('title') or entry.get('id') or url,
+        'duration': entry.get('duration'),
+        'url': url,
+    }
+
+# 后台预取：总并发与每个站点的并发上限（同一站点请求过密容易被限流）
+PREFETCH_WORKERS = 6
+PREFETCH_PER_SITE = 2
+
+def site_of(url):
+    host = (urlsplit(url.strip()).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+class Prefetcher:
+    """待下载 URL 的解析结果预取：有界线程池 + 每站点并发上限，结果写入引擎共享的 InfoCache，
+    之后解析/批量/队列都直接命中缓存。status 记录每个 URL 的状态、耗时与错误，供状态面板显示；
+    每次变化 version 加一，界面刷新时比较即可"""
+
+    def __init__(self, engine, workers=PREFETCH_WORKERS, per_site=PREFETCH_PER_SITE):
+        self.engine = engine
+        self.workers = workers
+        self.per_site = per_site
+        self.status = {}
+        self.version = 0
+        self._pending = []
+        self._active = {}
+        self._running = 0
+        self._finished = {}
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def submit(self, urls):
+        """加入预取（已在等待/进行中或已成功的 URL 跳过），返回新加入的数量"""
+        added = 0
+        with self._lock:
+            for url in urls:
+                old = self.status.get(url)
+                if old and old['state'] != 'failed':
+                    continue
+                self.status[url] = {'url': url, 'state': 'pending', 'seconds': None, 'title': None,
+                                    'formats': None, 'error': None}
+                self._pending.append(url)
+                added += 1
+            self._dispatch()
+            self.version += 1
+        return added
+
+    def _dispatch(self):
+        # 在锁内调用：按提交顺序取出所在站点仍有空位的 URL
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="prefetch")
+        while self._running < self.workers:
+            url = next((u for u in self._pending if self._active.get(site_of(u), 0) < self.per_site), None)
+            if url is None:
+                return
+            self._pending.remove(url)
+            site = site_of(url)
+            self._active[site] = self._active.get(site, 0) + 1
+            self._running += 1
+            self.status[url]['state'] = 'running'
+            self._finished[url] = threading.Event()
+            self._pool.submit(self._run, url)
+
+    def _run(self, url):
+        rec = self.status[url]
+        start = time.monotonic()
+        try:
+            state, info = self.engine.prefetch(url)
+            rec.update(state=state, title=(info or {}).get('title'),
+                       formats=len((info or {}).get('formats') or []) if state != 'playlist' else None)
+        except Exception as e:
+            rec.update(state='failed', error=str(e).splitlines()[0] if str(e) else type(e).__name__)
+        rec['seconds'] = time.monotonic() - start
+        with self._lock:
+            site = site_of(url)
+            self._active[site] -= 1
+            self._running -= 1
+            self._finished.pop(url).set()
+            self._dispatch()
+            self.version += 1
+
+    def settle(self, url):
+        """下载某个 URL 前调用，避免与预取重复解析：尚未开始的预取直接取消（由下载自行解析），
+        正在进行的等它结束后再读缓存"""
+        with self._lock:
+            if url in self._pending:
+                self._pending.remove(url)
+                del self.status[url]
+                self.version += 1
+                return
+            finished = self._finished.get(url)
+        if finished:
+            finished.wait()
+
+    def snapshot(self):
+        with self._lock:
+            return [dict(rec) for rec in self.status.values()]
+
+    def summary(self):
+        """(完成数, 失败数, 总数, 平均解析秒数)；命中缓存的不计入平均耗时"""
+        recs = self.snapshot()
+        done = [r for r in recs if r['state'] in ('done', 'cached', 'playlist')]
+        failed = sum(1 for r in recs if r['state'] == 'failed')
+        timed = [r['seconds'] for r in recs if r['state'] in ('done', 'playlist') and r['seconds'] is not None]
+        return len(done), failed, len(recs), (sum(timed) / len(timed) if timed else None)
+
+    def clear(self):
+        """清除已结束的记录（等待/进行中的保留）"""
+        with self._lock:
+            self.status = {u: r for u, r in self.status.items() if r['state'] in ('pending', 'running')}
+            self.version += 1
+
+    def wait(self, timeout=None):
+        """等待当前全部预取结束（CLI 用）"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if not self._pending and not self._running:
+                    return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.1)
+
+# ========== 运行指标 ==========
+# 内存中保留的最近任务数
+METRICS_KEEP = 500
+METRICS_FIELDS = ('label', 'url', 'title', 'succeeded', 'total', 'extract_s', 'ttfb_s', 'avg_bps', 'peak_bps',
+                  'bytes', 'retries', 'merge_s', 'postprocess_s', 'wall_s')
+
+class JobMetrics:
+    """单个任务（一个 URL 的一轮下载）的性能指标，由进度/后处理/重试回调写入；
+    回调在下载线程中执行，只做赋值与累加，不加锁"""
+
+    def __init__(self, label, url):
+        self.label = label
+        self.url = url
+        self.title = None
+        self.started = time.monotonic()
+        self.ended = None
+        self.extract_s = None
+        self.download_started = None
+        self.first_byte = None
+        self.last_byte = None
+        self.peak_bps = 0.0
+        self.retries = 0
+        self.merge_s = 0.0
+        self.postprocess_s = 0.0
+        self.succeeded = self.total = None
+        self._bytes = {}
+        self._pp_started = {}
+
+    def start_download(self):
+        if self.download_started is None:
+            self.download_started = time.monotonic()
+
+    def on_progress(self, d):
+        now = time.monotonic()
+        done = d.get('downloaded_bytes')
+        if d['status'] == 'downloading':
+            if self.first_byte is None and done:
+                self.first_byte = now
+            speed = d.get('speed') or 0
+            if speed > self.peak_bps:
+                self.peak_bps = speed
+        if done:
+            self._bytes[d.get('filename')] = done
+            self.last_byte = now
+
+    def on_postprocess(self, d):
+        # started/finished 收到的是同一份 info 副本
+        key = (d.get('postprocessor'), id(d.get('info_dict')))
+        if d['status'] == 'started':
+            self._pp_started[key] = time.monotonic()
+        elif d['status'] == 'finished' and key in self._pp_started:
+            self.add_pp_time(d.get('postprocessor'), time.monotonic() - self._pp_started.pop(key))
+
+    def add_pp_time(self, name, seconds):
+        if name == 'Merger':
+            self.merge_s += seconds
+        else:
+            self.postprocess_s += seconds
+
+    def on_retry(self, n):
+        """作为 yt-dlp 的 retry_sleep_functions：每次重试调用一次，返回 0 表示不额外等待"""
+        self.retries += 1
+        return 0
+
+    def finish(self, succeeded, total):
+        self.ended = time.monotonic()
+        self.succeeded, self.total = succeeded, total
+
+    def as_dict(self):
+        received = sum(self._bytes.values())
+        ttfb = avg = None
+        if self.first_byte is not None and self.download_started is not None:
+            ttfb = self.first_byte - self.download_started
+        if self.first_byte is not None and self.last_byte and self.last_byte > self.first_byte:
+            avg = received / (self.last_byte - self.first_byte)
+        wall = (self.ended or time.monotonic()) - self.started
+        rounded = lambda v, n=3: None if v is None else round(v, n)
+        return {
+            'label': self.label, 'url': self.url, 'title': self.title,
+            'succeeded': self.succeeded, 'total': self.total,
+            'extract_s': rounded(self.extract_s), 'ttfb_s': rounded(ttfb),
+            'avg_bps': rounded(avg, 0), 'peak_bps': rounded(self.peak_bps or None, 0),
+            'bytes': received, 'retries': self.retries,
+            'merge_s': rounded(self.merge_s), 'postprocess_s': rounded(self.postprocess_s),
+            'wall_s': rounded(wall),
+        }
+
+    def summary(self):
+        m = self.as_dict()
+        seconds = lambda v: "-" if v is None else f"{v:.2f}s"
+        speed = lambda v: "-" if v is None else f"{format_bytes(v)}/s"
+        return (f"extract {seconds(m['extract_s'])}, TTFB {seconds(m['ttfb_s'])}, avg {speed(m['avg_bps'])}, "
+                f"peak {speed(m['peak_bps'])}, {format_bytes(m['bytes'])}, {m['retries']} retries, "
+                f"merge {seconds(m['merge_s'])}, post-process {seconds(m['postprocess_s'])}, wall {seconds(m['wall_s'])}")
+
+class RunMetrics:
+    """本次运行各任务的指标（内存中），可导出为 JSON 或 CSV；version 在任务开始/结束时加一，供界面轮询"""
+
+    def __init__(self, keep=METRICS_KEEP):
+        self._jobs = deque(maxlen=keep)
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def begin(self, label, url):
+        job = JobMetrics(label, url)
+        with self._lock:
+            self._jobs.append(job)
+            self.version += 1
+        return job
+
+    def finish(self, job, succeeded, total):
+        job.finish(succeeded, total)
+        with self._lock:
+            self.version += 1
+
+    def rows(self):
+        with self._lock:
+            jobs = list(self._jobs)
+        return [job.as_dict() for job in jobs]
+
+    def clear(self):
+        with self._lock:
+            self._jobs.clear()
+            self.version += 1
+
+    def export(self, path):
+        """按扩展名导出：.csv 为每任务一行，其余为 JSON；返回导出的任务数"""
+        rows = self.rows()
+        if str(path).lower().endswith('.csv'):
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=METRICS_FIELDS)
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'generated': time.time(), 'jobs': rows}, f, ensure_ascii=False, indent=2)
+        return len(rows)
+
+def print_log(msg, tag="info"):
+    """无界面时的日志输出：错误与警告写 stderr"""
+    stream = sys.stderr if tag in ("error", "warning") else sys.stdout
+    print(f"[{tag}] {msg}", file=stream, flush=True)
+
+class EngineSettings:
+    """引擎设置：GUI 每次启动任务前从界面同步，CLI 由命令行参数填充"""
+
+    def __init__(self, **kwargs):
+        self.cookie_file = ""
+        self.browser = None
+        self.enable_ejs = True
+        self.runtime = "auto"
+        self.runtime_path = ""
+        self.extract_audio = False
+        # 快速音频：保留原编码，只换容器（AAC→m4a、Opus→opus、Vorbis→ogg），无法封装时才转码
+        self.fast_audio = False
+        self.embed_subs = False
+        # 嵌入字幕的语言与格式偏好；默认不请求自动生成字幕
+        self.sub_langs = list(SUBTITLE_LANGS)
+        self.sub_format = "best"
+        self.auto_subs = False
+        self.use_info_cache = True
+        self.revalidate_cache = False
+        self.info_cache_ttl = INFO_CACHE_TTL
+        self.keep_partial = True
+        self.use_archive = True
+        self.auto_tune = True
+        self.check_disk_space = True
+        self.overlap_pp = True
+        for key, value in kwargs.items():
+            if not hasattr(self, key):
+                raise TypeError(f"unknown setting: {key}")
+            setattr(self, key, value)
+
+class PendingBatch:
+    """start_batch 的结果：下载已提交或结束；futures 为 [(组合, Future)]，
+    Future 的结果可能是仍在后处理池中的下一个 Future，由 finish_batch 等待"""
+
+    def __init__(self, video, skipped, total, metrics=None, scope=None):
+        self.video = video
+        self.skipped = skipped
+        self.total = total
+        self.metrics = metrics
+        self.scope = scope or CancelScope()
+        self.futures = []
+        self.done = []
+
+    def postprocessing(self):
+        """网络阶段已结束但仍有组合在后处理"""
+        return any(f.done() and not f.exception() and isinstance(f.result(), Future) and not f.result().done()
+                   for _, f in self.futures)
+
+class DownloadEngine:
+    """解析、格式计划与下载引擎：GUI 与无界面 CLI 共用同一套并发、缓存、下载记录与队列重试逻辑"""
+
+    def __init__(self, settings=None, log=print_log, app_dir=APP_DIR):
+        self.settings = settings or EngineSettings()
+        self.log = log
+        self.cancel_requested = False
+        self.current_video_info = None
+        self.current_video_url = None
+        # 并发的组合/刷新线程都会替换上面两项，成对读写
+        self._info_lock = threading.Lock()
+        self.progress_board = ProgressBoard()
+        self.tuner = DownloadTuner()
+        self.governor = BandwidthGovernor(on_change=self._on_bandwidth_change)
+        self.sessions = SessionPool()
+        self.browser_cookies = BrowserCookieCache()
+        self.info_cache = InfoCache(Path(app_dir) / "cache" / "info")
+        self.subtitles = SubtitleCache(Path(app_dir) / "cache" / "subtitles")
+        self.archive = DownloadArchive(Path(app_dir) / "archive.txt")
+        self.journal = JobJournal(Path(app_dir) / "queue.db")
+        self.prefetcher = Prefetcher(self)
+        self.postprocessors = PostProcessPool()
+        self.metrics = RunMetrics()
+        # 使用浏览器 Cookie 快照后调用（GUI 用于刷新状态显示）
+        self.on_cookies = lambda: None
+        self._partial_files = set()
+        # 队列中正在运行的任务，以及下载或后台后处理尚未结束的任务的取消范围 {任务 ID: CancelScope}
+        self.current_job_id = None
+        self._job_scopes = {}
+        # 每次取消加一：后台后处理结束时据此判断是否被取消打断
+        self._cancel_epoch = 0
+        self._queue_lock = threading.Lock()
+
+    # ---------- 选项 ----------
+    def _apply_cookie_opts(self, opts):
+        """Cookie 文件优先；选择浏览器时使用共享的 Cookie 快照文件，而不是每个任务各自读取浏览器"""
+        cookie_file = (self.settings.cookie_file or "").strip()
+        if cookie_file and os.path.exists(cookie_file):
+            opts['cookiefile'] = cookie_file
+        elif self.settings.browser:
+            opts['cookiefile'] = self.browser_cookies.get(self.settings.browser, log=self.log)
+            self.on_cookies()
+        return opts
+
+    def augment_ejs_options(self, opts):
+        st = self.settings
+        if not st.enable_ejs:
+            return opts
+        if not HAVE_EJS:
+            rc = opts.setdefault('remote_components', [])
+            if 'ejs:github' not in rc:
+                rc.append('ejs:github')
+            self.log("EJS remote: ejs:github", "ejs")
+        runtime_choice = (st.runtime or "auto").lower()
+        runtime_path = (st.runtime_path or "").strip()
+        if runtime_choice != "auto":
+            jr = opts.setdefault('js_runtimes', {})
+            jr[runtime_choice] = {'path': runtime_path} if runtime_path else {}
+            self.log(f"Runtime: {runtime_choice} {'-> ' + runtime_path if runtime_path else '(PATH)'}", "runtime")
+        else:
+            self.log("Runtime: auto", "runtime")
+        return opts
+
+    def extract_opts(self):
+        opts = {'quiet': True, 'no_warnings': True, 'skip_download': True}
+        return self.augment_ejs_options(self._apply_cookie_opts(opts))
+
+    def common_ydl_opts(self, outdir, fmt, job=None, metrics=None, scope=None):
+        opts = {
+            'outtmpl': os.path.join(outdir, '%(title)s.%(ext)s'),
+            'postprocessor_hooks': [partial(self._postprocessor_hook, scope=scope)],
+            'format': fmt,
+            'quiet': False,
+            'no_warnings': False,
+            'continuedl': True,
+        }
+        tuning = self.tuner.settings() if self.settings.auto_tune else None
+        if tuning:
+            opts.update(tuning)
+        opts['progress_hooks'] = [partial(self._progress_hook, job=job, tuning=tuning, scope=scope)]
+        opts = self.augment_ejs_options(self._apply_cookie_opts(opts))
+        if self.settings.extract_audio:
+            opts['format'] = 'bestaudio/best'
+            if self.settings.fast_audio:
+                pp = {'key': 'FFmpegExtractAudio', 'preferredcodec': 'best'}
+            else:
+                pp = {'key': 'FFmpegExtractAudio', 'preferredcodec': 'mp3', 'preferredquality': '192'}
+            opts.setdefault('postprocessors', []).append(pp)
+        if self.settings.embed_subs:
+            opts['writesubtitles'] = True
+            opts['writeautomaticsub'] = bool(self.settings.auto_subs)
+            opts['subtitleslangs'] = list(self.settings.sub_langs)
+            opts['subtitlesformat'] = self.settings.sub_format or 'best'
+            opts.setdefault('postprocessors', []).append({'key': 'FFmpegEmbedSubtitle'})
+        if metrics:
+            opts['progress_hooks'].append(metrics.on_progress)
+            opts['postprocessor_hooks'].append(metrics.on_postprocess)
+            opts['retry_sleep_functions'] = dict.fromkeys(('http', 'fragment', 'extractor'), metrics.on_retry)
+        return opts
+
+    def prepare_subtitles(self, info):
+        """嵌入字幕时为批量准备字幕：按设置挑选语言/格式，缓存中没有的并行下载一次，
+        返回把字幕文本放进轨道（data）的 info 副本，各组合写字幕时不再请求网络"""
+        st = self.settings
+        if not (st.embed_subs and info):
+            return info
+        picked = select_subtitles(info, st.sub_langs, st.sub_format, st.auto_subs)
+        texts, missing = {}, {}
+        for lang, track in picked.items():
+            if track.get('data') is not None:
+                texts[lang] = track['data']
+                continue
+            cached = self.subtitles.get(info, lang, track['ext'])
+            if cached is not None:
+                texts[lang] = cached
+            elif track.get('url') and track.get('protocol') in SUBTITLE_DIRECT_PROTOCOLS:
+                missing[lang] = track
+        if missing:
+            self.log(f"Fetching subtitles once for batch: {', '.join(missing)}", "batch")
+            texts.update(self._fetch_subtitles(info, missing))
+        if texts:
+            self.log(f"Subtitles ready: {', '.join(texts)}", "batch")
+        prepared = dict(info)
+        prepared['subtitles'] = {lang: [dict(track, data=texts[lang]) if lang in texts else track]
+                                 for lang, track in picked.items()}
+        prepared['automatic_captions'] = {}
+        return prepared
+
+    def _fetch_subtitles(self, info, tracks):
+        """并行下载字幕轨（每种语言一个请求）并写入缓存，返回 {语言: 文本}；失败的语言留给 yt-dlp 自行下载"""
+        headers = info.get('http_headers') or {}
+
+        def fetch(ydl, track):
+            req = Request(track['url'], headers={**headers, **(track.get('http_headers') or {})})
+            with ydl.urlopen(req) as resp:
+                return resp.read().decode('utf-8', 'replace')
+
+        texts = {}
+        with self.sessions.session(self.extract_opts()) as ydl:
+            with ThreadPoolExecutor(max_workers=min(SUBTITLE_WORKERS, len(tracks)), thread_name_prefix="subs") as pool:
+                futures = {lang: pool.submit(fetch, ydl, track) for lang, track in tracks.items()}
+            for lang, fut in futures.items():
+                try:
+                    texts[lang] = fut.result()
+                except Exception as e:
+                    self.log(f"Subtitle {lang} prefetch failed: {e}", "warning")
+                    continue
+                self.subtitles.put(info, lang, tracks[lang]['ext'], texts[lang])
+        return texts
+
+    @staticmethod
+    def expand_batch(videos, audios):
+        if videos and audios:
+            return [f"{v}+{a}" for v, a in product(videos, audios)]
+        return videos or audios or []
+
+    # ---------- 解析与缓存 ----------
+    def _info_cache_key(self, url):
+        st = self.settings
+        return InfoCache.make_key(
+            url,
+            cookie_file=(st.cookie_file or "").strip(),
+            browser=st.browser,
+            ejs=bool(st.enable_ejs),
+            runtime=(st.runtime or "auto").lower(),
+            runtime_path=(st.runtime_path or "").strip(),
+        )
+
+    def cached_info(self, url):
+        if not self.settings.use_info_cache:
+            return None
+        return self.info_cache.get(self._info_cache_key(url), ttl=self.settings.info_cache_ttl)
+
+    def _cache_info(self, url, info):
+        if info and self.settings.use_info_cache:
+            try:
+                self.info_cache.put(self._info_cache_key(url), info)
+            except (OSError, TypeError, ValueError) as e:
+                self.log(f"Info cache write failed: {e}", "warning")
+
+    def extract_and_cache(self, url):
+        with self.sessions.session(self.extract_opts()) as ydl:
+            info = ydl.extract_info(url, download=False)
+        self._cache_info(url, info)
+        return info
+
+    def parse(self, url, on_playlist=None):
+        """解析 URL（优先使用缓存），结果记为当前视频供后续批量复用；
+        给出 on_playlist 时，播放列表/频道不再完整解析，而是交给 on_playlist 逐条读取"""
+        load_yt_dlp()
+        info = self.cached_info(url)
+        if info and on_playlist and info.get('_type', 'video') != 'video':
+            info = None
+        if info:
+            self.log("Formats loaded from cache", "success")
+            if self.settings.revalidate_cache:
+                threading.Thread(target=self._revalidate_worker, args=(url,), daemon=True).start()
+        elif on_playlist:
+            info = self._parse_streaming(url, on_playlist)
+        else:
+            info = self.extract_and_cache(url)
+        if info and info.get('_type', 'video') == 'video':
+            self._set_current_info(url, info)
+        return info
+
+    def current_info(self, url):
+        """最近一次解析的 info（URL 不同时为 None）"""
+        with self._info_lock:
+            return self.current_video_info if self.current_video_url == url else None
+
+    def _set_current_info(self, url, info, only_if_current=False):
+        with self._info_lock:
+            if not only_if_current or self.current_video_url == url:
+                self.current_video_info = info
+                self.current_video_url = url
+
+    def _parse_streaming(self, url, on_playlist):
+        """先只运行提取器（不处理结果）：单个视频再完成格式处理并缓存；
+        播放列表/频道只平铺条目，on_playlist(head, entries) 在会话内边迭代边显示，返回 head"""
+        opts = self.extract_opts()
+        opts['extract_flat'] = 'in_playlist'
+        with self.sessions.session(opts) as ydl:
+            result = ydl.extract_info(url, download=False, process=False)
+            # 频道主页等会先跳转到真正的列表页
+            for _ in range(3):
+                if not result or result.get('_type') != 'url':
+                    break
+                result = ydl.extract_info(result['url'], download=False, process=False, ie_key=result.get('ie_key'))
+            if result and result.get('_type') in PLAYLIST_TYPES:
+                head = {
+                    '_type': 'playlist',
+                    'id': result.get('id'),
+                    'title': result.get('title') or result.get('id') or url,
+                    'uploader': result.get('uploader') or result.get('channel'),
+                    'webpage_url': result.get('webpage_url') or url,
+                }
+                entries = (flat_entry(e, i) for i, e in enumerate(iter_playlist_entries(result.get('entries')), 1) if e)
+                on_playlist(head, entries)
+                return head
+            info = ydl.process_ie_result(result, download=False) if result else None
+        self._cache_info(url, info)
+        return info
+
+    def prefetch(self, url):
+        """预取一个 URL，返回 (状态, info)：命中缓存为 cached；单个视频解析后写入缓存为 done；
+        播放列表只识别、不展开条目，为 playlist"""
+        load_yt_dlp()
+        info = self.cached_info(url)
+        if info and info.get('_type', 'video') == 'video':
+            return 'cached', info
+        info = self._parse_streaming(url, lambda head, entries: None)
+        return ('playlist' if info and info.get('_type') == 'playlist' else 'done'), info
+
+    def _revalidate_worker(self, url):
+        try:
+            info = self.extract_and_cache(url)
+        except Exception as e:
+            self.log(f"Revalidate failed: {e}", "warning")
+            return
+        if info:
+            self._set_current_info(url, info, only_if_current=True)
+        self.log(f"Cache revalidated: {url}", "info")
+
+    def clear_info_cache(self):
+        self.info_cache.clear()
+        self.subtitles.clear()
+        self.log("Info cache cleared", "info")
+
+    def refresh_browser_cookies(self):
+        self.browser_cookies.invalidate()
+        # 空闲会话仍持有旧快照的 jar，一并关闭
+        self.sessions.close_all()
+        self.log("Browser cookie snapshot cleared, will re-read on next use", "info")
+
+    # ---------- 下载记录 ----------
+    def _archive_combo(self, fmt):
+        # 仅提取音频会改变输出，单独记录
+        if not self.settings.extract_audio:
+            return fmt
+        return f"{fmt} [audio]" if self.settings.fast_audio else f"{fmt} [mp3]"
+
+    def _log_audio_outcome(self, info):
+        """仅提取音频时逐个文件说明是直接封装还是重新编码"""
+        if not self.settings.extract_audio:
+            return
+        for name, codec, ext, transcoded in audio_outcome(info):
+            if transcoded:
+                self.log(f"Audio transcoded {codec} -> {ext}: {name}", "info")
+            else:
+                self.log(f"Audio stream copied ({codec} in .{ext}): {name}", "info")
+
+    def _pending_formats(self, url, formats):
+        """按下载记录过滤掉已完成的组合（在解析之前），返回 (视频标识, 待下载组合)"""
+        video = normalize_url(url)
+        if not self.settings.use_archive:
+            return video, list(formats)
+        pending = [fmt for fmt in formats if not self.archive.has(video, self._archive_combo(fmt))]
+        if len(pending) < len(formats):
+            self.log(f"Archive: skip {len(formats) - len(pending)}/{len(formats)} completed combo(s) of {video}", "batch")
+        return video, pending
+
+    def _record_done(self, video, fmts):
+        if self.settings.use_archive:
+            for fmt in fmts:
+                self.archive.add(video, self._archive_combo(fmt))
+
+    def clear_archive(self):
+        self.archive.clear()
+        self.log("Download archive cleared", "info")
+
+    # ---------- 带宽 ----------
+    def _on_bandwidth_change(self, rate):
+        self.log(f"Bandwidth cap: {rate / 1024 / 1024:.1f} MB/s" if rate else "Bandwidth cap: unlimited", "info")
+
+    @contextmanager
+    def _download_session(self, opts):
+        """下载用的 YoutubeDL 会话：借出期间参与全局带宽分配"""
+        with self.sessions.session(opts) as ydl:
+            self.governor.register(ydl.params)
+            try:
+                yield ydl
+            finally:
+                self.governor.unregister(ydl.params)
+
+    def _download_deferred(self, opts, download, scope):
+        """download(ydl) 只完成网络部分：yt-dlp 的后处理（合并、转码、嵌入字幕）被截下，
+        连同会话一起交给后处理池，返回后处理的 Future；没有后处理时直接返回结果"""
+        ydl, token = self.sessions.acquire(opts)
+        deferred = []
+
+        def post_process(filename, info, files_to_move=None):
+            info['filepath'] = filename
+            # process_info 返回后 yt-dlp 会从这个 dict 中删去与顶层相同的字段（ext、requested_subtitles 等），
+            # 后处理用截下时的副本
+            deferred.append((filename, info, dict(info), dict(files_to_move or {})))
+            return info
+
+        ydl.post_process = post_process
+        self.governor.register(ydl.params)
+        try:
+            result = download(ydl)
+        except BaseException:
+            self.sessions.release(ydl, token, ok=False)
+            raise
+        finally:
+            self.governor.unregister(ydl.params)
+            del ydl.post_process
+        if not deferred:
+            self.sessions.release(ydl, token)
+            return result
+
+        def run():
+            # 会话在后处理结束前一直由本任务持有
+            try:
+                with scope.active():
+                    for filename, info, snapshot, files_to_move in deferred:
+                        new_info = YoutubeDL.post_process(ydl, filename, snapshot, files_to_move)
+                        # 与 process_info 一样原地替换 info，返回的结果才指向最终文件
+                        info.clear()
+                        info.update(new_info)
+            except BaseException:
+                self.sessions.release(ydl, token, ok=False)
+                raise
+            self.sessions.release(ydl, token)
+            return result
+
+        try:
+            return self.postprocessors.submit(run, cancelled=lambda: self._canceled(scope))
+        except BaseException:
+            self.sessions.release(ydl, token, ok=False)
+            raise
+
+    # ---------- 下载 ----------
+    def begin(self):
+        """开始新一轮下载：清除取消标记与上一轮的临时文件记录"""
+        self.cancel_requested = False
+        self._partial_files = set()
+        self.progress_board.begin()
+        self.progress_board.reset_stats()
+
+    def download_single(self, url, outdir, fmt):
+        """按单个格式下载，返回 info；下载记录中已完成时返回 None"""
+        load_yt_dlp()
+        video, pending = self._pending_formats(url, [fmt])
+        if not pending:
+            return None
+        metrics = self.metrics.begin("single", url)
+        opts = self.common_ydl_opts(outdir, fmt, metrics=metrics)
+        try:
+            with self._download_session(opts) as ydl:
+                # 与 extract_info(download=True) 相同，分两步以便分别计时
+                t0 = time.monotonic()
+                info = ydl.extract_info(url, download=False, process=False)
+                metrics.extract_s = time.monotonic() - t0
+                metrics.title = info.get('title')
+                metrics.start_download()
+                info = ydl.process_ie_result(info, download=True)
+        except BaseException:
+            self.metrics.finish(metrics, 0, 1)
+            raise
+        self.metrics.finish(metrics, 1, 1)
+        self._record_done(video, [fmt])
+        self._log_audio_outcome(info)
+        self.log(f"✓ Done: {info.get('title', 'Unknown')}", "success")
+        self.log(f"Metrics: {metrics.summary()}", "info")
+        return info
+
+    def _batch_source_info(self, url):
+        """批量的信息源：URL 与上次解析一致时直接复用，否则在批量开始时只提取一次"""
+        info = self.current_info(url)
+        if info:
+            self.log("Reuse parsed info for batch", "batch")
+            return info
+        info = self.cached_info(url)
+        if info:
+            self.log("Reuse cached info for batch", "batch")
+        else:
+            self.log("Extracting info once for batch...", "batch")
+            info = self.extract_and_cache(url)
+        self._set_current_info(url, info)
+        return info
+
+    def _download_from_info(self, ydl, info, url, scope=None):
+        """用已提取的 info 重新选择格式并下载；仅直链过期（403/410）时回退为重新提取"""
+        try:
+            return ydl.process_ie_result(fresh_info(info), download=True)
+        except DownloadError as e:
+            if self._canceled(scope) or not is_stale_url_error(e):
+                raise
+            self.log(f"Reuse info failed ({e}), re-extracting...", "warning")
+            info = ydl.extract_info(url, download=True)
+            # 新提取的 info 供后续组合继续复用
+            self._set_current_info(url, info)
+            return info
+
+    def run_batch(self, url, outdir, formats, workers, on_state=lambda state: None, label="batch", skip_disk_check=False):
+        """按格式计划下载一个 URL 并等待后处理结束，返回 (成功数, 总数)；on_state 接收任务阶段变化"""
+        return self.finish_batch(self.start_batch(url, outdir, formats, workers, on_state, label, skip_disk_check))
+
+    def start_batch(self, url, outdir, formats, workers, on_state=lambda state: None, label="batch", skip_disk_check=False,
+                    scope=None):
+        """提交一个 URL 的批量下载并返回 PendingBatch（不等待组合完成）；label 为指标中的任务名，
+        skip_disk_check 为 True 时只记录预计体积、不因剩余空间不足而拦截（用户已单独确认过这一次）；
+        scope 为任务的取消范围（队列任务单独取消用）"""
+        load_yt_dlp()
+        if self.settings.extract_audio and len(formats) > 1:
+            # 仅提取音频时每个组合都改为 bestaudio/best，结果是同一个文件，只下载一次
+            self.log(f"Audio only: {len(formats)} combos -> 1 download", "batch")
+            formats = formats[:1]
+        video, pending = self._pending_formats(url, formats)
+        if not pending:
+            return PendingBatch(video, len(formats), len(formats), scope=scope)
+        metrics = self.metrics.begin(label, url)
+        batch = PendingBatch(video, len(formats) - len(pending), len(formats), metrics, scope)
+        scope = batch.scope
+        on_state('extracting')
+        t0 = time.monotonic()
+        self.prefetcher.settle(url)
+        try:
+            info = self._batch_source_info(url)
+        except Exception as e:
+            self.log(f"Batch extract failed ({e}), fall back to per-combo extraction", "warning")
+            info = None
+        metrics.extract_s = time.monotonic() - t0
+        if info:
+            metrics.title = info.get('title')
+        if info and info.get('_type', 'video') != 'video':
+            # 播放列表等结果仍逐组合完整提取
+            info = None
+        if info and not self._fits_disk(info, outdir, pending, check=not skip_disk_check):
+            return batch
+        on_state('downloading')
+        if info and self._can_share_streams(pending, info):
+            metrics.start_download()
+            batch.done = self._stream_batch(url, outdir, info, pending, workers, on_state, metrics, scope)
+        else:
+            # 嵌入字幕时字幕在这里按视频获取一次，所有组合共用
+            info = self.prepare_subtitles(info)
+            metrics.start_download()
+            batch.futures = self._combo_batch(url, outdir, info, pending, workers, on_state, metrics, scope)
+        return batch
+
+    def finish_batch(self, batch):
+        """按提交顺序等待并汇报各组合（含后处理），写入下载记录，返回 (成功数, 总数)"""
+        done = list(batch.done)
+        if batch.futures:
+            done += list(self._report_in_order(batch.futures, "combo", batch.scope))
+        self._record_done(batch.video, done)
+        if batch.metrics:
+            self.metrics.finish(batch.metrics, batch.skipped + len(done), batch.total)
+            self.log(f"Metrics ({batch.metrics.label}): {batch.metrics.summary()}", "info")
+        return batch.skipped + len(done), batch.total
+
+    def _fits_disk(self, info, outdir, formats, check=True):
+        """按格式表估算本批的总体积并记入日志；超过输出目录剩余空间时不开始下载"""
+        total, unknown = BudgetPlanner(info).plan_total(formats)
+        if not total:
+            return True
+        note = f" (+{len(unknown)} unknown)" if unknown else ""
+        self.log(f"Planned: {len(formats)} combo(s), ~{format_bytes(total)}{note}", "batch")
+        try:
+            free = shutil.disk_usage(outdir).free
+        except OSError:
+            return True
+        if check and self.settings.check_disk_space and total > free:
+            self.log(f"Not enough disk space: need ~{format_bytes(total)}, free {format_bytes(free)}", "error")
+            return False
+        return True
+
+    def run_queue(self, workers, on_change=lambda: None):
+        """依次处理队列中的任务直到队列为空或被取消，返回 (完成数, 失败数)；
+        开启后处理重叠时，任务下载完即开始下一个任务，它的后处理在后台完成后再记录结果"""
+        counts = {'done': 0, 'failed': 0}
+        finishers = []
+        while not self.cancel_requested:
+            job = self.journal.next_queued()
+            if not job:
+                if not any(t.is_alive() for t in finishers):
+                    break
+                # 后台后处理被取消打断的任务会放回队列，等它们结束后再检查一次
+                for t in finishers:
+                    t.join()
+                continue
+            job_id = job['id']
+            self.log(f"Queue job #{job_id}: {job['url']}", "batch")
+
+            def on_state(state, job_id=job_id):
+                self.journal.set_state(job_id, state)
+                on_change()
+
+            epoch = self._cancel_epoch
+            self.progress_board.begin()
+            scope = CancelScope()
+            with self._queue_lock:
+                self.current_job_id = job_id
+                self._job_scopes[job_id] = scope
+            try:
+                batch = self.start_batch(job['url'], job['outdir'], job['plan'], workers, on_state, f"#{job_id}",
+                                         scope=scope)
+                wait([f for _, f in batch.futures])
+            except Exception as e:
+                batch = None
+                self.log(f"Queue job #{job_id} ✗ {e}", "error")
+            finally:
+                self.current_job_id = None
+            if batch is None:
+                self._forget_job(job_id, scope)
+                self.journal.set_state(job_id, 'failed', 'canceled' if scope.canceled else f"0/{len(job['plan'])} succeeded")
+                counts['failed'] += 1
+                on_change()
+            elif batch.postprocessing() and not scope.canceled:
+                on_state('post-processing')
+                t = threading.Thread(target=self._finish_job, args=(job_id, batch, epoch, counts, on_change), daemon=True)
+                t.start()
+                finishers.append(t)
+            else:
+                self._finish_job(job_id, batch, epoch, counts, on_change)
+        for t in finishers:
+            t.join()
+        self.log(f"Queue finished: {counts['done']} done, {counts['failed']} failed", "batch")
+        return counts['done'], counts['failed']
+
+    def _finish_job(self, job_id, batch, epoch, counts, on_change):
+        """等待任务的后处理并写入结果；单独取消的任务标记为已取消，
+        期间发生过全局取消且未全部成功的任务放回队列，下次续传时已下载的文件会直接复用"""
+        try:
+            success, total = self.finish_batch(batch)
+        except Exception as e:
+            success, total = 0, batch.total
+            self.log(f"Queue job #{job_id} ✗ {e}", "error")
+        self._forget_job(job_id, batch.scope)
+        with self._queue_lock:
+            if total and success == total:
+                self.journal.set_state(job_id, 'done')
+                counts['done'] += 1
+            elif batch.scope.canceled:
+                self.journal.set_state(job_id, 'failed', 'canceled')
+                counts['failed'] += 1
+            elif self.cancel_requested or self._cancel_epoch != epoch:
+                self.journal.set_state(job_id, 'queued')
+            else:
+                self.journal.set_state(job_id, 'failed', f"{success}/{total} succeeded")
+                counts['failed'] += 1
+        on_change()
+
+    def _can_share_streams(self, formats, info):
+        # 仅提取音频/嵌入字幕需要逐组合后处理，此时仍按组合整体下载
+        if self.settings.extract_audio or self.settings.embed_subs:
+            return False
+        return any('+' in fmt for fmt in formats) and literal_format_ids(formats, info)
+
+    def _forget_job(self, job_id, scope):
+        """任务结束：注销取消范围；被单独取消时按设置删除它的临时文件"""
+        with self._queue_lock:
+            self._job_scopes.pop(job_id, None)
+        if scope.canceled and scope.partial_files and not self.settings.keep_partial:
+            removed = remove_partial_files(scope.partial_files)
+            self.log(f"Removed {removed} partial file(s)", "info")
+
+    def _report_in_order(self, futures, label, scope=None):
+        """按提交顺序等待并汇报任务结果（后提交的先完成时延后汇报），返回成功结果"""
+        total = len(futures)
+        results = {}
+        for idx, (key, fut) in enumerate(futures, 1):
+            try:
+                result = fut.result()
+                # 交给后处理池的组合：再等待后处理完成
+                results[key] = result.result() if isinstance(result, Future) else result
+                self._log_audio_outcome(results[key])
+                self.log(f"[{label} {idx}/{total}] ✓ {key}", "success")
+            except (CancelledError, DownloadCancelled):
+                self.log(f"[{label} {idx}/{total}] canceled: {key}", "warning")
+            except Exception as e:
+                if self._canceled(scope):
+                    # 取消时被终止的 ffmpeg 等会以普通错误结束
+                    self.log(f"[{label} {idx}/{total}] canceled: {key}", "warning")
+                    continue
+                self.log(f"[{label} {idx}/{total}] ✗ {key}: {e}", "error")
+                self.report_error(e, silent=True)
+        return results
+
+    def _combo_batch(self, url, outdir, info, formats, workers, on_state, metrics=None, scope=None):
+        """每个组合完整下载一次，返回 [(组合, Future)]，不等待完成；
+        开启后处理重叠时组合下载完即交给后处理池，下载线程继续下一个组合"""
+        scope = scope or CancelScope()
+        self.progress_board.begin(len(formats))
+
+        def on_pp(d):
+            if d['status'] == 'started':
+                on_state('post-processing')
+
+        def run(fmt):
+            if self._canceled(scope):
+                raise DownloadCancelled()
+            self.log(f"Start: {fmt}", "batch")
+            opts = self.common_ydl_opts(outdir, fmt, job=fmt, metrics=metrics, scope=scope)
+            # 每个组合单独命名（含格式 ID），避免不同组合写入同一文件
+            opts['outtmpl'] = os.path.join(outdir, COMBO_OUTTMPL)
+            opts['postprocessor_hooks'].append(on_pp)
+            with scope.active():
+                if self.settings.overlap_pp:
+                    return self._download_deferred(opts, download, scope)
+                with self._download_session(opts) as ydl:
+                    return download(ydl)
+
+        def download(ydl):
+            if info:
+                return self._download_from_info(ydl, info, url, scope)
+            return ydl.extract_info(url, download=True)
+
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="combo")
+        futures = [(fmt, pool.submit(run, fmt)) for fmt in formats]
+        # 已提交的组合照常执行完毕，线程随后退出
+        pool.shutdown(wait=False)
+        return futures
+
+    def _stream_batch(self, url, outdir, info, formats, workers, on_state, metrics=None, scope=None):
+        """每个独立流只下载一次到暂存目录，再用 ffmpeg 流复制本地合成全部组合；
+        下载池与合并池并行，某组合所需的流齐备后即可合并，同时继续下载其余流"""
+        scope = scope or CancelScope()
+        streams, combos = plan_streams(formats)
+        staging = os.path.join(outdir, STAGING_DIR, sanitize_filename(str(info.get('id') or 'video')))
+        title = sanitize_filename(info.get('title') or str(info.get('id') or 'video'))
+        self.log(f"Unique streams: {len(streams)} for {len(combos)} combos", "batch")
+        self.progress_board.begin(len(streams))
+
+        def fetch(fid):
+            if self._canceled(scope):
+                raise DownloadCancelled()
+            self.log(f"Start stream: {fid}", "batch")
+            opts = self.common_ydl_opts(outdir, fid, job=fid, metrics=metrics, scope=scope)
+            opts['outtmpl'] = os.path.join(staging, '%(id)s.f%(format_id)s.%(ext)s')
+            with scope.active(), self._download_session(opts) as ydl:
+                result = self._download_from_info(ydl, info, url, scope)
+            # yt-dlp 会从 requested_downloads 中去掉与顶层相同的字段（单个格式时 ext、vcodec 等都在顶层）
+            return {**result, **result['requested_downloads'][0]}
+
+        def merge(fmt, parts):
+            deps = [stream_futs[fid] for fid in parts]
+            stream_infos = [f.result() for f in deps]
+            if self._canceled(scope):
+                raise DownloadCancelled()
+            on_state('post-processing')
+            self.log(f"Merging: {fmt}", "batch")
+            t0 = time.monotonic()
+            with scope.active(), YoutubeDL({'quiet': True}) as ydl:
+                path = self._merge_streams(FFmpegMergerPP(ydl), stream_infos, outdir, title)
+            if metrics:
+                metrics.add_pp_time('Merger', time.monotonic() - t0)
+            return path
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stream") as dl_pool, \
+                ThreadPoolExecutor(max_workers=max(1, workers // 2), thread_name_prefix="merge") as merge_pool:
+            stream_futs = {fid: dl_pool.submit(fetch, fid) for fid in streams}
+            combo_futs = [(fmt, merge_pool.submit(merge, fmt, parts)) for fmt, parts in combos]
+            self._report_in_order(list(stream_futs.items()), "stream", scope)
+            results = self._report_in_order(combo_futs, "combo", scope)
+
+        if len(results) == len(combos):
+            shutil.rmtree(staging, ignore_errors=True)
+        else:
+            self.log(f"Staged streams kept for retry: {staging}", "warning")
+        return list(results)
+
+    def _merge_streams(self, merger, parts, outdir, title):
+        """合成一个组合；文件名与逐组合下载一致（标题.f视频ID+音频ID.扩展名），格式 ID 取实际下载的流"""
+        fmt = sanitize_filename('+'.join(str(f['format_id']) for f in parts))
+        if len(parts) == 1:
+            ext = parts[0]['ext']
+        else:
+            videos = [f for f in parts if f.get('vcodec') != 'none']
+            audios = [f for f in parts if f.get('acodec') != 'none' and f.get('vcodec') == 'none']
+            ext = get_compatible_ext(
+                vcodecs=[f.get('vcodec') for f in videos], acodecs=[f.get('acodec') for f in audios],
+                vexts=[f['ext'] for f in videos], aexts=[f['ext'] for f in audios])
+        path = os.path.join(outdir, f"{title}.f{fmt}.{ext}")
+        if len(parts) == 1:
+            shutil.copyfile(parts[0]['filepath'], path)
+            return path
+        merger.run({
+            'filepath': path,
+            'requested_formats': parts,
+            '__files_to_merge': [f['filepath'] for f in parts],
+        })
+        return path
+
+    def report_error(self, e, silent=False):
+        """记录下载错误，并根据错误信息给出可能的原因"""
+        msg = str(e)
+        if not silent:
+            self.log(f"Error: {msg}", "error")
+        lower = msg.lower()
+        if "login" in lower or "member" in lower or "premium" in lower:
+            self.log("Maybe need login / cookie.", "warning")
+        if "ffmpeg" in lower:
+            self.log("ffmpeg missing or merge failed.", "warning")
+        if "challenge" in lower or "signature" in lower:
+            self.log("EJS / runtime may be required.", "warning")
+
+    # ---------- 取消与回调 ----------
+    def cancel(self):
+        # 置位后：未开始的任务直接跳过，下载中的任务在下一次进度回调时中止，
+        # 正在运行的 ffmpeg 等子进程立即终止
+        if self.cancel_requested:
+            return
+        self.cancel_requested = True
+        self._cancel_epoch += 1
+        self.log("Cancel requested", "warning")
+        threading.Thread(target=self._terminate_worker, daemon=True).start()
+
+    def cancel_job(self, job_id):
+        """取消单个队列任务：排队中的直接标记为已取消，下载中或后台后处理中的立即中止
+        （只终止该任务自己的子进程，其他任务不受影响），返回是否取消"""
+        job = self.journal.job(job_id)
+        if not job:
+            return False
+        with self._queue_lock:
+            scope = self._job_scopes.get(job_id)
+        if scope is not None:
+            scope.canceled = True
+            self.log(f"Cancel requested: job #{job_id}", "warning")
+            threading.Thread(target=self._terminate_worker, args=(scope,), daemon=True).start()
+            return True
+        if job['state'] == 'queued':
+            self.journal.set_state(job_id, 'failed', 'canceled')
+            return True
+        return False
+
+    def _terminate_worker(self, scope=None):
+        n = scope.cancel() if scope else terminate_subprocesses()
+        if n:
+            self.log(f"Terminated {n} subprocess(es)", "warning")
+
+    def finish_cancel(self):
+        """任务结束后：被取消时终止残留子进程，并按设置删除未完成的临时文件"""
+        if not self.cancel_requested:
+            return
+        terminate_subprocesses()
+        partials, self._partial_files = self._partial_files, set()
+        if partials and not self.settings.keep_partial:
+            removed = remove_partial_files(partials)
+            self.log(f"Removed {removed} partial file(s)", "info")
+
+    def _canceled(self, scope=None):
+        return self.cancel_requested or (scope is not None and scope.canceled)
+
+    def _progress_hook(self, d, job=None, tuning=None, scope=None):
+        if self._canceled(scope):
+            raise DownloadCancelled()
+        if tuning:
+            change = self.tuner.observe(d, tuning)
+            if change:
+                self.log(f"Download tuning: {change}", "info")
+        if d['status'] == 'downloading' and d.get('tmpfilename') not in (None, d.get('filename')):
+            self._partial_files.add(d['tmpfilename'])
+            if scope is not None:
+                scope.partial_files.add(d['tmpfilename'])
+        key = (job, d.get('filename'))
+        if d['status'] == 'downloading':
+            self.governor.account(key, d.get('downloaded_bytes') or 0)
+        else:
+            self.governor.forget(key)
+        self.progress_board.post(job, d)
+
+    def _postprocessor_hook(self, d, scope=None):
+        if self._canceled(scope):
+            raise DownloadCancelled()
+
+    def log_stats(self):
+        st = self.progress_board.stats()
+        if st['ticks']:
+            self.log(f"Progress: {st['events']} hook events -> {st['ticks']} UI ticks (avg {st['avg_interval_ms']:.0f} ms)", "info")
+        self.log(f"YoutubeDL sessions: {self.sessions.created} created, {self.sessions.reused} reused", "info")
+
+# ========== 无界面命令行 ==========
+def _parse_hours(value):
+    start, _, end = value.partition('-')
+    return int(start) % 24, int(end) % 24
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="yt-dlp GUI engine without a window: queue URLs with a format plan and download them")
+    parser.add_argument("urls", nargs="*", help="URLs to add to the queue (unfinished queued jobs are resumed as well)")
+    parser.add_argument("-o", "--output", default=".", help="output folder (default: current folder)")
+    parser.add_argument("-f", "--format", dest="formats", action="append", default=[], help=f"format plan entry, repeatable (e.g. -f 137+140 -f 136+140; default: {DEFAULT_FORMAT})")
+    parser.add_argument("--videos", default="", help="comma-separated video format IDs, crossed with --audios")
+    parser.add_argument("--audios", default="", help="comma-separated audio format IDs")
+    parser.add_argument("-j", "--jobs", type=int, default=3, help=f"concurrent jobs per URL (1-{MAX_CONCURRENCY})")
+    parser.add_argument("--cookies", default="", help="cookie file (Netscape format)")
+    parser.add_argument("--cookies-from-browser", default=None, help="read cookies once from this browser (chrome, firefox, ...)")
+    parser.add_argument("--no-ejs", action="store_true", help="disable EJS / JS runtime support")
+    parser.add_argument("--runtime", default="auto", help="JS runtime: auto, deno, node, bun, quickjs")
+    parser.add_argument("--runtime-path", default="", help="path of the JS runtime executable")
+    parser.add_argument("--extract-audio", action="store_true", help="download best audio and convert to mp3")
+    parser.add_argument("--fast-audio", action="store_true", help="with --extract-audio: keep the original codec (stream copy to m4a/opus/ogg), convert to mp3 only when it cannot be copied")
+    parser.add_argument("--embed-subs", action="store_true", help="download and embed subtitles")
+    parser.add_argument("--sub-langs", default=",".join(SUBTITLE_LANGS), help="comma-separated subtitle languages to embed")
+    parser.add_argument("--sub-format", default="best", help="subtitle format preference, e.g. srt/vtt/best")
+    parser.add_argument("--auto-subs", action="store_true", help="also use auto-generated subtitles when a language has no regular track")
+    parser.add_argument("--no-cache", action="store_true", help="do not use cached parse results")
+    parser.add_argument("--cache-ttl", type=int, default=INFO_CACHE_TTL // 60, help="parse cache TTL in minutes")
+    parser.add_argument("--no-archive", action="store_true", help="do not skip combos already in the download archive")
+    parser.add_argument("--no-tune", action="store_true", help="use yt-dlp's default fragment concurrency and chunk size")
+    parser.add_argument("--delete-partial", action="store_true", help="delete .part/fragment files of cancelled jobs")
+    parser.add_argument("--limit", type=float, default=0, help="total bandwidth cap in MB/s (0 = unlimited)")
+    parser.add_argument("--limit-hours", type=_parse_hours, default=None, help="only apply --limit during these hours, e.g. 9-18 or 22-6 (same start and end = all day)")
+    parser.add_argument("--split", choices=("fair", "ordered"), default="fair", help="how the bandwidth cap is split across jobs")
+    parser.add_argument("--expand-playlists", action="store_true", help="queue each entry of playlist/channel URLs as its own job (formats resolved per entry)")
+    parser.add_argument("--prefetch", action="store_true", help="parse all queued URLs in the background (per-site limited) while downloading")
+    parser.add_argument("--no-disk-check", action="store_true", help="start batches even when their estimated size exceeds the free disk space")
+    parser.add_argument("--no-overlap-pp", action="store_true", help="post-process (merge/convert/embed) inside each download instead of on the background pool")
+    parser.add_argument("--metrics", default=None, help="write per-job metrics of this run to a .json or .csv file")
+    parser.add_argument("--retry-failed", action="store_true", help="re-queue failed jobs before running")
+    parser.add_argument("--api-port", type=int, default=0, help="also serve the local job API on 127.0.0.1:PORT and keep running")
+    parser.add_argument("--data-dir", default=str(APP_DIR), help=f"queue/cache/archive folder (default: {APP_DIR})")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    settings = EngineSettings(
+        cookie_file=args.cookies,
+        browser=args.cookies_from_browser,
+        enable_ejs=not args.no_ejs,
+        runtime=args.runtime,
+        runtime_path=args.runtime_path,
+        extract_audio=args.extract_audio,
+        fast_audio=args.fast_audio,
+        embed_subs=args.embed_subs,
+        sub_langs=[lang.strip() for lang in args.sub_langs.split(',') if lang.strip()],
+        sub_format=args.sub_format,
+        auto_subs=args.auto_subs,
+        use_info_cache=not args.no_cache,
+        info_cache_ttl=max(1, args.cache_ttl) * 60,
+        keep_partial=not args.delete_partial,
+        use_archive=not args.no_archive,
+        auto_tune=not args.no_tune,
+        check_disk_space=not args.no_disk_check,
+        overlap_pp=not args.no_overlap_pp,
+    )
+    engine = DownloadEngine(settings, app_dir=args.data_dir)
+    try:
+        load_yt_dlp()
+    except RuntimeError as e:
+        print_log(str(e), "error")
+        return 2
+    engine.governor.configure(args.limit * 1024 * 1024 if args.limit > 0 else None, args.limit_hours, args.split)
+
+    plan = list(args.formats)
+    plan += engine.expand_batch([v for v in args.videos.split(',') if v], [a for a in args.audios.split(',') if a])
+    outdir = os.path.abspath(args.output)
+    if args.urls or args.api_port:
+        os.makedirs(outdir, exist_ok=True)
+    pending = engine.journal.recover()
+    if args.retry_failed:
+        engine.journal.retry_failed()
+    plan = plan or [DEFAULT_FORMAT]
+
+    def queue_entries(head, entries):
+        urls = [e['url'] for e in entries if e['url']]
+        engine.journal.add_many(urls, outdir, plan)
+        print_log(f"Playlist {head['title']}: queued {len(urls)} entries", "batch")
+
+    for url in args.urls:
+        if args.expand_playlists:
+            try:
+                if (engine.parse(url, on_playlist=queue_entries) or {}).get('_type') == 'playlist':
+                    continue
+            except Exception as e:
+                print_log(f"Playlist listing failed ({e}), queued as a single job", "warning")
+        engine.journal.add(url, outdir, plan)
+    if pending:
+        print_log(f"Resuming unfinished jobs: {pending}", "batch")
+    if args.prefetch and settings.use_info_cache:
+        queued = [job['url'] for job in engine.journal.jobs() if job['state'] == 'queued']
+        print_log(f"Prefetching {engine.prefetcher.submit(queued)} URL(s)", "batch")
+
+    engine.begin()
+    workers = max(1, min(MAX_CONCURRENCY, args.jobs))
+    wake = threading.Event()
+    api = None
+    if args.api_port:
+        from yt_dlp_api import JobAPIServer
+        api = JobAPIServer(engine, lambda: outdir, port=args.api_port, on_submit=wake.set, data_dir=args.data_dir)
+        api.start()
+        print_log(f"Job API: http://127.0.0.1:{args.api_port} (token: {api.token_path})", "info")
+
+    result = {}
+
+    def run():
+        # 开启接口时队列清空后等待新提交，直到 Ctrl+C
+        while True:
+            result['counts'] = engine.run_queue(workers)
+            if api is None or engine.cancel_requested:
+                return
+            wake.wait()
+            wake.clear()
+
+    worker = threading.Thread(target=run, daemon=True)
+    worker.start()
+
+    def on_sigint(*_):
+        engine.cancel()
+        wake.set()
+
+    signal.signal(signal.SIGINT, on_sigint)
+    while worker.is_alive():
+        worker.join(0.5)
+    if api:
+        api.stop()
+    engine.finish_cancel()
+    engine.log_stats()
+    if engine.prefetcher.status:
+        done, failed, total, avg = engine.prefetcher.summary()
+        print_log(f"Prefetch: {done}/{total} ok, {failed} failed" + (f", {avg:.1f}s avg" if avg else ""), "info")
+    if args.metrics:
+        print_log(f"Metrics: {engine.metrics.export(args.metrics)} job(s) written to {args.metrics}", "info")
+    engine.sessions.close_all()
+    _, failed = result.get('counts', (0, 0))
+    return 130 if engine.cancel_requested else (1 if failed else 0)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,28 +7,52 @@ yt-dlp GUI (CustomTkinter)
 - 全局字体：Microsoft YaHei
 """
 
+import time
+_IMPORT_START = time.perf_counter()
+
 import os
-import sys
+import argparse
+import queue
 import shutil
+import logging
 import threading
-from itertools import product
+from collections import deque
+from itertools import groupby, product
+from logging.handlers import RotatingFileHandler
 from pathlib import Path
 import customtkinter as ctk
 import tkinter as tk
 from tkinter import ttk, scrolledtext, filedialog, messagebox
 import tkinter.font as tkfont
 
-try:
-    from yt_dlp import YoutubeDL
-except ImportError:
-    print("未安装 yt-dlp，请执行: pip install -U yt-dlp")
-    sys.exit(1)
+# 解析/下载引擎与界面无关，见 yt_dlp_core.py（也可无界面运行）
+import yt_dlp_core as core
+from yt_dlp_core import (
+    APP_DIR, DEFAULT_FORMAT, INFO_CACHE_TTL, MAX_CONCURRENCY, SUBTITLE_LANGS, BudgetPlanner, DownloadEngine, EngineSettings,
+    format_bytes, load_yt_dlp)
+from yt_dlp_api import API_PORT, JobAPIServer
+
+class StartupTimer:
+    """启动各阶段耗时（--startup-timing 时输出）"""
+
+    def __init__(self, enabled=False, start=_IMPORT_START):
+        self.enabled = enabled
+        self.start = start
+        self.marks = []
+        self.reported = False
 
-try:
-    import yt_dlp_ejs  # noqa
-    HAVE_EJS = True
-except Exception:
-    HAVE_EJS = False
+    def mark(self, name):
+        self.marks.append((name, time.perf_counter()))
+
+    def has(self, name):
+        return any(n == name for n, _ in self.marks)
+
+    def report(self):
+        lines, prev = [], self.start
+        for name, t in sorted(self.marks, key=lambda m: m[1]):
+            lines.append(f"{name}: {(t - prev) * 1000:.0f} ms (total {(t - self.start) * 1000:.0f} ms)")
+            prev = t
+        return lines
 
 # ---------- 语言字典 ----------
 LANG = {
@@ -47,7 +71,11 @@ LANG = {
         "custom_format": "自定义格式:",
         "custom_hint": "如果使用多选批量，请在解析对话框选择；这里的表达式仅用于单次下载。",
         "audio_only": "仅提取音频（MP3）",
+        "fast_audio": "快速模式：保留原编码（m4a/opus/ogg），无法直接封装时才转 MP3",
         "embed_subs": "嵌入字幕",
+        "sub_langs": "语言:",
+        "sub_format": "格式:",
+        "auto_subs": "允许自动生成字幕",
         "instruction": "1. 输入 URL → “解析格式”\n2. 弹窗中多选视频与音频 → 生成批量组合，或单选预设 / 完整格式\n3. 返回后点击“开始下载”\n4. 批量时将逐个组合下载\n",
         "cookie_settings": "Cookie 设置",
         "cookie_file": "Cookie 文件:",
@@ -63,6 +91,10 @@ LANG = {
         "browser_safari": "safari - Safari",
         "browser_opera": "opera - Opera",
         "browser_brave": "brave - Brave",
+        "browser_cookie_cache": "Cookie 快照：",
+        "browser_cookie_cache_none": "尚未读取（首次使用时读取浏览器一次，之后所有任务共用）",
+        "browser_cookie_cache_info": "{browser}：{count} 个 Cookie，{age} 分钟前读取，已复用 {hits} 次",
+        "browser_cookie_refresh": "重新读取",
         "ejs_runtime": "高级格式(EJS)与 JS Runtime",
         "ejs_enable": "启用高级格式 (EJS)",
         "runtime": "Runtime:",
@@ -86,6 +118,17 @@ LANG = {
         "preset_tip": "推荐组合（单选）。若要多选批量，请用“视频格式”、“音频格式”页。",
         "summary_tip": "组合预览：显示当前多选的视频与音频及其交叉组合（自动刷新）。",
         "manual_refresh": "手动刷新",
+        "budget": "预算规划",
+        "budget_tip": "按体积上限，或 带宽 × 截止时间 推荐预算内画质最高的组合（体积依次取 filesize → filesize_approx → 码率 × 时长）。可多选后确定。",
+        "budget_size": "体积上限 (GB):",
+        "budget_rate": "带宽 (MB/s):",
+        "budget_deadline": "截止时间 (分钟):",
+        "budget_suggest": "推荐",
+        "budget_use": "使用选中推荐",
+        "budget_none": "预算内没有可估算体积的组合",
+        "budget_limit": "每个组合的预算: {budget}",
+        "budget_planned": "预计总量: {total}{unknown}，预计用时: {eta}",
+        "disk_low": "预计需要 {need}，输出目录剩余 {free}。仍要开始下载吗？",
         "gen_batch_confirm": "生成组合并确定",
         "confirm_current": "仅当前单选确定",
         "cancel_btn": "取消",
@@ -100,6 +143,58 @@ LANG = {
         "cancel_choose": "取消选择",
         "batch_log": "批量组合数",
         "batch_done": "批量结束",
+        "performance": "性能",
+        "concurrency": "并发任务数:",
+        "progress_hz": "进度刷新频率 (Hz):",
+        "keep_partial": "取消时保留 .part 与分片文件（下次可续传）",
+        "auto_tune": "按实测吞吐自动调节分片并发数与分块大小",
+        "overlap_pp": "合并/转码在后台进行，下载完立即开始下一个",
+        "use_archive": "跳过下载记录中已完成的视频/格式组合",
+        "archive_clear": "清空记录",
+        "info_cache": "解析结果缓存",
+        "info_cache_enable": "使用缓存的解析结果（立即打开格式对话框）",
+        "info_cache_revalidate": "命中缓存时后台重新解析并更新",
+        "info_cache_ttl": "有效期（分钟）:",
+        "info_cache_clear": "清空缓存",
+        "bandwidth": "带宽限制",
+        "bw_limit": "总带宽上限 (MB/s，0 为不限):",
+        "bw_split": "分配方式:",
+        "bw_schedule": "仅在以下时段限速（其余时间不限速）:",
+        "bw_hours": "时段（时）:",
+        "api": "本地任务接口 (HTTP/JSON)",
+        "api_enable": "启用（仅监听 127.0.0.1，供其他工具提交/查询下载任务）",
+        "api_port": "端口:",
+        "tab_queue": "下载队列",
+        "queue_urls": "批量 URL（每行一个，使用当前格式计划）:",
+        "queue_add": "加入队列",
+        "queue_start": "开始队列",
+        "queue_remove": "移除选中",
+        "queue_retry": "重试失败",
+        "queue_clear_done": "清除已完成",
+        "queue_resume": "恢复未完成任务",
+        "queue_empty": "队列中没有待下载任务",
+        "prefetch": "预取格式",
+        "prefetch_panel": "格式预取（双击一行打开格式选择）",
+        "prefetch_summary": "完成 {done}/{total}，失败 {failed}，平均 {avg}",
+        "prefetch_clear": "清除已结束",
+        "prefetch_need_cache": "预取需要启用解析缓存（高级设置）",
+        "tab_stats": "运行统计",
+        "stats_hint": "每个任务的解析耗时、首字节时间、平均/峰值速度、重试次数、合并与后处理耗时（本次运行）",
+        "stats_export_json": "导出 JSON",
+        "stats_export_csv": "导出 CSV",
+        "stats_clear": "清空",
+        "stats_exported": "已导出 {count} 个任务的指标: {path}",
+        "pl_title": "播放列表 / 频道条目",
+        "pl_loading": "正在加载条目…已加载 {count} 个",
+        "pl_loaded": "共 {count} 个条目",
+        "pl_selected": "已选 {selected} / {count}",
+        "pl_select_all": "全选",
+        "pl_select_none": "全不选",
+        "pl_plan": "格式计划（所有选中条目通用，下载时逐条解析）:",
+        "pl_plan_current": "当前计划",
+        "pl_queue": "加入队列并开始",
+        "pl_no_select": "没有选中任何条目",
+        "pl_tip": "单击行切换选择；关闭或确认后停止加载剩余条目",
     },
     "en": {
         "app_title": "yt-dlp Video Downloader (Multi-select & EJS)",
@@ -116,7 +211,11 @@ LANG = {
         "custom_format": "Custom Format:",
         "custom_hint": "For batch/multi-select, please use the parse dialog; this expression is only for single download.",
         "audio_only": "Audio Only (MP3)",
+        "fast_audio": "Fast mode: keep the original codec (m4a/opus/ogg), convert to MP3 only when needed",
         "embed_subs": "Embed Subtitles",
+        "sub_langs": "Languages:",
+        "sub_format": "Format:",
+        "auto_subs": "Allow auto-generated",
         "instruction": "1. Enter URL → Parse Formats\n2. In dialog, multi-select video/audio → build batch, or single preset/full format\n3. Click “Start Download”\n4. In batch mode, each combination will download in turn\n",
         "cookie_settings": "Cookie Settings",
         "cookie_file": "Cookie File:",
@@ -132,6 +231,10 @@ LANG = {
         "browser_safari": "safari - Safari",
         "browser_opera": "opera - Opera",
         "browser_brave": "brave - Brave",
+        "browser_cookie_cache": "Cookie snapshot:",
+        "browser_cookie_cache_none": "Not read yet (read from the browser once, then shared by all jobs)",
+        "browser_cookie_cache_info": "{browser}: {count} cookies, read {age} min ago, reused {hits}x",
+        "browser_cookie_refresh": "Re-read",
         "ejs_runtime": "Advanced Format (EJS) & JS Runtime",
         "ejs_enable": "Enable Advanced Format (EJS)",
         "runtime": "Runtime:",
@@ -155,6 +258,17 @@ LANG = {
         "preset_tip": "Presets (single). For batch multi-select, use Video/Audio tabs.",
         "summary_tip": "Preview: current selections and cross combinations (auto refresh).",
         "manual_refresh": "Refresh",
+        "budget": "Budget Planner",
+        "budget_tip": "Suggests the best combos within a size cap, or bandwidth x deadline. Size uses filesize, then filesize_approx, then bitrate x duration. Multi-select, then confirm.",
+        "budget_size": "Size cap (GB):",
+        "budget_rate": "Bandwidth (MB/s):",
+        "budget_deadline": "Deadline (min):",
+        "budget_suggest": "Suggest",
+        "budget_use": "Use Selected",
+        "budget_none": "No combo with a known size fits the budget",
+        "budget_limit": "Budget per combo: {budget}",
+        "budget_planned": "Planned total: {total}{unknown}, estimated time: {eta}",
+        "disk_low": "About {need} is needed but only {free} is free in the output folder. Start anyway?",
         "gen_batch_confirm": "Generate Combos & OK",
         "confirm_current": "OK (current single)",
         "cancel_btn": "Cancel",
@@ -169,9 +283,132 @@ LANG = {
         "cancel_choose": "Selection canceled",
         "batch_log": "Batch combos",
         "batch_done": "Batch finished",
+        "performance": "Performance",
+        "concurrency": "Concurrent jobs:",
+        "progress_hz": "Progress refresh rate (Hz):",
+        "keep_partial": "Keep .part and fragment files on cancel (resume later)",
+        "auto_tune": "Auto-tune fragment concurrency and chunk size from measured throughput",
+        "overlap_pp": "Merge/convert in the background and start the next download right away",
+        "use_archive": "Skip video/format combos already in the download archive",
+        "archive_clear": "Clear Archive",
+        "info_cache": "Parse Result Cache",
+        "info_cache_enable": "Use cached parse results (open format dialog instantly)",
+        "info_cache_revalidate": "Revalidate in background on cache hit",
+        "info_cache_ttl": "TTL (minutes):",
+        "info_cache_clear": "Clear Cache",
+        "bandwidth": "Bandwidth Limit",
+        "bw_limit": "Total bandwidth cap (MB/s, 0 = unlimited):",
+        "bw_split": "Split:",
+        "bw_schedule": "Only cap during these hours (unlimited otherwise):",
+        "bw_hours": "Hours:",
+        "api": "Local Job API (HTTP/JSON)",
+        "api_enable": "Enable (127.0.0.1 only, lets other tools submit and monitor jobs)",
+        "api_port": "Port:",
+        "tab_queue": "Queue",
+        "queue_urls": "URLs (one per line, uses current format plan):",
+        "queue_add": "Add to Queue",
+        "queue_start": "Start Queue",
+        "queue_remove": "Remove Selected",
+        "queue_retry": "Retry Failed",
+        "queue_clear_done": "Clear Done",
+        "queue_resume": "Resuming unfinished jobs",
+        "queue_empty": "No queued jobs",
+        "prefetch": "Prefetch Formats",
+        "prefetch_panel": "Format prefetch (double-click a row to open the format dialog)",
+        "prefetch_summary": "{done}/{total} done, {failed} failed, {avg} avg",
+        "prefetch_clear": "Clear Finished",
+        "prefetch_need_cache": "Prefetch needs the parse cache (Advanced tab)",
+        "tab_stats": "Stats",
+        "stats_hint": "Per job: extraction time, time to first byte, average/peak speed, retries, merge and post-processing time (this run)",
+        "stats_export_json": "Export JSON",
+        "stats_export_csv": "Export CSV",
+        "stats_clear": "Clear",
+        "stats_exported": "Exported metrics of {count} job(s): {path}",
+        "pl_title": "Playlist / Channel Entries",
+        "pl_loading": "Loading entries... {count} so far",
+        "pl_loaded": "{count} entries",
+        "pl_selected": "Selected {selected} / {count}",
+        "pl_select_all": "Select All",
+        "pl_select_none": "Select None",
+        "pl_plan": "Format plan (shared by all selected entries, resolved per entry at download time):",
+        "pl_plan_current": "Current plan",
+        "pl_queue": "Queue & Start",
+        "pl_no_select": "No entries selected",
+        "pl_tip": "Click a row to toggle it; closing or confirming stops loading further entries",
     }
 }
 
+# 进度面板默认刷新频率与速度平滑系数（指数滑动平均）
+PROGRESS_TICK_HZ = 10
+SPEED_SMOOTHING = 0.3
+
+# 日志面板保留的最近行数、刷新间隔，以及磁盘日志的轮转大小
+LOG_MAX_LINES = 2000
+LOG_FLUSH_MS = 100
+LOG_FILE_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+class LogSink:
+    """线程安全的日志汇：任意线程 push，UI 定时 drain 后批量写入面板；
+    面板只保留最近 max_lines 行，完整日志同时写入轮转文件"""
+    LEVELS = {"error": logging.ERROR, "warning": logging.WARNING}
+
+    def __init__(self, log_dir=None, max_lines=LOG_MAX_LINES):
+        self._pending = queue.SimpleQueue()
+        self.recent = deque(maxlen=max_lines)
+        self.logger = logging.getLogger("yt_dlp_gui")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        if log_dir is not None and not self.logger.handlers:
+            try:
+                Path(log_dir).mkdir(parents=True, exist_ok=True)
+                handler = RotatingFileHandler(
+                    Path(log_dir) / "yt-dlp-gui.log", maxBytes=LOG_FILE_BYTES,
+                    backupCount=LOG_FILE_BACKUPS, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(tag)s] %(message)s"))
+                self.logger.addHandler(handler)
+            except OSError:
+                pass
+
+    def push(self, msg, tag="info"):
+        self._pending.put((msg, tag))
+        self.logger.log(self.LEVELS.get(tag, logging.INFO), msg, extra={'tag': tag})
+
+    def drain(self):
+        """取出自上次以来的全部新行，并记入最近行环形缓冲"""
+        lines = []
+        while True:
+            try:
+                lines.append(self._pending.get_nowait())
+            except queue.Empty:
+                break
+        self.recent.extend(lines)
+        return lines
+
+class PlaylistFeed:
+    """解析线程 → 条目列表对话框的通道：线程逐条 push，对话框定时 drain；
+    对话框关闭后 closed 置位，解析线程随即停止读取后续条目"""
+
+    def __init__(self):
+        self._pending = queue.SimpleQueue()
+        self.closed = False
+        self.done = False
+
+    def push(self, entry):
+        self._pending.put(entry)
+
+    def finish(self):
+        self.done = True
+
+    def drain(self):
+        entries = []
+        while True:
+            try:
+                entries.append(self._pending.get_nowait())
+            except queue.Empty:
+                break
+        return entries
+
 DEFAULT_FONT = None
 DEFAULT_FONT_BOLD = None
 LOG_FONT = None
@@ -197,9 +434,12 @@ def init_fonts():
     DEFAULT_FONT_BOLD = ctk.CTkFont(family="Microsoft YaHei", size=12, weight="bold")
     LOG_FONT = ("Microsoft YaHei", 11)
 
+# 搜索框输入防抖（毫秒）
+SEARCH_DEBOUNCE_MS = 150
+
 # ========== 格式选择对话框 ==========
 class FormatSelectorDialog:
-    def __init__(self, parent, formats, video_info, lang="zh"):
+    def __init__(self, parent, formats, video_info, lang="zh", bandwidth=None):
         self.lang = lang
         self.t = lambda k: LANG[self.lang].get(k, k)
         self.parent = parent
@@ -209,6 +449,14 @@ class FormatSelectorDialog:
         self.selected_format_code = None
         self.selected_video_ids = set()
         self.selected_audio_ids = set()
+        # 体积估算只在打开时对整张格式表做一次；bandwidth 为当前带宽上限（字节/秒），用于估算用时
+        self.planner = BudgetPlanner({'formats': self.formats, 'duration': self.video_info.get('duration')})
+        self.bandwidth = bandwidth
+        self._format_by_id = {str(f.get('format_id')): f for f in self.formats}
+        # 每个 Treeview 的搜索索引：[(iid, format_id, 小写拼接的整行文本)]，按原始顺序
+        self._search_index = {}
+        self._search_keys = {}
+        self._search_jobs = {}
 
         self.dialog = ctk.CTkToplevel(parent)
         self.dialog.title(self.t("parse_title"))
@@ -250,18 +498,21 @@ class FormatSelectorDialog:
         video_frame = ctk.CTkFrame(self.notebook)
         audio_frame = ctk.CTkFrame(self.notebook)
         preset_frame = ctk.CTkFrame(self.notebook)
+        budget_frame = ctk.CTkFrame(self.notebook)
         summary_frame = ctk.CTkFrame(self.notebook)
 
         self.notebook.add(all_frame, text=self.t("all_formats"))
         self.notebook.add(video_frame, text=self.t("videos_only"))
         self.notebook.add(audio_frame, text=self.t("audios_only"))
         self.notebook.add(preset_frame, text=self.t("presets"))
+        self.notebook.add(budget_frame, text=self.t("budget"))
         self.notebook.add(summary_frame, text=self.t("summary"))
 
         self._build_all_formats_tab(all_frame)
         self._build_video_tab(video_frame)
         self._build_audio_tab(audio_frame)
         self._build_preset_tab(preset_frame)
+        self._build_budget_tab(budget_frame)
         self._build_summary_tab(summary_frame)
 
         btn_bar = ctk.CTkFrame(self.dialog, corner_radius=8)
@@ -281,7 +532,6 @@ class FormatSelectorDialog:
         ctk.CTkLabel(bar, text=self.t("all_formats_tip"), text_color="gray", font=DEFAULT_FONT).pack(side=tk.LEFT)
 
         self.search_var = tk.StringVar()
-        self.search_var.trace_add('write', lambda *_: self._filter_all())
         ctk.CTkEntry(bar, textvariable=self.search_var, width=200, placeholder_text=self.t("search"), font=DEFAULT_FONT).pack(side=tk.RIGHT)
 
         columns = ("format_id", "ext", "resolution", "fps", "vcodec", "acodec", "vbr", "abr", "filesize", "note")
@@ -308,23 +558,70 @@ class FormatSelectorDialog:
             self.all_tree.column(k, width=widths[k], anchor=tk.W)
         self.all_tree.pack(fill=tk.BOTH, expand=True)
 
-        self._all_cache = []
         for fmt in self.formats:
             vals = self._row_from_format(fmt, include_acodec=True)
-            self._all_cache.append(vals)
-            self.all_tree.insert("", tk.END, values=vals, tags=(vals[0],))
+            self._insert_row(self.all_tree, vals)
         self.all_tree.bind("<<TreeviewSelect>>", self._on_all_single)
-
-    def _filter_all(self):
-        key = (self.search_var.get() or "").lower()
-        for it in self.all_tree.get_children():
-            self.all_tree.delete(it)
-        for row in self._all_cache:
-            if not key or any(key in str(v).lower() for v in row):
-                self.all_tree.insert("", tk.END, values=row, tags=(row[0],))
+        self._bind_search(self.all_tree, self.search_var)
+
+    def _insert_row(self, tree, vals):
+        iid = tree.insert("", tk.END, values=vals, tags=(vals[0],))
+        haystack = "\t".join(str(v) for v in vals).lower()
+        self._search_index.setdefault(tree, []).append((iid, str(vals[0]), haystack))
+
+    def _bind_search(self, tree, var):
+        var.trace_add('write', lambda *_: self._schedule_filter(tree, var))
+
+    def _schedule_filter(self, tree, var):
+        job = self._search_jobs.pop(tree, None)
+        if job:
+            self.dialog.after_cancel(job)
+        self._search_jobs[tree] = self.dialog.after(SEARCH_DEBOUNCE_MS, lambda: self._apply_filter(tree, var.get()))
+
+    def _apply_filter(self, tree, text):
+        """按预建索引隐藏/恢复已有行（detach/move），不重建行"""
+        self._search_jobs.pop(tree, None)
+        key = (text or "").strip().lower()
+        if self._search_keys.get(tree, "") == key:
+            return
+        self._search_keys[tree] = key
+        selected = self._selected_ids_for(tree)
+        pos = 0
+        keep = []
+        for iid, fid, haystack in self._search_index.get(tree, []):
+            if not key or key in haystack:
+                tree.move(iid, "", pos)
+                pos += 1
+                if fid in selected:
+                    keep.append(iid)
+            else:
+                tree.detach(iid)
+        if keep:
+            tree.selection_add(*keep)
+
+    def _selected_ids_for(self, tree):
+        if tree is self.video_tree:
+            return set(self.selected_video_ids)
+        if tree is self.audio_tree:
+            return set(self.selected_audio_ids)
+        return set()
+
+    def _multi_selection(self, tree, previous):
+        """当前可见行中的选择 + 被搜索隐藏但之前已选的格式"""
+        visible = set(tree.get_children())
+        hidden = {fid for iid, fid, _ in self._search_index.get(tree, []) if iid not in visible and fid in previous}
+        return hidden | {str(tree.item(i)['values'][0]) for i in tree.selection() if i in visible}
+
+    def _search_bar(self, parent, tip):
+        bar = ctk.CTkFrame(parent)
+        bar.pack(fill=tk.X, pady=5, padx=8)
+        ctk.CTkLabel(bar, text=tip, text_color="gray", anchor="w", justify="left", font=DEFAULT_FONT).pack(side=tk.LEFT)
+        var = tk.StringVar()
+        ctk.CTkEntry(bar, textvariable=var, width=200, placeholder_text=self.t("search"), font=DEFAULT_FONT).pack(side=tk.RIGHT)
+        return var
 
     def _build_video_tab(self, parent):
-        ctk.CTkLabel(parent, text=self.t("video_tip"), text_color="gray", anchor="w", justify="left", font=DEFAULT_FONT).pack(anchor=tk.W, pady=5, padx=8)
+        self.video_search_var = self._search_bar(parent, self.t("video_tip"))
 
         cols = ("format_id", "ext", "resolution", "fps", "vcodec", "vbr", "filesize", "note")
         frame = ctk.CTkFrame(parent)
@@ -353,13 +650,14 @@ class FormatSelectorDialog:
         v_formats = [f for f in self.formats if f.get('vcodec', 'none') != 'none' and f.get('acodec', 'none') == 'none']
         for fmt in v_formats:
             vals = self._row_from_format(fmt, include_acodec=False)
-            self.video_tree.insert("", tk.END, values=vals, tags=(vals[0],))
+            self._insert_row(self.video_tree, vals)
 
         self.video_tree.bind("<<TreeviewSelect>>", self._on_video_multi)
         self.video_tree.bind("<ButtonRelease-1>", self._on_video_multi)
+        self._bind_search(self.video_tree, self.video_search_var)
 
     def _build_audio_tab(self, parent):
-        ctk.CTkLabel(parent, text=self.t("audio_tip"), text_color="gray", anchor="w", justify="left", font=DEFAULT_FONT).pack(anchor=tk.W, pady=5, padx=8)
+        self.audio_search_var = self._search_bar(parent, self.t("audio_tip"))
 
         cols = ("format_id", "ext", "acodec", "abr", "asr", "channels", "filesize", "note")
         frame = ctk.CTkFrame(parent)
@@ -395,9 +693,10 @@ class FormatSelectorDialog:
             ch = f"{fmt.get('audio_channels')}ch" if fmt.get('audio_channels') else "-"
             size = self._filesize(fmt)
             note = fmt.get('format_note', '-') or "-"
-            self.audio_tree.insert("", tk.END, values=(fid, ext, acodec, abr, asr, ch, size, note), tags=(fid,))
+            self._insert_row(self.audio_tree, (fid, ext, acodec, abr, asr, ch, size, note))
         self.audio_tree.bind("<<TreeviewSelect>>", self._on_audio_multi)
         self.audio_tree.bind("<ButtonRelease-1>", self._on_audio_multi)
+        self._bind_search(self.audio_tree, self.audio_search_var)
 
     def _build_preset_tab(self, parent):
         ctk.CTkLabel(parent, text=self.t("preset_tip"), text_color="gray", anchor="w", justify="left", font=DEFAULT_FONT).pack(anchor=tk.W, pady=5, padx=8)
@@ -438,6 +737,78 @@ class FormatSelectorDialog:
             self.preset_tree.insert("", tk.END, values=p, tags=("preset", p[1]))
         self.preset_tree.bind("<<TreeviewSelect>>", self._on_preset_single)
 
+    def _build_budget_tab(self, parent):
+        ctk.CTkLabel(parent, text=self.t("budget_tip"), text_color="gray", anchor="w", justify="left", wraplength=1050, font=DEFAULT_FONT).pack(anchor=tk.W, pady=5, padx=8)
+        bar = ctk.CTkFrame(parent)
+        bar.pack(fill=tk.X, padx=8, pady=4)
+        self.budget_size_var = tk.StringVar()
+        self.budget_rate_var = tk.StringVar(value=f"{self.bandwidth / 1024 / 1024:g}" if self.bandwidth else "")
+        self.budget_deadline_var = tk.StringVar()
+        for label, var in (("budget_size", self.budget_size_var), ("budget_rate", self.budget_rate_var), ("budget_deadline", self.budget_deadline_var)):
+            ctk.CTkLabel(bar, text=self.t(label), font=DEFAULT_FONT).pack(side=tk.LEFT, padx=(8, 4))
+            ctk.CTkEntry(bar, textvariable=var, width=80, font=DEFAULT_FONT).pack(side=tk.LEFT)
+        ctk.CTkButton(bar, text=self.t("budget_suggest"), command=self._suggest_budget, width=100, font=DEFAULT_FONT).pack(side=tk.LEFT, padx=12)
+
+        cols = ("combo", "resolution", "audio", "size", "time")
+        frame = ctk.CTkFrame(parent)
+        frame.pack(fill=tk.BOTH, expand=True, padx=8, pady=6)
+        self.budget_tree = ttk.Treeview(frame, columns=cols, show="headings", selectmode="extended", style=self.tv_style_name)
+        heads = {"combo": "Combo", "resolution": "Resolution", "audio": "ABR", "size": "Size", "time": "Time"}
+        widths = {"combo": 200, "resolution": 160, "audio": 100, "size": 160, "time": 140}
+        for k in cols:
+            self.budget_tree.heading(k, text=heads[k])
+            self.budget_tree.column(k, width=widths[k], anchor=tk.W)
+        self.budget_tree.pack(fill=tk.BOTH, expand=True)
+
+        bottom = ctk.CTkFrame(parent)
+        bottom.pack(fill=tk.X, padx=8, pady=6)
+        self.budget_label = ctk.CTkLabel(bottom, text="", text_color="blue", anchor="w", font=DEFAULT_FONT)
+        self.budget_label.pack(side=tk.LEFT, padx=4)
+        ctk.CTkButton(bottom, text=self.t("budget_use"), command=self._confirm_budget, width=140, font=DEFAULT_FONT).pack(side=tk.RIGHT)
+        self._suggest_budget()
+
+    def _number(self, var):
+        try:
+            value = float(var.get())
+        except (TypeError, ValueError):
+            return None
+        return value if value > 0 else None
+
+    def _rate(self):
+        rate = self._number(self.budget_rate_var) if hasattr(self, 'budget_rate_var') else None
+        return rate * 1024 * 1024 if rate else self.bandwidth
+
+    def _eta(self, size):
+        rate = self._rate()
+        if not size or not rate:
+            return "N/A"
+        seconds = int(size / rate)
+        return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+    def _suggest_budget(self):
+        size_gb = self._number(self.budget_size_var)
+        deadline = self._number(self.budget_deadline_var)
+        budget = self.planner.budget(size_gb * 1024 ** 3 if size_gb else None, self._rate(), deadline * 60 if deadline else None)
+        self.budget_tree.delete(*self.budget_tree.get_children())
+        picks = self.planner.suggest(budget, limit=10)
+        for combo, size in picks:
+            video = self._format_by_id.get(combo.split('+')[0], {})
+            audio = self._format_by_id.get(combo.split('+')[-1], {})
+            res = f"{video.get('height')}p{video.get('fps') or ''}" if video.get('height') else "-"
+            self.budget_tree.insert("", tk.END, values=(combo, res, self._kbps(audio.get('abr')), format_bytes(size), self._eta(size)))
+        if not picks:
+            self.budget_label.configure(text=self.t("budget_none"))
+        else:
+            self.budget_label.configure(text=self.t("budget_limit").format(budget=format_bytes(budget) if budget else "∞"))
+
+    def _confirm_budget(self):
+        combos = [str(self.budget_tree.item(i)['values'][0]) for i in self.budget_tree.selection()]
+        if not combos:
+            messagebox.showwarning(self.t("parse_title"), self.t("no_batch_choose"))
+            return
+        self.result = combos[0] if len(combos) == 1 else {'combos': combos}
+        self.dialog.destroy()
+
     def _build_summary_tab(self, parent):
         ctk.CTkLabel(parent, text=self.t("summary_tip"), text_color="gray", anchor="w", justify="left", font=DEFAULT_FONT).pack(anchor=tk.W, pady=5, padx=8)
         self.summary_text = scrolledtext.ScrolledText(parent, height=22, wrap=tk.WORD, state=tk.DISABLED, font=LOG_FONT)
@@ -514,11 +885,11 @@ class FormatSelectorDialog:
         self.selected_format_code = fmt_code
 
     def _on_video_multi(self, _):
-        self.selected_video_ids = {str(self.video_tree.item(i)['values'][0]) for i in self.video_tree.selection()}
+        self.selected_video_ids = self._multi_selection(self.video_tree, self.selected_video_ids)
         self._refresh_summary()
 
     def _on_audio_multi(self, _):
-        self.selected_audio_ids = {str(self.audio_tree.item(i)['values'][0]) for i in self.audio_tree.selection()}
+        self.selected_audio_ids = self._multi_selection(self.audio_tree, self.selected_audio_ids)
         self._refresh_summary()
 
     def _refresh_summary(self):
@@ -545,9 +916,14 @@ class FormatSelectorDialog:
                 if idx > 25:
                     self.summary_text.insert(tk.END, "... more ...\n")
                     break
-                self.summary_text.insert(tk.END, f"  {vid}+{aid}\n")
+                self.summary_text.insert(tk.END, f"  {vid}+{aid}  ~{format_bytes(self.planner.size_of(f'{vid}+{aid}'))}\n")
         else:
             self.summary_text.insert(tk.END, "\nNo cross combos yet.\n")
+        combos = DownloadEngine.expand_batch(v_ids, a_ids)
+        if combos:
+            planned, unknown = self.planner.plan_total(combos)
+            note = f" (+{len(unknown)} ?)" if unknown else ""
+            self.summary_text.insert(tk.END, "\n" + self.t("budget_planned").format(total=format_bytes(planned), unknown=note, eta=self._eta(planned)) + "\n")
         self.summary_text.config(state=tk.DISABLED)
 
     def _clear_all(self):
@@ -583,15 +959,218 @@ class FormatSelectorDialog:
         self.result = None
         self.dialog.destroy()
 
+# 条目列表：只创建这么多行并在滚动时复用；新条目的轮询间隔（毫秒）
+PLAYLIST_VISIBLE_ROWS = 16
+PLAYLIST_POLL_MS = 100
+PLAYLIST_PLANS = (
+    'bestvideo+bestaudio/best',
+    'bestvideo[height<=1080]+bestaudio/best',
+    'bestvideo[height<=720]+bestaudio/best',
+    'bestaudio/best',
+)
+
+# ========== 播放列表条目对话框 ==========
+class PlaylistDialog:
+    """播放列表/频道条目：边加载边显示。Treeview 只有 PLAYLIST_VISIBLE_ROWS 行，
+    滚动时改写这些行的内容（虚拟列表），上千条目也只占固定数量的控件"""
+
+    def __init__(self, parent, head, feed, current_plan, lang="zh"):
+        self.lang = lang
+        self.t = lambda k: LANG[self.lang].get(k, k)
+        self.feed = feed
+        self.head = head or {}
+        self.entries = []
+        self.selected = set()
+        # 全选状态下，后续加载的条目默认选中
+        self._select_new = True
+        self.top = 0
+        self.result = None
+        self.current_label = f"{self.t('pl_plan_current')}: {', '.join(current_plan)}"
+
+        self.dialog = ctk.CTkToplevel(parent)
+        self.dialog.title(self.t("pl_title"))
+        self.dialog.geometry("1000x640")
+        self.dialog.transient(parent)
+        self.dialog.grab_set()
+        self.dialog.protocol("WM_DELETE_WINDOW", self.on_cancel)
+
+        style = ttk.Style(self.dialog)
+        self.tv_style_name = "Large.Treeview"
+        style.configure(self.tv_style_name, font=("Microsoft YaHei", 14), rowheight=28)
+        style.configure(f"{self.tv_style_name}.Heading", font=("Microsoft YaHei", 14, "bold"))
+
+        self._build_ui()
+        self._render()
+        self._poll()
+
+        self.dialog.update_idletasks()
+        x = (self.dialog.winfo_screenwidth() - self.dialog.winfo_width()) // 2
+        y = (self.dialog.winfo_screenheight() - self.dialog.winfo_height()) // 2
+        self.dialog.geometry(f"+{x}+{y}")
+
+    def _build_ui(self):
+        info_frame = ctk.CTkFrame(self.dialog, corner_radius=8)
+        info_frame.pack(fill=tk.X, padx=10, pady=8)
+        head = f"Playlist: {self.head.get('title', 'Unknown')}"
+        if self.head.get('uploader'):
+            head += f" | Uploader: {self.head['uploader']}"
+        ctk.CTkLabel(info_frame, text=head, wraplength=960, anchor="w", justify="left", font=DEFAULT_FONT).pack(anchor=tk.W, padx=8, pady=(8, 2))
+        self.count_label = ctk.CTkLabel(info_frame, text="", text_color="blue", anchor="w", font=DEFAULT_FONT)
+        self.count_label.pack(anchor=tk.W, padx=8, pady=(0, 8))
+
+        frame = ctk.CTkFrame(self.dialog)
+        frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=6)
+        self.scrollbar = ttk.Scrollbar(frame, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        cols = ("sel", "index", "title", "duration", "id")
+        self.tree = ttk.Treeview(frame, columns=cols, show="headings", height=PLAYLIST_VISIBLE_ROWS,
+                                 selectmode="none", style=self.tv_style_name)
+        heads = {"sel": "✓", "index": "#", "title": "Title", "duration": "Duration", "id": "ID"}
+        widths = {"sel": 40, "index": 60, "title": 560, "duration": 90, "id": 160}
+        for k in cols:
+            self.tree.heading(k, text=heads[k])
+            self.tree.column(k, width=widths[k], anchor=tk.W, stretch=(k == "title"))
+        for row in range(PLAYLIST_VISIBLE_ROWS):
+            self.tree.insert("", tk.END, iid=f"r{row}", values=("", "", "", "", ""))
+        self.tree.pack(fill=tk.BOTH, expand=True)
+        self.tree.bind("<Button-1>", self._on_click)
+        self.tree.bind("<MouseWheel>", lambda e: self._scroll_by(-3 if e.delta > 0 else 3))
+        self.tree.bind("<Button-4>", lambda e: self._scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda e: self._scroll_by(3))
+        ctk.CTkLabel(self.dialog, text=self.t("pl_tip"), text_color="gray", anchor="w", font=DEFAULT_FONT).pack(fill=tk.X, padx=12)
+
+        plan_bar = ctk.CTkFrame(self.dialog, corner_radius=8)
+        plan_bar.pack(fill=tk.X, padx=10, pady=(6, 0))
+        ctk.CTkLabel(plan_bar, text=self.t("pl_plan"), font=DEFAULT_FONT).pack(side=tk.LEFT, padx=8, pady=8)
+        self.plan_var = tk.StringVar(value=self.current_label)
+        ctk.CTkComboBox(plan_bar, variable=self.plan_var, width=360, font=DEFAULT_FONT,
+                        values=[self.current_label, *PLAYLIST_PLANS]).pack(side=tk.LEFT, padx=8, pady=8)
+
+        btn_bar = ctk.CTkFrame(self.dialog, corner_radius=8)
+        btn_bar.pack(fill=tk.X, padx=10, pady=10)
+        ctk.CTkButton(btn_bar, text=self.t("pl_queue"), command=self._confirm, width=150, font=DEFAULT_FONT).pack(side=tk.RIGHT, padx=5)
+        ctk.CTkButton(btn_bar, text=self.t("cancel_btn"), command=self.on_cancel, width=100, font=DEFAULT_FONT).pack(side=tk.RIGHT, padx=5)
+        ctk.CTkButton(btn_bar, text=self.t("pl_select_all"), command=self._select_all, width=100, font=DEFAULT_FONT).pack(side=tk.LEFT, padx=5)
+        ctk.CTkButton(btn_bar, text=self.t("pl_select_none"), command=self._select_none, width=100, font=DEFAULT_FONT).pack(side=tk.LEFT, padx=5)
+        self.selection_label = ctk.CTkLabel(btn_bar, text="", text_color="blue", anchor="w", font=DEFAULT_FONT)
+        self.selection_label.pack(side=tk.LEFT, padx=12)
+
+    def _poll(self):
+        """取出解析线程新读到的条目；只重绘可见行"""
+        if not self.dialog.winfo_exists():
+            return
+        done = self.feed.done
+        new = self.feed.drain()
+        if new:
+            start = len(self.entries)
+            self.entries.extend(new)
+            if self._select_new:
+                self.selected.update(range(start, len(self.entries)))
+            self._render()
+        if done:
+            self._update_labels()
+        else:
+            self.dialog.after(PLAYLIST_POLL_MS, self._poll)
+
+    def _duration(self, seconds):
+        if not seconds:
+            return ""
+        seconds = int(seconds)
+        if seconds >= 3600:
+            return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+        return f"{seconds // 60}:{seconds % 60:02d}"
+
+    def _render(self):
+        total = len(self.entries)
+        for row in range(PLAYLIST_VISIBLE_ROWS):
+            i = self.top + row
+            if i < total:
+                e = self.entries[i]
+                values = ("☑" if i in self.selected else "☐", e['index'], e['title'], self._duration(e['duration']), e['id'])
+            else:
+                values = ("", "", "", "", "")
+            self.tree.item(f"r{row}", values=values)
+        if total > PLAYLIST_VISIBLE_ROWS:
+            self.scrollbar.set(self.top / total, (self.top + PLAYLIST_VISIBLE_ROWS) / total)
+        else:
+            self.scrollbar.set(0, 1)
+        self._update_labels()
+
+    def _update_labels(self):
+        count = len(self.entries)
+        key = "pl_loaded" if self.feed.done else "pl_loading"
+        self.count_label.configure(text=self.t(key).format(count=count))
+        self.selection_label.configure(text=self.t("pl_selected").format(selected=len(self.selected), count=count))
+
+    def _scroll_to(self, top):
+        top = max(0, min(top, len(self.entries) - PLAYLIST_VISIBLE_ROWS))
+        if top != self.top:
+            self.top = top
+            self._render()
+
+    def _scroll_by(self, rows):
+        self._scroll_to(self.top + rows)
+        return "break"
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self._scroll_to(int(float(amount) * len(self.entries)))
+        else:
+            step = PLAYLIST_VISIBLE_ROWS if unit == "pages" else 1
+            self._scroll_by(int(amount) * step)
+
+    def _on_click(self, event):
+        row = self.tree.identify_row(event.y)
+        if not row:
+            return
+        i = self.top + int(row[1:])
+        if i < len(self.entries):
+            if i in self.selected:
+                self.selected.discard(i)
+            else:
+                self.selected.add(i)
+            self._render()
+        return "break"
+
+    def _select_all(self):
+        self._select_new = True
+        self.selected = set(range(len(self.entries)))
+        self._render()
+
+    def _select_none(self):
+        self._select_new = False
+        self.selected.clear()
+        self._render()
+
+    def _confirm(self):
+        urls = [self.entries[i]['url'] for i in sorted(self.selected) if self.entries[i]['url']]
+        if not urls:
+            messagebox.showwarning(self.t("pl_title"), self.t("pl_no_select"))
+            return
+        plan = (self.plan_var.get() or "").strip()
+        self.result = {'urls': urls, 'plan': None if plan == self.current_label else plan}
+        self._close()
+
+    def on_cancel(self):
+        self.result = None
+        self._close()
+
+    def _close(self):
+        self.feed.closed = True
+        self.dialog.destroy()
+
 # ========== 主界面 ==========
 class YtDlpGUI:
-    def __init__(self, root):
+    def __init__(self, root, startup_timer=None):
         self.root = root
+        self.startup_timer = startup_timer or StartupTimer()
+        self.log_sink = LogSink(APP_DIR / "logs")
         self.lang_var = tk.StringVar(value="zh")
         self.lang = self.lang_var.get()
 
         self.is_downloading = False
-        self.cancel_requested = False
+        self.engine = DownloadEngine(EngineSettings(), log=self.log_message)
+        self.engine.on_cookies = lambda: self.root.after(0, self._update_browser_cookie_status)
 
         self.cookie_file_path = tk.StringVar()
         self.browser_var = tk.StringVar(value="none")
@@ -599,17 +1178,46 @@ class YtDlpGUI:
         self.enable_ejs_var = tk.BooleanVar(value=True)
         self.runtime_choice_var = tk.StringVar(value="auto")
         self.runtime_path_var = tk.StringVar()
+        self.concurrency_var = tk.StringVar(value="3")
+        self.progress_hz_var = tk.StringVar(value=str(PROGRESS_TICK_HZ))
+        self.keep_partial_var = tk.BooleanVar(value=True)
+        self.auto_tune_var = tk.BooleanVar(value=True)
+        self.overlap_pp_var = tk.BooleanVar(value=True)
+        self._tuner_shown = None
+        self.bw_limit_var = tk.StringVar(value="0")
+        self.bw_split_var = tk.StringVar(value="fair")
+        self.bw_schedule_var = tk.BooleanVar(value=False)
+        self.bw_start_var = tk.StringVar(value="9")
+        self.bw_end_var = tk.StringVar(value="18")
+        for var in (self.bw_limit_var, self.bw_split_var, self.bw_schedule_var, self.bw_start_var, self.bw_end_var):
+            var.trace_add("write", self._apply_bandwidth)
+        self._drained_events = 0
+        self._speed_ema = None
 
-        self.current_video_info = None
         self.batch_formats = []
+        self.use_archive_var = tk.BooleanVar(value=True)
+        self.use_info_cache_var = tk.BooleanVar(value=True)
+        self.revalidate_cache_var = tk.BooleanVar(value=False)
+        self.info_cache_ttl_var = tk.StringVar(value=str(INFO_CACHE_TTL // 60))
 
         self.output_path = tk.StringVar()
+        # 接口线程读取的输出目录（避免在非 UI 线程访问 Tk 变量）
+        self._api_outdir = ""
+        self.output_path.trace_add("write", lambda *_: setattr(self, "_api_outdir", self.output_path.get()))
+        self.api_enabled_var = tk.BooleanVar(value=False)
+        self.api_port_var = tk.StringVar(value=str(API_PORT))
+        self.api_server = None
+        self._api_pending = False
 
         self.url_var = tk.StringVar()
         self.format_var = tk.StringVar(value="bestvideo+bestaudio/best - 最佳质量（推荐）")
         self.custom_format_var = tk.StringVar()
         self.extract_audio = tk.BooleanVar(value=False)
+        self.fast_audio = tk.BooleanVar(value=False)
         self.embed_subs = tk.BooleanVar(value=False)
+        self.sub_langs_var = tk.StringVar(value=",".join(SUBTITLE_LANGS))
+        self.sub_format_var = tk.StringVar(value="best")
+        self.auto_subs_var = tk.BooleanVar(value=False)
 
         self.root.grid_rowconfigure(0, weight=0)
         self.root.grid_rowconfigure(1, weight=1)
@@ -618,7 +1226,11 @@ class YtDlpGUI:
 
         self._build_ui()
         self.output_path.set(str(Path.home() / "Downloads"))
-        self._check_environment()
+        self.update_status("Loading yt-dlp...", "blue")
+        threading.Thread(target=self._warmup_worker, daemon=True).start()
+        self._resume_queue()
+        self._progress_tick()
+        self._flush_log()
 
     def t(self, key):
         return LANG[self.lang].get(key, key)
@@ -649,7 +1261,9 @@ class YtDlpGUI:
 
         self.basic_tab = self.tabview.add(self.t("tab_basic"))
         self.adv_tab = self.tabview.add(self.t("tab_adv"))
-        for tab in (self.basic_tab, self.adv_tab):
+        self.queue_tab = self.tabview.add(self.t("tab_queue"))
+        self.stats_tab = self.tabview.add(self.t("tab_stats"))
+        for tab in (self.basic_tab, self.adv_tab, self.queue_tab, self.stats_tab):
             tab.grid_rowconfigure(0, weight=1)
             tab.grid_columnconfigure(0, weight=1)
 
@@ -664,6 +1278,8 @@ class YtDlpGUI:
 
         self._build_basic_tab(basic_view)
         self._build_adv_tab(adv_view)
+        self._build_queue_tab(self.queue_tab)
+        self._build_stats_tab(self.stats_tab)
         self._build_bottom()
 
     def _on_language_changed(self, _val=None):
@@ -719,7 +1335,15 @@ class YtDlpGUI:
         opt = ctk.CTkFrame(parent, corner_radius=8)
         opt.grid(row=3, column=0, columnspan=2, sticky="ew", pady=8, padx=4)
         ctk.CTkCheckBox(opt, text=self.t("audio_only"), variable=self.extract_audio, font=DEFAULT_FONT).grid(row=0, column=0, sticky=tk.W, pady=6, padx=8)
+        ctk.CTkCheckBox(opt, text=self.t("fast_audio"), variable=self.fast_audio, font=DEFAULT_FONT).grid(row=0, column=1, sticky=tk.W, pady=6, padx=8)
         ctk.CTkCheckBox(opt, text=self.t("embed_subs"), variable=self.embed_subs, font=DEFAULT_FONT).grid(row=1, column=0, sticky=tk.W, pady=6, padx=8)
+        subs_row = ctk.CTkFrame(opt)
+        subs_row.grid(row=1, column=1, sticky=tk.W, pady=6, padx=8)
+        ctk.CTkLabel(subs_row, text=self.t("sub_langs"), font=DEFAULT_FONT).grid(row=0, column=0)
+        ctk.CTkEntry(subs_row, textvariable=self.sub_langs_var, width=150, font=DEFAULT_FONT).grid(row=0, column=1, padx=(4, 10))
+        ctk.CTkLabel(subs_row, text=self.t("sub_format"), font=DEFAULT_FONT).grid(row=0, column=2)
+        ctk.CTkComboBox(subs_row, variable=self.sub_format_var, width=110, font=DEFAULT_FONT, values=('best', 'srt/best', 'vtt/best', 'ass/best')).grid(row=0, column=3, padx=(4, 10))
+        ctk.CTkCheckBox(subs_row, text=self.t("auto_subs"), variable=self.auto_subs_var, font=DEFAULT_FONT).grid(row=0, column=4)
 
         info = ctk.CTkFrame(parent, corner_radius=8)
         info.grid(row=4, column=0, columnspan=2, sticky="ew", pady=8, padx=4)
@@ -754,6 +1378,14 @@ class YtDlpGUI:
             self.t("browser_opera"),
             self.t("browser_brave")
         ]).grid(row=1, column=1, sticky=tk.W, padx=8, pady=6)
+        ctk.CTkLabel(browser_box, text=self.t("browser_cookie_cache"), font=DEFAULT_FONT).grid(row=2, column=0, sticky=tk.W, padx=8, pady=(0, 8))
+        cache_row = ctk.CTkFrame(browser_box)
+        cache_row.grid(row=2, column=1, sticky="ew", padx=8, pady=(0, 8))
+        cache_row.grid_columnconfigure(0, weight=1)
+        self.browser_cookie_label = ctk.CTkLabel(cache_row, text="", text_color="gray", anchor="w", font=DEFAULT_FONT)
+        self.browser_cookie_label.grid(row=0, column=0, sticky="ew")
+        ctk.CTkButton(cache_row, text=self.t("browser_cookie_refresh"), command=self.refresh_browser_cookies, width=100, font=DEFAULT_FONT).grid(row=0, column=1, padx=(6, 0))
+        self._update_browser_cookie_status()
 
         ejs_box = ctk.CTkFrame(parent, corner_radius=8)
         ejs_box.grid(row=2, column=0, columnspan=2, sticky="ew", pady=8, padx=4)
@@ -765,6 +1397,176 @@ class YtDlpGUI:
         ctk.CTkLabel(ejs_box, text=self.t("runtime_path"), font=DEFAULT_FONT).grid(row=3, column=0, sticky=tk.W, padx=8, pady=6)
         ctk.CTkEntry(ejs_box, textvariable=self.runtime_path_var, width=280, font=DEFAULT_FONT).grid(row=3, column=1, sticky=tk.W, padx=8, pady=6)
 
+        perf_box = ctk.CTkFrame(parent, corner_radius=8)
+        perf_box.grid(row=3, column=0, columnspan=2, sticky="ew", pady=8, padx=4)
+        perf_box.grid_columnconfigure(1, weight=1)
+        ctk.CTkLabel(perf_box, text=self.t("performance"), font=DEFAULT_FONT_BOLD).grid(row=0, column=0, columnspan=2, sticky="w", padx=8, pady=(8, 2))
+        ctk.CTkLabel(perf_box, text=self.t("concurrency"), font=DEFAULT_FONT).grid(row=1, column=0, sticky=tk.W, padx=8, pady=6)
+        ctk.CTkComboBox(perf_box, variable=self.concurrency_var, width=100, font=DEFAULT_FONT, values=[str(n) for n in range(1, MAX_CONCURRENCY + 1)]).grid(row=1, column=1, sticky=tk.W, padx=8, pady=6)
+        ctk.CTkLabel(perf_box, text=self.t("progress_hz"), font=DEFAULT_FONT).grid(row=2, column=0, sticky=tk.W, padx=8, pady=6)
+        ctk.CTkComboBox(perf_box, variable=self.progress_hz_var, width=100, font=DEFAULT_FONT, values=('2', '5', '10', '20', '30')).grid(row=2, column=1, sticky=tk.W, padx=8, pady=6)
+        ctk.CTkCheckBox(perf_box, text=self.t("keep_partial"), variable=self.keep_partial_var, font=DEFAULT_FONT).grid(row=3, column=0, columnspan=2, sticky=tk.W, padx=8, pady=6)
+        ctk.CTkCheckBox(perf_box, text=self.t("overlap_pp"), variable=self.overlap_pp_var, font=DEFAULT_FONT).grid(row=4, column=0, columnspan=2, sticky=tk.W, padx=8, pady=6)
+        archive_row = ctk.CTkFrame(perf_box)
+        archive_row.grid(row=5, column=0, columnspan=2, sticky=tk.W, padx=8, pady=6)
+        ctk.CTkCheckBox(archive_row, text=self.t("use_archive"), variable=self.use_archive_var, font=DEFAULT_FONT).grid(row=0, column=0)
+        ctk.CTkButton(archive_row, text=self.t("archive_clear"), command=self.clear_archive, width=100, font=DEFAULT_FONT).grid(row=0, column=1, padx=(6, 0))
+        ctk.CTkCheckBox(perf_box, text=self.t("auto_tune"), variable=self.auto_tune_var, font=DEFAULT_FONT).grid(row=6, column=0, columnspan=2, sticky=tk.W, padx=8, pady=(6, 0))
+        self.tuner_label = ctk.CTkLabel(perf_box, text=self.engine.tuner.describe(), text_color="gray", font=DEFAULT_FONT)
+        self.tuner_label.grid(row=7, column=0, columnspan=2, sticky=tk.W, padx=8, pady=(0, 8))
+        self._tuner_shown = self.engine.tuner.version
+
+        cache_box = ctk.CTkFrame(parent, corner_radius=8)
+        cache_box.grid(row=4, column=0, columnspan=2, sticky="ew", pady=8, padx=4)
+        cache_box.grid_columnconfigure(1, weight=1)
+        ctk.CTkLabel(cache_box, text=self.t("info_cache"), font=DEFAULT_FONT_BOLD).grid(row=0, column=0, columnspan=2, sticky="w", padx=8, pady=(8, 2))
+        ctk.CTkCheckBox(cache_box, text=self.t("info_cache_enable"), variable=self.use_info_cache_var, font=DEFAULT_FONT).grid(row=1, column=0, columnspan=2, sticky=tk.W, padx=8, pady=6)
+        ctk.CTkCheckBox(cache_box, text=self.t("info_cache_revalidate"), variable=self.revalidate_cache_var, font=DEFAULT_FONT).grid(row=2, column=0, columnspan=2, sticky=tk.W, padx=8, pady=6)
+        ctk.CTkLabel(cache_box, text=self.t("info_cache_ttl"), font=DEFAULT_FONT).grid(row=3, column=0, sticky=tk.W, padx=8, pady=6)
+        ttl_row = ctk.CTkFrame(cache_box)
+        ttl_row.grid(row=3, column=1, sticky=tk.W, padx=8, pady=6)
+        ctk.CTkComboBox(ttl_row, variable=self.info_cache_ttl_var, width=100, font=DEFAULT_FONT, values=('10', '30', '60', '180', '360')).grid(row=0, column=0)
+        ctk.CTkButton(ttl_row, text=self.t("info_cache_clear"), command=self.clear_info_cache, width=100, font=DEFAULT_FONT).grid(row=0, column=1, padx=(6, 0))
+
+        bw_box = ctk.CTkFrame(parent, corner_radius=8)
+        bw_box.grid(row=5, column=0, columnspan=2, sticky="ew", pady=8, padx=4)
+        bw_box.grid_columnconfigure(1, weight=1)
+        ctk.CTkLabel(bw_box, text=self.t("bandwidth"), font=DEFAULT_FONT_BOLD).grid(row=0, column=0, columnspan=2, sticky="w", padx=8, pady=(8, 2))
+        ctk.CTkLabel(bw_box, text=self.t("bw_limit"), font=DEFAULT_FONT).grid(row=1, column=0, sticky=tk.W, padx=8, pady=6)
+        ctk.CTkComboBox(bw_box, variable=self.bw_limit_var, width=100, font=DEFAULT_FONT, values=('0', '1', '2', '5', '10', '20', '50')).grid(row=1, column=1, sticky=tk.W, padx=8, pady=6)
+        ctk.CTkLabel(bw_box, text=self.t("bw_split"), font=DEFAULT_FONT).grid(row=2, column=0, sticky=tk.W, padx=8, pady=6)
+        ctk.CTkComboBox(bw_box, variable=self.bw_split_var, width=120, font=DEFAULT_FONT, values=('fair', 'ordered')).grid(row=2, column=1, sticky=tk.W, padx=8, pady=6)
+        ctk.CTkCheckBox(bw_box, text=self.t("bw_schedule"), variable=self.bw_schedule_var, font=DEFAULT_FONT).grid(row=3, column=0, columnspan=2, sticky=tk.W, padx=8, pady=6)
+        ctk.CTkLabel(bw_box, text=self.t("bw_hours"), font=DEFAULT_FONT).grid(row=4, column=0, sticky=tk.W, padx=8, pady=(6, 8))
+        hours_row = ctk.CTkFrame(bw_box)
+        hours_row.grid(row=4, column=1, sticky=tk.W, padx=8, pady=(6, 8))
+        hours = [str(h) for h in range(24)]
+        ctk.CTkComboBox(hours_row, variable=self.bw_start_var, width=80, font=DEFAULT_FONT, values=hours).grid(row=0, column=0)
+        ctk.CTkLabel(hours_row, text="-", font=DEFAULT_FONT).grid(row=0, column=1, padx=6)
+        ctk.CTkComboBox(hours_row, variable=self.bw_end_var, width=80, font=DEFAULT_FONT, values=hours).grid(row=0, column=2)
+
+        api_box = ctk.CTkFrame(parent, corner_radius=8)
+        api_box.grid(row=6, column=0, columnspan=2, sticky="ew", pady=8, padx=4)
+        api_box.grid_columnconfigure(1, weight=1)
+        ctk.CTkLabel(api_box, text=self.t("api"), font=DEFAULT_FONT_BOLD).grid(row=0, column=0, columnspan=2, sticky="w", padx=8, pady=(8, 2))
+        ctk.CTkCheckBox(api_box, text=self.t("api_enable"), variable=self.api_enabled_var, command=self._toggle_api, font=DEFAULT_FONT).grid(row=1, column=0, columnspan=2, sticky=tk.W, padx=8, pady=6)
+        ctk.CTkLabel(api_box, text=self.t("api_port"), font=DEFAULT_FONT).grid(row=2, column=0, sticky=tk.W, padx=8, pady=(6, 8))
+        ctk.CTkEntry(api_box, textvariable=self.api_port_var, width=100, font=DEFAULT_FONT).grid(row=2, column=1, sticky=tk.W, padx=8, pady=(6, 8))
+
+    def _build_queue_tab(self, parent):
+        box = ctk.CTkFrame(parent, corner_radius=8)
+        box.grid(row=0, column=0, sticky="nsew", padx=4, pady=4)
+        box.grid_columnconfigure(0, weight=1)
+        box.grid_rowconfigure(3, weight=1)
+
+        ctk.CTkLabel(box, text=self.t("queue_urls"), font=DEFAULT_FONT_BOLD).grid(row=0, column=0, sticky="w", padx=8, pady=(8, 2))
+        self.queue_urls_text = ctk.CTkTextbox(box, height=90, font=DEFAULT_FONT)
+        self.queue_urls_text.grid(row=1, column=0, sticky="ew", padx=8, pady=4)
+
+        btns = ctk.CTkFrame(box)
+        btns.grid(row=2, column=0, sticky="ew", padx=8, pady=4)
+        ctk.CTkButton(btns, text=self.t("queue_add"), command=self.add_to_queue, width=120, font=DEFAULT_FONT).pack(side=tk.LEFT, padx=4)
+        ctk.CTkButton(btns, text=self.t("queue_start"), command=self.start_queue, width=120, font=DEFAULT_FONT).pack(side=tk.LEFT, padx=4)
+        ctk.CTkButton(btns, text=self.t("prefetch"), command=self.prefetch_urls, width=120, font=DEFAULT_FONT).pack(side=tk.LEFT, padx=4)
+        ctk.CTkButton(btns, text=self.t("queue_remove"), command=self._remove_queue_jobs, width=120, font=DEFAULT_FONT).pack(side=tk.RIGHT, padx=4)
+        ctk.CTkButton(btns, text=self.t("queue_clear_done"), command=self._clear_done_jobs, width=120, font=DEFAULT_FONT).pack(side=tk.RIGHT, padx=4)
+        ctk.CTkButton(btns, text=self.t("queue_retry"), command=self._retry_failed_jobs, width=120, font=DEFAULT_FONT).pack(side=tk.RIGHT, padx=4)
+
+        frame = ctk.CTkFrame(box)
+        frame.grid(row=3, column=0, sticky="nsew", padx=8, pady=(4, 8))
+        sy = ttk.Scrollbar(frame)
+        sy.pack(side=tk.RIGHT, fill=tk.Y)
+        cols = ("id", "state", "url", "plan", "error")
+        self.queue_tree = ttk.Treeview(frame, columns=cols, show="headings", yscrollcommand=sy.set, selectmode="extended", height=8)
+        sy.config(command=self.queue_tree.yview)
+        heads = {"id": "#", "state": "State", "url": "URL", "plan": "Plan", "error": "Error"}
+        widths = {"id": 50, "state": 120, "url": 340, "plan": 200, "error": 200}
+        for k in cols:
+            self.queue_tree.heading(k, text=heads[k])
+            self.queue_tree.column(k, width=widths[k], anchor=tk.W)
+        self.queue_tree.pack(fill=tk.BOTH, expand=True)
+        self._queue_rows = {}
+        self._refresh_queue_view()
+
+        head = ctk.CTkFrame(box)
+        head.grid(row=4, column=0, sticky="ew", padx=8, pady=(4, 0))
+        ctk.CTkLabel(head, text=self.t("prefetch_panel"), font=DEFAULT_FONT_BOLD).pack(side=tk.LEFT, padx=4)
+        self.prefetch_label = ctk.CTkLabel(head, text="", text_color="gray", font=DEFAULT_FONT)
+        self.prefetch_label.pack(side=tk.LEFT, padx=12)
+        ctk.CTkButton(head, text=self.t("prefetch_clear"), command=self.engine.prefetcher.clear, width=120, font=DEFAULT_FONT).pack(side=tk.RIGHT, padx=4)
+        frame = ctk.CTkFrame(box)
+        frame.grid(row=5, column=0, sticky="nsew", padx=8, pady=(4, 8))
+        sy = ttk.Scrollbar(frame)
+        sy.pack(side=tk.RIGHT, fill=tk.Y)
+        cols = ("url", "state", "time", "result", "error")
+        self.prefetch_tree = ttk.Treeview(frame, columns=cols, show="headings", yscrollcommand=sy.set, selectmode="browse", height=5)
+        sy.config(command=self.prefetch_tree.yview)
+        heads = {"url": "URL", "state": "State", "time": "Time", "result": "Title / Formats", "error": "Error"}
+        widths = {"url": 300, "state": 90, "time": 70, "result": 260, "error": 200}
+        for k in cols:
+            self.prefetch_tree.heading(k, text=heads[k])
+            self.prefetch_tree.column(k, width=widths[k], anchor=tk.W)
+        self.prefetch_tree.pack(fill=tk.BOTH, expand=True)
+        self.prefetch_tree.bind("<Double-1>", self._open_prefetched)
+        self._prefetch_shown = None
+        self._prefetch_rows = {}
+
+    def _build_stats_tab(self, parent):
+        box = ctk.CTkFrame(parent, corner_radius=8)
+        box.grid(row=0, column=0, sticky="nsew", padx=4, pady=4)
+        box.grid_columnconfigure(0, weight=1)
+        box.grid_rowconfigure(1, weight=1)
+
+        head = ctk.CTkFrame(box)
+        head.grid(row=0, column=0, sticky="ew", padx=8, pady=(8, 4))
+        ctk.CTkLabel(head, text=self.t("stats_hint"), text_color="gray", font=DEFAULT_FONT).pack(side=tk.LEFT, padx=4)
+        ctk.CTkButton(head, text=self.t("stats_clear"), command=self.engine.metrics.clear, width=90, font=DEFAULT_FONT).pack(side=tk.RIGHT, padx=4)
+        ctk.CTkButton(head, text=self.t("stats_export_csv"), command=lambda: self._export_metrics(".csv"), width=110, font=DEFAULT_FONT).pack(side=tk.RIGHT, padx=4)
+        ctk.CTkButton(head, text=self.t("stats_export_json"), command=lambda: self._export_metrics(".json"), width=110, font=DEFAULT_FONT).pack(side=tk.RIGHT, padx=4)
+
+        frame = ctk.CTkFrame(box)
+        frame.grid(row=1, column=0, sticky="nsew", padx=8, pady=(4, 8))
+        sy = ttk.Scrollbar(frame)
+        sy.pack(side=tk.RIGHT, fill=tk.Y)
+        cols = ("label", "title", "result", "extract", "ttfb", "avg", "peak", "bytes", "retries", "merge", "pp", "wall")
+        self.stats_tree = ttk.Treeview(frame, columns=cols, show="headings", yscrollcommand=sy.set, selectmode="browse", height=12)
+        sy.config(command=self.stats_tree.yview)
+        heads = {"label": "Job", "title": "Title", "result": "OK", "extract": "Extract", "ttfb": "TTFB", "avg": "Avg",
+                 "peak": "Peak", "bytes": "Bytes", "retries": "Retries", "merge": "Merge", "pp": "Post", "wall": "Wall"}
+        widths = {"label": 60, "title": 200, "result": 50, "extract": 65, "ttfb": 60, "avg": 85, "peak": 85,
+                  "bytes": 80, "retries": 55, "merge": 60, "pp": 60, "wall": 65}
+        for k in cols:
+            self.stats_tree.heading(k, text=heads[k])
+            self.stats_tree.column(k, width=widths[k], anchor=tk.W)
+        self.stats_tree.pack(fill=tk.BOTH, expand=True)
+        self._metrics_shown = None
+
+    def _refresh_stats_view(self):
+        metrics = self.engine.metrics
+        self._metrics_shown = metrics.version
+        seconds = lambda v: "" if v is None else f"{v:.2f}s"
+        speed = lambda v: "" if v is None else f"{format_bytes(v)}/s"
+        tree = self.stats_tree
+        tree.delete(*tree.get_children())
+        for m in metrics.rows():
+            result = "" if m['total'] is None else f"{m['succeeded']}/{m['total']}"
+            tree.insert("", tk.END, values=(
+                m['label'], m['title'] or m['url'], result, seconds(m['extract_s']), seconds(m['ttfb_s']),
+                speed(m['avg_bps']), speed(m['peak_bps']), format_bytes(m['bytes']), m['retries'],
+                seconds(m['merge_s']), seconds(m['postprocess_s']), seconds(m['wall_s'])))
+
+    def _export_metrics(self, ext):
+        path = filedialog.asksaveasfilename(defaultextension=ext, initialfile=f"yt-dlp-metrics-{time.strftime('%Y%m%d-%H%M%S')}{ext}",
+                                            filetypes=[(ext.lstrip('.').upper(), f"*{ext}")])
+        if not path:
+            return
+        try:
+            count = self.engine.metrics.export(path)
+        except OSError as e:
+            messagebox.showerror(self.t("app_title"), str(e))
+            return
+        self.log_message(self.t("stats_exported").format(count=count, path=path), "success")
+
     def _build_bottom(self):
         area = ctk.CTkFrame(self.root, corner_radius=8)
         area.grid(row=2, column=0, sticky="ew", padx=10, pady=(0, 10))
@@ -798,17 +1600,40 @@ class YtDlpGUI:
         self.log_text.grid(row=1, column=0, sticky="nsew", padx=8, pady=8)
         for tag, color in {"info": "blue", "warning": "orange", "error": "red", "success": "green", "runtime": "#8844cc", "ejs": "#00695c", "batch": "#795548"}.items():
             self.log_text.tag_config(tag, foreground=color)
+        # 切换语言重建界面后恢复最近的日志
+        self._append_log_lines(list(self.log_sink.recent))
 
     def log_message(self, msg, tag="info"):
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, f"{msg}\n", tag)
-        self.log_text.see(tk.END)
-        self.log_text.config(state=tk.DISABLED)
+        # 可在任意线程调用：只入队，由 _flush_log 在 UI 线程批量写入
+        self.log_sink.push(msg, tag)
+
+    def _flush_log(self):
+        lines = self.log_sink.drain()
+        if lines and self.log_text.winfo_exists():
+            self._append_log_lines(lines[-LOG_MAX_LINES:])
+        self.root.after(LOG_FLUSH_MS, self._flush_log)
+
+    def _append_log_lines(self, lines):
+        if not lines:
+            return
+        text = self.log_text
+        text.config(state=tk.NORMAL)
+        for tag, group in groupby(lines, key=lambda line: line[1]):
+            text.insert(tk.END, "".join(f"{msg}\n" for msg, _ in group), tag)
+        excess = int(text.index("end-1c").split(".")[0]) - 1 - LOG_MAX_LINES
+        if excess > 0:
+            text.delete("1.0", f"{excess + 1}.0")
+        text.see(tk.END)
+        text.config(state=tk.DISABLED)
 
     def update_status(self, msg, color="black"):
+        if threading.current_thread() is not threading.main_thread():
+            self.root.after(0, lambda: self.update_status(msg, color))
+            return
         self.status_label.configure(text=msg, text_color=color)
 
     def clear_log(self):
+        self.log_sink.recent.clear()
         self.log_text.config(state=tk.NORMAL)
         self.log_text.delete(1.0, tk.END)
         self.log_text.config(state=tk.DISABLED)
@@ -837,49 +1662,286 @@ class YtDlpGUI:
         else:
             self.cookie_status_label.configure(text=self.t("cookie_status_none"), text_color="gray")
 
+    def _update_browser_cookie_status(self):
+        if not hasattr(self, 'browser_cookie_label') or not self.browser_cookie_label.winfo_exists():
+            return
+        browser_name = self.get_browser_name()
+        st = self.engine.browser_cookies.status(browser_name) if browser_name else None
+        if st:
+            text = self.t("browser_cookie_cache_info").format(
+                browser=browser_name, count=st['count'], age=int(st['age'] // 60), hits=st['hits'])
+            self.browser_cookie_label.configure(text=text, text_color="green")
+        else:
+            self.browser_cookie_label.configure(text=self.t("browser_cookie_cache_none"), text_color="gray")
+
+    def refresh_browser_cookies(self):
+        self.engine.refresh_browser_cookies()
+        self._update_browser_cookie_status()
+
     def get_browser_name(self):
         raw = (self.browser_var.get() or "none")
         name = raw.split(' - ')[0] if ' - ' in raw else raw
         return None if name == "none" else name
 
+    def _warmup_worker(self):
+        """后台导入 yt_dlp 并探测运行环境，完成后报告就绪"""
+        t0 = time.perf_counter()
+        try:
+            load_yt_dlp()
+        except RuntimeError as e:
+            self.log_message(str(e), "error")
+            self.update_status(str(e), "red")
+            self._ui_error(str(e))
+            return
+        self.startup_timer.mark("yt-dlp import")
+        self._check_environment()
+        self.startup_timer.mark("environment probe")
+        self.log_message(f"yt-dlp ready ({(time.perf_counter() - t0) * 1000:.0f} ms)", "success")
+        self.update_status(self.t("ready"), "green")
+        self._report_startup()
+
+    def _report_startup(self):
+        timer = self.startup_timer
+        if not timer.enabled or timer.reported or not (timer.has("first paint") and timer.has("environment probe")):
+            return
+        timer.reported = True
+        lines = timer.report()
+        print("Startup timing:\n  " + "\n  ".join(lines))
+        for line in lines:
+            self.log_message(f"[startup] {line}", "info")
+
     def _check_environment(self):
         ffmpeg = shutil.which("ffmpeg")
         if not ffmpeg:
             self.log_message("ffmpeg not found (merge may fail).", "warning")
         else:
             self.log_message(f"ffmpeg: {ffmpeg}", "success")
-        if HAVE_EJS:
+        if core.HAVE_EJS:
             self.log_message("yt-dlp-ejs detected.", "ejs")
         else:
             self.log_message("yt-dlp-ejs not found, will use remote ejs:github (if enabled).", "ejs")
 
+    def _current_plan(self):
+        # 未选择批量组合时为单个格式表达式：引擎按组合交给 yt-dlp 选择格式
+        return self.batch_formats[:] if self.batch_formats else [self._get_single_format()]
+
+    def add_to_queue(self):
+        urls = [u.strip() for u in self.queue_urls_text.get("1.0", tk.END).splitlines() if u.strip()]
+        if not urls:
+            messagebox.showwarning(self.t("app_title"), self.t("no_url"))
+            return
+        outdir = (self.output_path.get() or "").strip()
+        if not outdir or not os.path.isdir(outdir):
+            messagebox.showerror(self.t("app_title"), self.t("no_output"))
+            return
+        plan = self._current_plan()
+        for url in urls:
+            self.engine.journal.add(url, outdir, plan)
+        self.queue_urls_text.delete("1.0", tk.END)
+        self.log_message(f"Queued {len(urls)} URL(s), plan: {', '.join(plan)}", "batch")
+        self._refresh_queue_view()
+        if self.use_info_cache_var.get():
+            self.prefetch_urls(urls)
+
+    def prefetch_urls(self, urls=None):
+        """后台预取：默认取输入框中的 URL 与队列中等待的任务"""
+        if not self.use_info_cache_var.get():
+            self.log_message(self.t("prefetch_need_cache"), "warning")
+            return
+        if urls is None:
+            urls = [u.strip() for u in self.queue_urls_text.get("1.0", tk.END).splitlines() if u.strip()]
+            urls += [job['url'] for job in self.engine.journal.jobs() if job['state'] == 'queued']
+        self._sync_settings()
+        added = self.engine.prefetcher.submit(urls)
+        if added:
+            self.log_message(f"Prefetching {added} URL(s)", "batch")
+
+    def _refresh_prefetch_view(self):
+        prefetcher = self.engine.prefetcher
+        self._prefetch_shown = prefetcher.version
+        tree = self.prefetch_tree
+        rows = {}
+        for rec in prefetcher.snapshot():
+            if rec['state'] == 'playlist':
+                result = f"[playlist] {rec['title'] or ''}"
+            elif rec['formats'] is not None:
+                result = f"{rec['title'] or ''} ({rec['formats']})"
+            else:
+                result = ""
+            seconds = f"{rec['seconds']:.1f}s" if rec['seconds'] is not None else ""
+            rows[rec['url']] = (rec['url'], rec['state'], seconds, result, rec['error'] or "")
+        # 与队列视图相同，只改动变化的行
+        for url in [u for u in self._prefetch_rows if u not in rows]:
+            tree.delete(self._prefetch_rows.pop(url)[0])
+        for url, values in rows.items():
+            old = self._prefetch_rows.get(url)
+            if old is None:
+                self._prefetch_rows[url] = (tree.insert("", tk.END, values=values), values)
+            elif old[1] != values:
+                tree.item(old[0], values=values)
+                self._prefetch_rows[url] = (old[0], values)
+        done, failed, total, avg = prefetcher.summary()
+        avg_str = f"{avg:.1f}s" if avg else "N/A"
+        self.prefetch_label.configure(text=self.t("prefetch_summary").format(done=done, total=total, failed=failed, avg=avg_str) if total else "")
+
+    def _open_prefetched(self, _event):
+        """双击预取记录：填入 URL 并解析（已预取时直接从缓存打开格式选择）"""
+        sel = self.prefetch_tree.selection()
+        if not sel or self.is_downloading:
+            return
+        self.url_var.set(self.prefetch_tree.item(sel[0])['values'][0])
+        self.tabview.set(self.t("tab_basic"))
+        self.parse_formats()
+
+    def _refresh_queue_view(self):
+        if not hasattr(self, 'queue_tree') or not self.queue_tree.winfo_exists():
+            return
+        # 只改动变化的行：播放列表入队后任务可达数千条，每次状态变化都重建会卡顿
+        rows = {str(job['id']): (job['id'], job['state'], job['url'], ", ".join(job['plan']), job['error'] or "")
+                for job in self.engine.journal.jobs()}
+        stale = [iid for iid in self._queue_rows if iid not in rows]
+        if stale:
+            self.queue_tree.delete(*stale)
+        for iid, values in rows.items():
+            if iid not in self._queue_rows:
+                self.queue_tree.insert("", tk.END, iid=iid, values=values)
+            elif self._queue_rows[iid] != values:
+                self.queue_tree.item(iid, values=values)
+        self._queue_rows = rows
+
+    def _remove_queue_jobs(self):
+        ids = [int(i) for i in self.queue_tree.selection()]
+        if ids:
+            self.engine.journal.remove(ids)
+            self._refresh_queue_view()
+
+    def _retry_failed_jobs(self):
+        self.engine.journal.retry_failed()
+        self._refresh_queue_view()
+
+    def _clear_done_jobs(self):
+        self.engine.journal.clear_done()
+        self._refresh_queue_view()
+
+    def _resume_queue(self):
+        pending = self.engine.journal.recover()
+        self._refresh_queue_view()
+        if pending:
+            self.log_message(f"{self.t('queue_resume')}: {pending}", "batch")
+            self.root.after(500, self.start_queue)
+
+    def start_queue(self):
+        if self.is_downloading:
+            return
+        if not self.engine.journal.next_queued():
+            self.log_message(self.t("queue_empty"), "warning")
+            return
+        self.is_downloading = True
+        self._sync_settings()
+        self.download_btn.configure(state=tk.DISABLED)
+        self.cancel_btn.configure(state=tk.NORMAL)
+        self._reset_progress()
+        workers = self._get_concurrency()
+        self.update_status("Queue running...", "blue")
+        threading.Thread(target=self._queue_worker, args=(workers,), daemon=True).start()
+
+    def _queue_worker(self, workers):
+        self.engine.run_queue(workers, on_change=lambda: self.root.after(0, self._refresh_queue_view))
+        self.engine.finish_cancel()
+        self.engine.log_stats()
+        self.update_status(self.t("ready"), "green")
+        self.is_downloading = False
+        self.root.after(0, self._reset_buttons)
+
     def parse_formats(self):
         url = (self.url_var.get() or "").strip()  # 修正为 strip()
         if not url:
             messagebox.showwarning(self.t("app_title"), self.t("no_url"))
             return
+        self._sync_settings()
         self.parse_btn.configure(state=tk.DISABLED, text=self.t("parse_formats"))
         self.update_status("Parsing...", "blue")
         self.log_message(f"{self.t('ok_parsed')} {url}", "info")
         threading.Thread(target=self._parse_worker, args=(url,), daemon=True).start()
 
+    def _info_cache_ttl(self):
+        try:
+            return max(1, int(self.info_cache_ttl_var.get())) * 60
+        except (TypeError, ValueError):
+            return INFO_CACHE_TTL
+
+    def _sync_settings(self):
+        """在 UI 线程把界面选项写入引擎设置（每次解析/下载开始前调用）"""
+        st = self.engine.settings
+        st.cookie_file = (self.cookie_file_path.get() or "").strip()
+        st.browser = self.get_browser_name()
+        st.enable_ejs = bool(self.enable_ejs_var.get())
+        st.runtime = self.runtime_choice_var.get().lower()
+        st.runtime_path = (self.runtime_path_var.get() or "").strip()
+        st.extract_audio = bool(self.extract_audio.get())
+        st.fast_audio = bool(self.fast_audio.get())
+        st.embed_subs = bool(self.embed_subs.get())
+        st.sub_langs = [lang.strip() for lang in self.sub_langs_var.get().split(',') if lang.strip()]
+        st.sub_format = (self.sub_format_var.get() or "").strip() or "best"
+        st.auto_subs = bool(self.auto_subs_var.get())
+        st.use_info_cache = bool(self.use_info_cache_var.get())
+        st.revalidate_cache = bool(self.revalidate_cache_var.get())
+        st.info_cache_ttl = self._info_cache_ttl()
+        st.keep_partial = bool(self.keep_partial_var.get())
+        st.use_archive = bool(self.use_archive_var.get())
+        st.auto_tune = bool(self.auto_tune_var.get())
+        st.overlap_pp = bool(self.overlap_pp_var.get())
+
+    def _bandwidth_limit(self):
+        """当前总带宽上限（字节/秒），未设置时为 None"""
+        try:
+            limit = float(self.bw_limit_var.get()) * 1024 * 1024
+        except (TypeError, ValueError):
+            return None
+        return limit if limit > 0 else None
+
+    def _confirm_disk_space(self, url, outdir, plan):
+        """按已解析的格式表估算本次下载的总体积，超过剩余空间时让用户确认；
+        返回 (是否开始, 是否已确认空间不足)，已确认的这一次下载不再由引擎拦截"""
+        info = self.engine.current_info(url)
+        if not info:
+            return True, False
+        planned, _ = BudgetPlanner(info).plan_total(plan)
+        try:
+            free = shutil.disk_usage(outdir).free
+        except OSError:
+            return True, False
+        if planned <= free:
+            return True, False
+        if messagebox.askyesno(self.t("app_title"), self.t("disk_low").format(need=format_bytes(planned), free=format_bytes(free))):
+            return True, True
+        return False, False
+
+    def _apply_bandwidth(self, *_):
+        """界面设置变化时立即更新带宽预算，运行中的任务随之重新分配"""
+        try:
+            limit = float(self.bw_limit_var.get()) * 1024 * 1024
+            schedule = (int(self.bw_start_var.get()) % 24, int(self.bw_end_var.get()) % 24)
+        except (TypeError, ValueError):
+            return
+        split = 'ordered' if self.bw_split_var.get() == 'ordered' else 'fair'
+        self.engine.governor.configure(limit if limit > 0 else None, schedule if self.bw_schedule_var.get() else None, split)
+
+    def clear_archive(self):
+        self.engine.clear_archive()
+
+    def clear_info_cache(self):
+        self.engine.clear_info_cache()
+
     def _parse_worker(self, url):
         try:
-            opts = {'quiet': True, 'no_warnings': True, 'skip_download': True}
-            cookie_file = (self.cookie_file_path.get() or "").strip()
-            browser_name = self.get_browser_name()
-            if cookie_file and os.path.exists(cookie_file):
-                opts['cookiefile'] = cookie_file
-            elif browser_name:
-                opts['cookiesfrombrowser'] = (browser_name, None, None, None)
-            opts = self._augment_ejs_options(opts)
-            with YoutubeDL(opts) as ydl:
-                info = ydl.extract_info(url, download=False)
+            info = self.engine.parse(url, on_playlist=self._stream_playlist)
             if not info:
                 self._ui_error(self.t("parse_failed"))
                 return
+            if info.get('_type') == 'playlist':
+                return
             formats = info.get('formats') or []
-            self.current_video_info = info
             self.log_message(f"Title: {info.get('title', 'Unknown')}", "success")
             self.log_message(f"Formats: {len(formats)}", "success")
             self.root.after(0, lambda: self._open_selector(formats, info))
@@ -892,8 +1954,42 @@ class YtDlpGUI:
             self.root.after(0, lambda: self.parse_btn.configure(state=tk.NORMAL, text=self.t("parse_formats")))
             self.root.after(0, lambda: self.update_status(self.t("ready"), "green"))
 
+    def _stream_playlist(self, head, entries):
+        """解析线程：打开条目对话框后逐条读取（按页请求），对话框关闭即停止"""
+        feed = PlaylistFeed()
+        self.log_message(f"Playlist: {head.get('title')}", "success")
+        self.root.after(0, lambda: self._open_playlist(head, feed))
+        count = 0
+        try:
+            for entry in entries:
+                if feed.closed:
+                    break
+                feed.push(entry)
+                count += 1
+        finally:
+            feed.finish()
+        self.log_message(f"Playlist entries loaded: {count}", "success")
+
+    def _open_playlist(self, head, feed):
+        dlg = PlaylistDialog(self.root, head, feed, self._current_plan(), lang=self.lang)
+        self.root.wait_window(dlg.dialog)
+        if dlg.result is None:
+            self.log_message(self.t("cancel_choose"), "warning")
+            return
+        outdir = (self.output_path.get() or "").strip()
+        if not outdir or not os.path.isdir(outdir):
+            messagebox.showerror(self.t("app_title"), self.t("no_output"))
+            return
+        plan = [dlg.result['plan']] if dlg.result['plan'] else self._current_plan()
+        # 每个条目一个队列任务：格式在下载该条目时才解析
+        self.engine.journal.add_many(dlg.result['urls'], outdir, plan)
+        self.log_message(f"Queued {len(dlg.result['urls'])} playlist entries, plan: {', '.join(plan)}", "batch")
+        self._refresh_queue_view()
+        self.tabview.set(self.t("tab_queue"))
+        self.start_queue()
+
     def _open_selector(self, formats, info):
-        dlg = FormatSelectorDialog(self.root, formats, info, lang=self.lang)
+        dlg = FormatSelectorDialog(self.root, formats, info, lang=self.lang, bandwidth=self._bandwidth_limit())
         self.root.wait_window(dlg.dialog)
         if dlg.result is None:
             self.log_message(self.t("cancel_choose"), "warning")
@@ -903,10 +1999,15 @@ class YtDlpGUI:
             self.format_var.set("custom - 单格式")
             self.batch_formats = []
             self.log_message(f"Single format: {dlg.result}", "success")
+        elif 'combos' in dlg.result:
+            self.batch_formats = dlg.result['combos'][:]
+            self.log_message(f"{self.t('batch_log')}: {len(self.batch_formats)}", "batch")
+            self.custom_format_var.set("")
+            self.format_var.set("custom - batch")
         else:
             videos = dlg.result.get('videos', [])
             audios = dlg.result.get('audios', [])
-            self.batch_formats = self._expand_batch(videos, audios)
+            self.batch_formats = DownloadEngine.expand_batch(videos, audios)
             if not self.batch_formats:
                 single_list = videos or audios
                 self.batch_formats = single_list[:]
@@ -916,29 +2017,6 @@ class YtDlpGUI:
             self.custom_format_var.set("")
             self.format_var.set("custom - batch")
 
-    def _expand_batch(self, videos, audios):
-        if videos and audios:
-            return [f"{v}+{a}" for v, a in product(videos, audios)]
-        return videos or audios or []
-
-    def _augment_ejs_options(self, opts):
-        if not self.enable_ejs_var.get():
-            return opts
-        if not HAVE_EJS:
-            rc = opts.setdefault('remote_components', [])
-            if 'ejs:github' not in rc:
-                rc.append('ejs:github')
-            self.log_message("EJS remote: ejs:github", "ejs")
-        runtime_choice = self.runtime_choice_var.get().lower()
-        runtime_path = (self.runtime_path_var.get() or "").strip()
-        if runtime_choice != "auto":
-            jr = opts.setdefault('js_runtimes', {})
-            jr[runtime_choice] = {'path': runtime_path} if runtime_path else {}
-            self.log_message(f"Runtime: {runtime_choice} {'-> ' + runtime_path if runtime_path else '(PATH)'}", "runtime")
-        else:
-            self.log_message("Runtime: auto", "runtime")
-        return opts
-
     def start_download(self):
         if self.is_downloading:
             return
@@ -951,23 +2029,32 @@ class YtDlpGUI:
             messagebox.showerror(self.t("app_title"), self.t("no_output"))
             return
 
+        self._sync_settings()
+        proceed, skip_disk_check = self._confirm_disk_space(url, outdir, self.batch_formats or [self._get_single_format()])
+        if not proceed:
+            return
         self.is_downloading = True
-        self.cancel_requested = False
         self.download_btn.configure(state=tk.DISABLED)
         self.cancel_btn.configure(state=tk.NORMAL)
-        self.progress_var.set(0.0)
-        self.progress_bar.set(0.0)
+        self._reset_progress()
 
         if self.batch_formats:
+            workers = self._get_concurrency()
             self.update_status("Batch downloading...", "blue")
-            self.log_message(f"Batch start: {len(self.batch_formats)}", "batch")
-            threading.Thread(target=self._batch_download_worker, args=(url, outdir), daemon=True).start()
+            self.log_message(f"Batch start: {len(self.batch_formats)} (jobs: {workers})", "batch")
+            threading.Thread(target=self._batch_download_worker, args=(url, outdir, workers, skip_disk_check), daemon=True).start()
         else:
             fmt = self._get_single_format()
             self.update_status("Single download...", "blue")
             self.log_message(f"Single format: {fmt}", "info")
             threading.Thread(target=self._single_download_worker, args=(url, outdir, fmt), daemon=True).start()
 
+    def _get_concurrency(self):
+        try:
+            return max(1, min(MAX_CONCURRENCY, int(self.concurrency_var.get())))
+        except (TypeError, ValueError):
+            return 1
+
     def _get_single_format(self):
         custom = (self.custom_format_var.get() or "").strip()
         if custom:
@@ -975,113 +2062,160 @@ class YtDlpGUI:
         raw = (self.format_var.get() or "").strip()
         if ' - ' in raw:
             return raw.split(' - ', 1)[0]
-        return raw or 'bestvideo+bestaudio/best'
-
-    def _common_ydl_opts(self, outdir, fmt):
-        opts = {
-            'outtmpl': os.path.join(outdir, '%(title)s.%(ext)s'),
-            'progress_hooks': [self._progress_hook],
-            'format': fmt,
-            'quiet': False,
-            'no_warnings': False,
-        }
-        cookie_file = (self.cookie_file_path.get() or "").strip()
-        browser_name = self.get_browser_name()
-        if cookie_file and os.path.exists(cookie_file):
-            opts['cookiefile'] = cookie_file
-        elif browser_name:
-            opts['cookiesfrombrowser'] = (browser_name, None, None, None)
-        opts = self._augment_ejs_options(opts)
-        if self.extract_audio.get():
-            opts['format'] = 'bestaudio/best'
-            opts.setdefault('postprocessors', []).append({'key': 'FFmpegExtractAudio', 'preferredcodec': 'mp3', 'preferredquality': '192'})
-        if self.embed_subs.get():
-            opts['writesubtitles'] = True
-            opts['subtitleslangs'] = ['zh-Hans', 'zh-Hant', 'en']
-            opts['embedsubtitles'] = True
-        return opts
+        return raw or DEFAULT_FORMAT
 
     def _single_download_worker(self, url, outdir, fmt):
         try:
-            opts = self._common_ydl_opts(outdir, fmt)
-            with YoutubeDL(opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-            self.log_message(f"✓ Done: {info.get('title', 'Unknown')}", "success")
+            self.engine.download_single(url, outdir, fmt)
             self.update_status("Done", "green")
         except Exception as e:
-            self._handle_download_error(e)
+            if self.engine.cancel_requested:
+                self.log_message("User canceled.", "warning")
+                self.update_status("Canceled", "orange")
+            else:
+                self._handle_download_error(e)
         finally:
+            self.engine.finish_cancel()
             self.is_downloading = False
             self.root.after(0, self._reset_buttons)
 
-    def _batch_download_worker(self, url, outdir):
-        total = len(self.batch_formats)
-        success_count = 0
-        for idx, fmt in enumerate(self.batch_formats, 1):
-            if self.cancel_requested:
-                self.log_message("User canceled.", "warning")
-                break
-            self.update_status(f"Batch {idx}/{total}: {fmt}", "blue")
-            self.log_message(f"[{idx}/{total}] {fmt}", "batch")
-            try:
-                opts = self._common_ydl_opts(outdir, fmt)
-                with YoutubeDL(opts) as ydl:
-                    info = ydl.extract_info(url, download=True)
-                self.log_message(f"[{idx}/{total}] ✓ {info.get('title', 'Unknown')}", "success")
-                success_count += 1
-            except Exception as e:
-                self.log_message(f"[{idx}/{total}] ✗ {e}", "error")
-                self._handle_download_error(e, silent=True)
+    def _batch_download_worker(self, url, outdir, workers, skip_disk_check=False):
+        try:
+            success_count, total = self.engine.run_batch(url, outdir, self.batch_formats, workers,
+                                                         skip_disk_check=skip_disk_check)
+        except Exception as e:
+            self._handle_download_error(e)
+            success_count, total = 0, len(self.batch_formats)
+        if self.engine.cancel_requested:
+            self.log_message("User canceled.", "warning")
+        self.engine.finish_cancel()
         self.log_message(f"{self.t('batch_done')}: {success_count}/{total}", "batch")
+        self.engine.log_stats()
         self.update_status(self.t("batch_done"), "green")
         self.is_downloading = False
         self.root.after(0, self._reset_buttons)
 
     def _handle_download_error(self, e, silent=False):
-        msg = str(e)
+        self.engine.report_error(e, silent=silent)
         if not silent:
-            self.log_message(f"Error: {msg}", "error")
             self.update_status("Error", "red")
-        lower = msg.lower()
-        if "login" in lower or "member" in lower or "premium" in lower:
-            self.log_message("Maybe need login / cookie.", "warning")
-        if "ffmpeg" in lower:
-            self.log_message("ffmpeg missing or merge failed.", "warning")
-        if "challenge" in lower or "signature" in lower:
-            self.log_message("EJS / runtime may be required.", "warning")
 
     def cancel_download(self):
-        if self.is_downloading:
-            self.cancel_requested = True
-            self.log_message("Cancel requested", "warning")
+        if self.is_downloading and not self.engine.cancel_requested:
+            self.engine.cancel()
             self.update_status("Canceling...", "orange")
 
-    def _progress_hook(self, d):
-        def update_ui():
-            if d['status'] == 'downloading':
-                total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
-                done = d.get('downloaded_bytes') or 0
-                progress = (done / total) if total else 0.0  # 0~1
-                self.progress_var.set(progress)
-                percent = progress * 100
-                spd = d.get('speed') or 0
-                eta = d.get('eta') or 0
-                spd_str = f"{spd/1024/1024:.2f} MB/s" if spd else "N/A"
-                eta_str = f"{int(eta)}s" if eta else "N/A"
-                self.update_status(f"Downloading... {percent:.1f}% | {spd_str} | ETA {eta_str}", "blue")
-            elif d['status'] == 'finished':
-                self.progress_var.set(1.0)
-                self.update_status("Post-processing...", "green")
-        self.root.after(0, update_ui)
+    def _reset_progress(self):
+        self.progress_var.set(0.0)
+        self.progress_bar.set(0.0)
+        self.engine.begin()
+        self._drained_events = 0
+        self._speed_ema = None
+
+    def _tick_interval_ms(self):
+        try:
+            hz = float(self.progress_hz_var.get())
+        except (TypeError, ValueError):
+            hz = PROGRESS_TICK_HZ
+        return max(10, int(1000 / max(hz, 0.1)))
+
+    def _progress_tick(self):
+        """固定频率的 UI 刷新：合并自上次刷新以来的全部进度事件，只渲染最新状态"""
+        board = self.engine.progress_board
+        tuner = self.engine.tuner
+        board.mark_tick(time.perf_counter())
+        if tuner.version != self._tuner_shown and self.tuner_label.winfo_exists():
+            self._tuner_shown = tuner.version
+            self.tuner_label.configure(text=tuner.describe())
+        if self.engine.prefetcher.version != self._prefetch_shown and self.prefetch_tree.winfo_exists():
+            self._refresh_prefetch_view()
+        if self.engine.metrics.version != self._metrics_shown and self.stats_tree.winfo_exists():
+            self._refresh_stats_view()
+        if board.events != self._drained_events:
+            self._drained_events = board.events
+            self._render_progress(board.snapshot(), board.total)
+        self.root.after(self._tick_interval_ms(), self._progress_tick)
+
+    def _render_progress(self, slots, total_jobs):
+        fractions = []
+        speed = remaining = 0
+        downloading = []
+        for job, d in slots.items():
+            if d['status'] != 'downloading':
+                fractions.append(1.0)
+                continue
+            downloading.append(job)
+            total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+            done = d.get('downloaded_bytes') or 0
+            fractions.append((done / total) if total else 0.0)
+            speed += d.get('speed') or 0
+            if total:
+                remaining += max(0, total - done)
+        progress = min(1.0, sum(fractions) / (total_jobs or len(slots) or 1))
+        self.progress_var.set(progress)
+        if not downloading:
+            self.update_status("Post-processing...", "green")
+            return
+        if self._speed_ema is None:
+            self._speed_ema = speed
+        else:
+            self._speed_ema = SPEED_SMOOTHING * speed + (1 - SPEED_SMOOTHING) * self._speed_ema
+        eta = remaining / self._speed_ema if self._speed_ema else 0
+        if len(downloading) > 1:
+            prefix = f"{len(downloading)} jobs | "
+        elif downloading[0] is not None:
+            prefix = f"[{downloading[0]}] "
+        else:
+            prefix = ""
+        spd_str = f"{self._speed_ema/1024/1024:.2f} MB/s" if self._speed_ema else "N/A"
+        eta_str = f"{int(eta)}s" if eta else "N/A"
+        self.update_status(f"{prefix}Downloading... {progress * 100:.1f}% | {spd_str} | ETA {eta_str}", "blue")
 
     def _reset_buttons(self):
         self.download_btn.configure(state=tk.NORMAL)
         self.cancel_btn.configure(state=tk.DISABLED)
+        if self._api_pending:
+            self._api_pending = False
+            if self.engine.journal.next_queued():
+                self.start_queue()
+
+    def _toggle_api(self):
+        if self.api_server:
+            self.api_server.stop()
+            self.api_server = None
+            self.log_message("Job API stopped", "info")
+        if not self.api_enabled_var.get():
+            return
+        try:
+            port = int(self.api_port_var.get())
+            server = JobAPIServer(self.engine, lambda: self._api_outdir, port=port,
+                                  on_submit=lambda: self.root.after(0, self._on_api_submit))
+            server.start()
+        except (ValueError, OSError) as e:
+            self.api_enabled_var.set(False)
+            self.log_message(f"Job API failed to start: {e}", "error")
+            return
+        self.api_server = server
+        self.log_message(f"Job API: http://127.0.0.1:{port} (token: {server.token_path})", "success")
+
+    def _on_api_submit(self):
+        """接口提交了新任务：空闲时启动队列，否则在当前下载结束后启动（运行中的队列会自行取到新任务）"""
+        self._refresh_queue_view()
+        if self.is_downloading:
+            self._api_pending = True
+        else:
+            self.start_queue()
 
     def _ui_error(self, msg):
         self.root.after(0, lambda: messagebox.showerror(self.t("app_title"), msg))
 
 def main():
+    parser = argparse.ArgumentParser(description="yt-dlp GUI")
+    parser.add_argument("--startup-timing", action="store_true", help="print startup phase timings (import / fonts / UI / first paint / yt-dlp)")
+    args, _ = parser.parse_known_args()
+    timer = StartupTimer(enabled=args.startup_timing)
+    timer.mark("imports")
+
     ctk.set_appearance_mode("system")
     ctk.set_default_color_theme("blue")
     desired_w, desired_h = 1150, 850
@@ -1090,11 +2224,18 @@ def main():
     root.minsize(1000, 720)
     set_global_tk_font()
     init_fonts()
+    timer.mark("font init")
 
-    app = YtDlpGUI(root)
+    app = YtDlpGUI(root, startup_timer=timer)
     x = (root.winfo_screenwidth() - desired_w) // 2
     y = (root.winfo_screenheight() - desired_h) // 2
     root.geometry(f"{desired_w}x{desired_h}+{x}+{y}")
+    timer.mark("ui build")
+
+    def on_first_paint():
+        timer.mark("first paint")
+        app._report_startup()
+    root.after_idle(lambda: root.after(0, on_first_paint))
     root.mainloop()
 
 if __name__ == "__main__":